@@ -0,0 +1,278 @@
+"""Admission control: per-user and global token buckets with a fair wait queue.
+
+Every request draws from four buckets: the user's request and LLM-token
+buckets and the global ones. A request that fits all four is admitted at
+once. Otherwise it waits in a bounded queue, served round-robin across
+users so one client with a deep backlog cannot starve the rest. When the
+queue (or the user's share of it) is full, or a request has waited too
+long, it is rejected with the number of seconds after which a retry can
+succeed, for a 429 with Retry-After.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from app.context import count_tokens
+
+# Added to each message's own size: system prompt, history or search context, and a typical answer
+TOKEN_OVERHEAD = int(os.getenv("ADMISSION_TOKEN_OVERHEAD", "500"))
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        # Retry-After takes whole seconds
+        return str(max(1, math.ceil(self.retry_after)))
+
+class TokenBucket:
+    """Classic token bucket: `rate` units per second, holding at most `capacity`
+
+    A request larger than the bucket (a big batch) is let through once the
+    bucket is full, but is charged in full: the level goes negative and the
+    debt is paid off before anything else fits.
+    """
+
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)"""
+        self._refill(now)
+        # A request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.level >= self.capacity
+
+class _Buckets:
+    __slots__ = ("requests", "tokens")
+
+    def __init__(self, requests: TokenBucket, tokens: TokenBucket):
+        self.requests = requests
+        self.tokens = tokens
+
+    def wait_time(self, requests: float, tokens: float, now: float) -> float:
+        return max(self.requests.wait_time(requests, now), self.tokens.wait_time(tokens, now))
+
+    def consume(self, requests: float, tokens: float, now: float):
+        self.requests.consume(requests, now)
+        self.tokens.consume(tokens, now)
+
+    def is_full(self, now: float) -> bool:
+        return self.requests.is_full(now) and self.tokens.is_full(now)
+
+class _Waiter:
+    __slots__ = ("future", "requests", "tokens")
+
+    def __init__(self, future: asyncio.Future, requests: float, tokens: float):
+        self.future = future
+        self.requests = requests
+        self.tokens = tokens
+
+def estimate_tokens(messages: Iterable[str]) -> int:
+    """LLM tokens a request is expected to use, before its prompt is built"""
+    return sum(count_tokens(message) + TOKEN_OVERHEAD for message in messages)
+
+def _per_second(per_minute: float) -> float:
+    return per_minute / 60.0
+
+class AdmissionController:
+    """Rate limits in requests and estimated LLM tokens per minute, per user and overall.
+
+    Bursts of up to burst_seconds worth of each rate are allowed. Per-user
+    buckets that have refilled completely carry no state, so they are
+    dropped a few at a time as the controller is used, keeping memory
+    bounded by the number of recently active users.
+    """
+
+    def __init__(self, user_requests_per_minute: float = 30, user_tokens_per_minute: float = 20_000,
+                 global_requests_per_minute: float = 600, global_tokens_per_minute: float = 200_000,
+                 burst_seconds: float = 10.0, max_queue: int = 100, max_queue_per_user: int = 5,
+                 max_wait_seconds: float = 10.0):
+        self.user_requests_per_minute = user_requests_per_minute
+        self.user_tokens_per_minute = user_tokens_per_minute
+        self.burst_seconds = burst_seconds
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self._global = self._new_buckets(global_requests_per_minute, global_tokens_per_minute)
+        self._users: "OrderedDict[str, _Buckets]" = OrderedDict()
+        # Users with queued requests, in round-robin order
+        self._waiting: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = math.inf
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+
+    def _new_buckets(self, requests_per_minute: float, tokens_per_minute: float) -> _Buckets:
+        now = time.monotonic()
+        requests_rate, tokens_rate = _per_second(requests_per_minute), _per_second(tokens_per_minute)
+        return _Buckets(
+            TokenBucket(requests_rate, max(requests_rate * self.burst_seconds, 1.0), now),
+            TokenBucket(tokens_rate, max(tokens_rate * self.burst_seconds, 1.0), now)
+        )
+
+    def _user(self, user_id: str, now: float) -> _Buckets:
+        # Amortized cleanup at the LRU end, like SessionStore's idle eviction
+        for _ in range(2):
+            if not self._users:
+                break
+            oldest, buckets = next(iter(self._users.items()))
+            if oldest == user_id or oldest in self._waiting or not buckets.is_full(now):
+                break
+            del self._users[oldest]
+        buckets = self._users.get(user_id)
+        if buckets is None:
+            buckets = self._users[user_id] = self._new_buckets(self.user_requests_per_minute, self.user_tokens_per_minute)
+        else:
+            self._users.move_to_end(user_id)
+        return buckets
+
+    def _wait_time(self, user: _Buckets, requests: float, tokens: float, now: float) -> float:
+        return max(user.wait_time(requests, tokens, now), self._global.wait_time(requests, tokens, now))
+
+    async def acquire(self, user_id: str, tokens: float, requests: float = 1):
+        """Wait until the request may go ahead, or raise AdmissionRejected"""
+        now = time.monotonic()
+        user = self._user(user_id, now)
+        if not self._waiting and self._wait_time(user, requests, tokens, now) == 0:
+            user.consume(requests, tokens, now)
+            self._global.consume(requests, tokens, now)
+            self.admitted += 1
+            return
+
+        queue = self._waiting.get(user_id)
+        if self._queued >= self.max_queue or len(queue or ()) >= self.max_queue_per_user:
+            self.rejected += 1
+            reason = "Server is busy" if self._queued >= self.max_queue else "Too many queued requests for this user"
+            raise AdmissionRejected(reason, self._retry_after(user, requests, tokens, now))
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), requests, tokens)
+        if queue is None:
+            queue = self._waiting[user_id] = deque()
+        queue.append(waiter)
+        self._queued += 1
+        self.delayed += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self._abandon(user_id, waiter)
+            self.rejected += 1
+            raise AdmissionRejected("Timed out waiting for capacity", self._retry_after(user, requests, tokens, time.monotonic()))
+        except BaseException:
+            # Client went away while queued: give up the place
+            self._abandon(user_id, waiter)
+            raise
+        self.admitted += 1
+
+    def _retry_after(self, user: _Buckets, requests: float, tokens: float, now: float) -> float:
+        wait = self._wait_time(user, requests, tokens, now)
+        return self.burst_seconds if math.isinf(wait) else wait
+
+    def _abandon(self, user_id: str, waiter: _Waiter):
+        if waiter.future.done():
+            return
+        waiter.future.cancel()
+        queue = self._waiting.get(user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._waiting[user_id]
+
+    def _dispatch(self):
+        """Admit queued requests round-robin: at most one per user per pass"""
+        self._timer = None
+        self._timer_at = math.inf
+        now = time.monotonic()
+        next_wake = math.inf
+        progress = True
+        while progress and self._waiting:
+            progress = False
+            for user_id in list(self._waiting):
+                queue = self._waiting[user_id]
+                waiter = queue[0]
+                user = self._user(user_id, now)
+                wait = self._wait_time(user, waiter.requests, waiter.tokens, now)
+                if wait > 0:
+                    next_wake = min(next_wake, wait)
+                    continue
+                user.consume(waiter.requests, waiter.tokens, now)
+                self._global.consume(waiter.requests, waiter.tokens, now)
+                queue.popleft()
+                self._queued -= 1
+                waiter.future.set_result(None)
+                progress = True
+                if queue:
+                    # Served users go to the back of the line
+                    self._waiting.move_to_end(user_id)
+                else:
+                    del self._waiting[user_id]
+        if self._waiting and not math.isinf(next_wake):
+            self._schedule(next_wake)
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        at = loop.time() + delay
+        if self._timer is not None and self._timer_at <= at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(at, self._dispatch)
+        self._timer_at = at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "queued": self._queued,
+            "users_waiting": len(self._waiting),
+            "tracked_users": len(self._users),
+            "max_queue": self.max_queue
+        }
+
+def admission_from_env() -> Optional[AdmissionController]:
+    """The controller configured by ADMISSION_* settings, or None when admission control is off"""
+    if os.getenv("ADMISSION_CONTROL", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return AdmissionController(
+        user_requests_per_minute=float(os.getenv("USER_REQUESTS_PER_MINUTE", "30")),
+        user_tokens_per_minute=float(os.getenv("USER_TOKENS_PER_MINUTE", "20000")),
+        global_requests_per_minute=float(os.getenv("GLOBAL_REQUESTS_PER_MINUTE", "600")),
+        global_tokens_per_minute=float(os.getenv("GLOBAL_TOKENS_PER_MINUTE", "200000")),
+        burst_seconds=float(os.getenv("ADMISSION_BURST_SECONDS", "10")),
+        max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "100")),
+        max_queue_per_user=int(os.getenv("ADMISSION_QUEUE_PER_USER", "5")),
+        max_wait_seconds=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+    )
@@ -1,30 +1,65 @@
+import asyncio
 import os
-from typing import Dict, Any, List
-import openai
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Use absolute imports
 try:
-    from app.tools import SearchTool
-    from app.memory import ShortTermMemory
+    from app.tools import create_search_tool
+    from app.memory import call_store, create_session_store
+    from app.cache import AnswerCache
+    from app.context import ContextBuilder
+    from app.router import create_router
+    from app.summarizer import ConversationCompactor, summary_request
+    from app.llm import LLMBackend, create_backend
+    from app.logs import get_logger
 except ImportError:
     # Fallback for direct execution
-    from tools import SearchTool
-    from app.memory import ShortTermMemory
+    from tools import create_search_tool
+    from app.memory import call_store, create_session_store
+    from app.cache import AnswerCache
+    from app.context import ContextBuilder
+    from app.router import create_router
+    from app.summarizer import ConversationCompactor, summary_request
+    from app.llm import LLMBackend, create_backend
+    from app.logs import get_logger
 
 load_dotenv()
 
+log = get_logger("agent")
+
 class AIQuestionAnswerAgent:
     """AI Agent that answers questions with tool usage and memory"""
     
-    def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-            
-        openai.api_key = api_key
-        self.search_tool = SearchTool()
-        self.memory = ShortTermMemory()
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        # Model calls go through LLM_BACKEND (groq by default) unless a backend is given
+        self.backend = backend or create_backend()
+        self.search_tool = create_search_tool()
+        # Conversation memory per user_id, optionally compacted into a rolling summary
+        compaction = os.getenv("MEMORY_COMPACTION", "false").lower() in ("1", "true", "yes")
+        threshold = int(os.getenv("COMPACTION_THRESHOLD", "8"))
+        max_messages = int(os.getenv("SESSION_MAX_MESSAGES", "5"))
+        self.memory = create_session_store(
+            max_sessions=int(os.getenv("MAX_SESSIONS", "100000")),
+            max_messages=max(max_messages, threshold + 2) if compaction else max_messages,
+            ttl_minutes=float(os.getenv("SESSION_TTL_MINUTES", "30"))
+        )
+        self.compactor = ConversationCompactor(
+            self.memory,
+            self._summarize,
+            threshold=threshold,
+            keep_recent=int(os.getenv("COMPACTION_KEEP_RECENT", "4"))
+        ) if compaction else None
+        self.answer_cache = AnswerCache(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+        )
+        # Factual vs conversational routing, shared with groq_server
+        self.router = create_router()
+        self.context_builder = ContextBuilder(max_prompt_tokens=int(os.getenv("MAX_PROMPT_TOKENS", "3000")))
+        # Cached answers are only valid for the knowledge base they were built from
+        self.search_tool.on_change(self.answer_cache.clear)
         
         # System prompt
         self.system_prompt = """You are a helpful AI assistant that can answer questions and use tools.
@@ -37,25 +72,13 @@ class AIQuestionAnswerAgent:
         
         Always think step by step before responding."""
     
-    def is_factual_question(self, question: str) -> bool:
-        """Determine if a question is factual and requires search"""
-        factual_keywords = [
-            'what is', 'who is', 'when was', 'where is', 'how many', 
-            'how much', 'capital of', 'population of', 'height of',
-            'inventor of', 'year', 'largest', 'smallest', 'chemical symbol',
-            'founder of', 'speed of', 'distance to'
-        ]
-        
-        question_lower = question.lower()
-        return any(keyword in question_lower for keyword in factual_keywords)
-    
-    def _create_message_list(self, context: List[Dict], user_message: str, is_factual: bool, tool_result: str = None) -> List[Dict]:
-        """Create message list for GROQ API"""
-        messages = [{"role": "system", "content": self.system_prompt}]
-        
-        # Add conversation history
-        for msg in context:
-            messages.append({"role": msg["role"], "content": msg["content"]})
+    def _create_message_list(self, context: List[Dict], user_message: str, is_factual: bool, tool_result: str = None,
+                             summary: Optional[str] = None) -> Tuple[List[Dict], int]:
+        """Create message list for GROQ API within the prompt token budget"""
+        system_prompt = self.system_prompt
+        if summary:
+            # Compacted older turns stand in for the raw history they replaced
+            system_prompt += f"\n\nSummary of the earlier conversation: {summary}"
         
         if is_factual and tool_result:
             # Add search context for factual questions
@@ -67,23 +90,24 @@ class AIQuestionAnswerAgent:
             Based on the search result above, provide a helpful answer to the user's question.
             If the search result doesn't contain the answer, say so and provide a general response.
             """
-            messages.append({"role": "user", "content": tool_prompt})
+            final_message = {"role": "user", "content": tool_prompt}
         else:
             # Add current user message for direct response
-            messages.append({"role": "user", "content": user_message})
+            final_message = {"role": "user", "content": user_message}
         
-        return messages
+        # Conversation history goes in newest first until the budget runs out
+        return self.context_builder.build(system_prompt, context, final_message)
     
-    def generate_response(self, user_message: str) -> Dict[str, Any]:
-        """Generate response with tool usage and memory"""
-        # Add user message to memory
-        self.memory.add_message("user", user_message)
+    async def _prepare_messages(self, user_message: str, user_id: str) -> Tuple[List[Dict], bool, Optional[str], int]:
+        """Record the user message and build the model input for it"""
+        # Get conversation context (before this message, which is sent separately)
+        context = await call_store(self.memory, "get_context", user_id)
         
-        # Get conversation context
-        context = self.memory.get_recent_context()
+        # Add user message to memory
+        await call_store(self.memory, "add_message", user_id, "user", user_message)
         
         # Determine if factual question
-        is_factual = self.is_factual_question(user_message)
+        is_factual = self.router.is_factual(user_message)
         tool_result = None
         
         if is_factual:
@@ -91,30 +115,121 @@ class AIQuestionAnswerAgent:
             tool_result = self.search_tool(user_message)
         
         # Prepare messages for OpenAI
-        messages = self._create_message_list(context, user_message, is_factual, tool_result)
+        summary = await call_store(self.memory, "get_summary", user_id)
+        messages, prompt_tokens = self._create_message_list(context, user_message, is_factual, tool_result, summary)
+        return messages, is_factual, tool_result, prompt_tokens
+    
+    async def _summarize(self, previous_summary: Optional[str], turns: List[Dict]) -> Optional[str]:
+        """Fold turns into the running summary"""
+        return await self.backend.complete(summary_request(previous_summary, turns), temperature=0.1, max_tokens=300)
+    
+    def _fallback_answer(self, is_factual: bool, tool_result: Optional[str]) -> str:
+        """Answer to use when the model call fails"""
+        if is_factual and tool_result:
+            return f"Based on my search: {tool_result}"
+        return "I apologize, but I'm having trouble processing your request right now. Please try again."
+    
+    async def _call_model(self, messages: List[Dict]) -> str:
+        return await self.backend.complete(messages, temperature=0.1, max_tokens=500)
+    
+    async def generate_response(self, user_message: str, user_id: str = "default") -> Dict[str, Any]:
+        """Generate response with tool usage and memory"""
+        messages, is_factual, tool_result, prompt_tokens = await self._prepare_messages(user_message, user_id)
         
-        # Generate response using OpenAI (compatible with 0.28.1)
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            final_answer = response.choices[0].message.content
-        except Exception as e:
-            # Fallback response if OpenAI call fails
-            if is_factual and tool_result:
-                final_answer = f"Based on my search: {tool_result}"
-            else:
-                final_answer = "I apologize, but I'm having trouble processing your request right now. Please try again."
+        final_answer = self.answer_cache.get(user_message, tool_result) if is_factual else None
+        if final_answer is not None:
+            prompt_tokens = 0
+        else:
+            # Awaited, so other requests proceed while this one waits on the model
+            try:
+                final_answer = await self._call_model(messages)
+                if is_factual:
+                    self.answer_cache.put(user_message, tool_result, final_answer)
+            except Exception:
+                # Fallback response if the model call fails after its retries
+                log.exception("model_call_failed", user_id=user_id, factual=is_factual)
+                final_answer = self._fallback_answer(is_factual, tool_result)
         
         # Add AI response to memory
-        self.memory.add_message("assistant", final_answer)
+        await call_store(self.memory, "add_message", user_id, "assistant", final_answer)
+        if self.compactor:
+            self.compactor.maybe_schedule(user_id)
         
         return {
             "response": final_answer,
             "used_tool": is_factual,
-            "tool_result": tool_result
-        }
\ No newline at end of file
+            "tool_result": tool_result,
+            "prompt_tokens": prompt_tokens
+        }
+    
+    async def generate_batch(self, user_messages: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Answer independent questions concurrently, in order, without touching memory.
+        
+        All messages are classified and their searches resolved in one pass up
+        front; at most max_concurrency model calls are then in flight at once.
+        Each result carries its own status and timing, so one failure does not
+        affect the others.
+        """
+        factual_flags = [decision.factual for decision in self.router.classify_batch(user_messages)]
+        # Repeated questions are searched once
+        tool_results = {
+            message: self.search_tool(message)
+            for message in dict.fromkeys(m for m, factual in zip(user_messages, factual_flags) if m and factual)
+        }
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def answer(index: int) -> Dict[str, Any]:
+            started = time.perf_counter()
+            user_message, is_factual = user_messages[index], factual_flags[index]
+            tool_result = tool_results.get(user_message) if is_factual else None
+            result = {"index": index, "used_tool": is_factual, "tool_result": tool_result, "prompt_tokens": 0}
+            if not user_message.strip():
+                # Same as groq_server: the item fails on its own, without a model call
+                result.update(status="error", error="Message cannot be empty", elapsed_ms=0.0)
+                return result
+            try:
+                final_answer = self.answer_cache.get(user_message, tool_result) if is_factual else None
+                if final_answer is None:
+                    messages, result["prompt_tokens"] = self._create_message_list([], user_message, is_factual, tool_result)
+                    async with semaphore:
+                        final_answer = await self._call_model(messages)
+                    if is_factual:
+                        self.answer_cache.put(user_message, tool_result, final_answer)
+                result.update(status="success", response=final_answer)
+            except Exception as e:
+                log.warning("batch_item_failed", index=index, error=str(e))
+                result.update(status="error", response=self._fallback_answer(is_factual, tool_result), error=str(e))
+            result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+        
+        return list(await asyncio.gather(*(answer(index) for index in range(len(user_messages)))))
+    
+    async def stream_response(self, user_message: str, user_id: str = "default") -> AsyncIterator[Any]:
+        """Yield the tool metadata dict first, then answer tokens as they arrive.
+        
+        Closing the generator early closes the upstream stream and skips the
+        memory write, so abandoned answers are neither billed further nor stored.
+        """
+        messages, is_factual, tool_result, prompt_tokens = await self._prepare_messages(user_message, user_id)
+        yield {"used_tool": is_factual, "tool_result": tool_result, "prompt_tokens": prompt_tokens}
+        
+        parts = []
+        tokens = self.backend.stream(messages, temperature=0.1, max_tokens=500)
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield token
+        except Exception:
+            # Once tokens have gone out the answer cannot be swapped; the caller reports the error
+            if parts:
+                raise
+            fallback = self._fallback_answer(is_factual, tool_result)
+            parts.append(fallback)
+            yield fallback
+        finally:
+            await tokens.aclose()
+        
+        # Add the assembled answer to memory
+        await call_store(self.memory, "add_message", user_id, "assistant", "".join(parts))
+        if self.compactor:
+            self.compactor.maybe_schedule(user_id)
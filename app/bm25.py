@@ -0,0 +1,89 @@
+"""Okapi BM25 ranking over a sparse term-document matrix.
+
+The document side of BM25 (idf, term saturation and length normalisation)
+does not depend on the query, so it is folded into one precomputed CSR
+matrix. Scoring is then a sparse matrix product: a single query is one
+sparse row, a batch of queries is a sparse matrix, and either way all
+documents are scored in one multiply.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.matcher import content_terms
+
+# Queries per sparse product in search_batch; bounds the size of the result matrix
+BATCH_CHUNK = 512
+
+class BM25Index:
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            terms = content_terms(text)
+            lengths[doc_id] = len(terms)
+            for term in terms:
+                rows.append(doc_id)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+
+        shape = (len(documents), max(len(self.vocabulary), 1))
+        counts = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+            shape=shape
+        )
+        counts.sum_duplicates()
+
+        doc_freq = np.bincount(counts.indices, minlength=shape[1]).astype(np.float32)
+        n_docs = max(len(documents), 1)
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        average_length = float(lengths.mean()) if len(documents) else 1.0
+        norm = k1 * (1.0 - b + b * lengths / max(average_length, 1e-9))
+        # Row index of every stored entry, to pick up its document's length norm
+        entry_docs = np.repeat(np.arange(shape[0]), np.diff(counts.indptr))
+        tf = counts.data
+        counts.data = (tf * (k1 + 1.0) / (tf + norm[entry_docs]) * self.idf[counts.indices]).astype(np.float32)
+        # Stored terms x documents so a query row multiplies straight into document scores
+        self.weights_t = counts.T.tocsr()
+        self.n_docs = len(documents)
+
+    def _query_matrix(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in content_terms(query):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    cols.append(column)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(queries), self.weights_t.shape[0])
+        )
+        matrix.sum_duplicates()
+        return matrix
+
+    @staticmethod
+    def _top_k(indices: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            indices, scores = indices[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(indices[i]), float(scores[i])) for i in order]
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (document index, score) pairs for one query, best first"""
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries: Sequence[str], k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Top-k hits for many queries; each chunk of queries is scored in one sparse product"""
+        results = []
+        for start in range(0, len(queries), BATCH_CHUNK):
+            scores = (self._query_matrix(queries[start:start + BATCH_CHUNK]) @ self.weights_t).tocsr()
+            for row in range(scores.shape[0]):
+                begin, end = scores.indptr[row], scores.indptr[row + 1]
+                results.append(self._top_k(scores.indices[begin:end], scores.data[begin:end], k))
+        return results
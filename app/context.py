@@ -0,0 +1,83 @@
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Chat formats add a few tokens per message for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = " …[truncated]"
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Approximate BPE token count without a model tokenizer.
+
+    Words cost about one token per four characters and punctuation one token
+    each, which tracks Llama/GPT tokenizers closely enough for budgeting.
+    Counts are cached by content, so history messages are only counted once.
+    """
+    return sum(math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _PIECES.findall(text))
+
+def message_tokens(message: Dict) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the beginning of text within max_tokens, marking the cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max(max_tokens - count_tokens(TRUNCATION_MARKER), 0)
+    used = 0
+    end = 0
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        cost = math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        if used + cost > budget:
+            break
+        used += cost
+        end = match.end()
+    return text[:end] + TRUNCATION_MARKER
+
+class ContextBuilder:
+    """Packs a prompt into a token budget.
+
+    The system prompt and the final message (the question, with any tool
+    result) always go in. History is added newest first while it fits; the
+    turn that crosses the budget is truncated if enough room is left for it to
+    be useful, and everything older is dropped.
+    """
+
+    def __init__(self, max_prompt_tokens: int = 3000, min_turn_tokens: int = 32):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.min_turn_tokens = min_turn_tokens
+
+    def build(self, system_prompt: str, history: Sequence[Dict], final_message: Optional[Dict] = None) -> Tuple[List[Dict], int]:
+        """Return (messages, prompt_tokens) for the model call"""
+        system = {"role": "system", "content": system_prompt}
+        required = [system] + ([final_message] if final_message else [])
+        used = sum(message_tokens(message) for message in required)
+
+        if final_message and used > self.max_prompt_tokens:
+            # The question alone overflows: keep as much of it as fits
+            room = self.max_prompt_tokens - message_tokens(system) - MESSAGE_OVERHEAD_TOKENS
+            final_message = {"role": final_message["role"], "content": truncate_to_tokens(final_message["content"], max(room, 0))}
+            used = message_tokens(system) + message_tokens(final_message)
+
+        kept = []
+        for message in reversed(history):
+            cost = message_tokens(message)
+            remaining = self.max_prompt_tokens - used
+            if cost <= remaining:
+                kept.append({"role": message["role"], "content": message["content"]})
+                used += cost
+                continue
+            if remaining - MESSAGE_OVERHEAD_TOKENS >= self.min_turn_tokens or (not kept and not final_message):
+                content = truncate_to_tokens(message["content"], max(remaining - MESSAGE_OVERHEAD_TOKENS, 0))
+                kept.append({"role": message["role"], "content": content})
+                used += count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            break
+
+        kept.reverse()
+        messages = [system] + kept + ([final_message] if final_message else [])
+        return messages, used
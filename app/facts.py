@@ -0,0 +1,160 @@
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.matcher import TokenAhoCorasick, tokenize
+
+class Fact(NamedTuple):
+    entity: str
+    attribute: str
+    value: str
+    answer: str
+
+class FactMatch(NamedTuple):
+    fact: Fact
+    # 1.0 when both the entity and the asked-for attribute were found in the query
+    confidence: float
+    exact: bool
+
+# Confidence for a match on the entity alone (the query named no attribute)
+ENTITY_ONLY_CONFIDENCE = 0.6
+# Confidence when the query asked for an attribute this entity has no fact for
+ATTRIBUTE_MISMATCH_CONFIDENCE = 0.3
+# Words that make a mention name a different place: "South Sudan" is not "Sudan", "New Guinea" is not "Guinea".
+# Places spelled this way that are in the store ("south africa") match as a whole first.
+PLACE_QUALIFIERS = frozenset((
+    "north", "south", "east", "west", "northern", "southern", "eastern", "western", "central",
+    "new", "upper", "lower", "greater", "latin"
+))
+
+class FactStore:
+    """Facts keyed by (entity, attribute) with one-pass mention detection.
+
+    Entity names, entity aliases and attribute phrases are compiled into a
+    single token Aho-Corasick automaton, so a query is scanned once no matter
+    how many entities are loaded. The automaton is rebuilt lazily after
+    changes, which keeps bulk loading linear.
+    """
+
+    def __init__(self):
+        self._facts: Dict[Tuple[str, str], Fact] = {}
+        # Attributes per entity in insertion order; the first is the entity's default fact
+        self._attributes: Dict[str, List[str]] = {}
+        self._entity_aliases: Dict[str, List[str]] = {}
+        self._attribute_phrases: Dict[str, List[str]] = {}
+        self._matcher: Optional[TokenAhoCorasick] = None
+        self._change_listeners: List[Callable[[], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def on_change(self, callback: Callable[[], None]):
+        """Register a callback to run whenever facts or aliases change"""
+        self._change_listeners.append(callback)
+
+    def _changed(self):
+        self._matcher = None
+        for callback in self._change_listeners:
+            callback()
+
+    def add(self, entity: str, attribute: str, value: str, answer: str, aliases: Iterable[str] = ()):
+        entity = entity.lower().strip()
+        attribute = attribute.lower().strip()
+        self._facts[(entity, attribute)] = Fact(entity, attribute, value, answer)
+        attributes = self._attributes.setdefault(entity, [])
+        if attribute not in attributes:
+            attributes.append(attribute)
+        if aliases:
+            self._entity_aliases.setdefault(entity, []).extend(a.lower() for a in aliases)
+        self._changed()
+
+    def add_many(self, facts: Iterable[Tuple[str, str, str, str]]):
+        """Bulk insert (entity, attribute, value, answer) rows with a single change notification"""
+        for entity, attribute, value, answer in facts:
+            entity = entity.lower().strip()
+            attribute = attribute.lower().strip()
+            self._facts[(entity, attribute)] = Fact(entity, attribute, value, answer)
+            attributes = self._attributes.setdefault(entity, [])
+            if attribute not in attributes:
+                attributes.append(attribute)
+        self._changed()
+
+    def add_entity_aliases(self, entity: str, *aliases: str):
+        self._entity_aliases.setdefault(entity.lower(), []).extend(a.lower() for a in aliases)
+        self._changed()
+
+    def add_attribute_phrases(self, attribute: str, *phrases: str):
+        """Words that signal a question about this attribute ("tall" -> height)"""
+        self._attribute_phrases.setdefault(attribute.lower(), []).extend(p.lower() for p in phrases)
+        self._changed()
+
+    def get(self, entity: str, attribute: str) -> Optional[Fact]:
+        return self._facts.get((entity.lower(), attribute.lower()))
+
+    def entities(self) -> List[str]:
+        return list(self._attributes)
+
+    def facts(self) -> List[Fact]:
+        return list(self._facts.values())
+
+    def _build_matcher(self) -> TokenAhoCorasick:
+        matcher = TokenAhoCorasick()
+        for entity in self._attributes:
+            matcher.add(entity, ("entity", entity))
+        for entity, aliases in self._entity_aliases.items():
+            for alias in aliases:
+                matcher.add(alias, ("entity", entity))
+        for attribute in {attribute for (_, attribute) in self._facts}:
+            matcher.add(attribute.replace("_", " "), ("attribute", attribute))
+        for attribute, phrases in self._attribute_phrases.items():
+            for phrase in phrases:
+                matcher.add(phrase, ("attribute", attribute))
+        matcher.build()
+        return matcher
+
+    def find_mentions(self, query: str) -> Tuple[List[str], List[str]]:
+        """Entities and attributes mentioned in the query, in one pass.
+
+        Overlapping entity mentions resolve to the longest one ("south africa"
+        over "africa"); results keep the order they appear in the query. A
+        mention right after a place qualifier ("south sudan" with only "sudan"
+        stored) is a different place and is not reported, so it can never
+        become a confident match.
+        """
+        if self._matcher is None:
+            self._matcher = self._build_matcher()
+        tokens = tokenize(query)
+        matches = self._matcher.find_all(tokens)
+
+        entity_spans = sorted(
+            ((start, end, value[1]) for start, end, value in matches if value[0] == "entity"),
+            key=lambda span: (span[0] - span[1], span[0])
+        )
+        taken = set()
+        entities = []
+        for start, end, entity in entity_spans:
+            if taken.isdisjoint(range(start, end)):
+                taken.update(range(start, end))
+                if start and tokens[start - 1] in PLACE_QUALIFIERS:
+                    continue
+                entities.append((start, entity))
+        entities.sort()
+
+        attributes = []
+        for _, _, value in sorted(matches):
+            if value[0] == "attribute" and value[1] not in attributes:
+                attributes.append(value[1])
+        return [entity for _, entity in entities], attributes
+
+    def lookup(self, query: str) -> Optional[FactMatch]:
+        """Best fact for the query, preferring an exact (entity, attribute) hit"""
+        entities, attributes = self.find_mentions(query)
+        if not entities:
+            return None
+        for entity in entities:
+            for attribute in attributes:
+                fact = self._facts.get((entity, attribute))
+                if fact:
+                    return FactMatch(fact, 1.0, True)
+        entity = entities[0]
+        fact = self._facts[(entity, self._attributes[entity][0])]
+        confidence = ATTRIBUTE_MISMATCH_CONFIDENCE if attributes else ENTITY_ONLY_CONFIDENCE
+        return FactMatch(fact, confidence, False)
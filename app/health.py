@@ -0,0 +1,172 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after a cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30.0, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_started_at = 0.0
+
+    def _refresh(self, now: float):
+        if self.state == self.OPEN and now - self.opened_at >= self.cooldown_seconds:
+            self.state = self.HALF_OPEN
+            self.probes_in_flight = 0
+        elif self.state == self.HALF_OPEN and self.probes_in_flight and now - self.probe_started_at >= self.cooldown_seconds:
+            # A probe that never reported back (e.g. cancelled request) must not wedge the breaker
+            self.probes_in_flight = 0
+
+    def current_state(self) -> str:
+        self._refresh(time.monotonic())
+        return self.state
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """Whether a call could be let through right now (does not reserve a probe)"""
+        self._refresh(now if now is not None else time.monotonic())
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return self.probes_in_flight < self.half_open_probes
+        return True
+
+    def allow_request(self, now: Optional[float] = None) -> bool:
+        """Let a call through, reserving a probe slot while half-open"""
+        now = now if now is not None else time.monotonic()
+        if not self.is_available(now):
+            return False
+        if self.state == self.HALF_OPEN:
+            self.probes_in_flight += 1
+            self.probe_started_at = now
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+
+    def record_failure(self, trip: bool = False, now: Optional[float] = None):
+        self.consecutive_failures += 1
+        if trip or self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now if now is not None else time.monotonic()
+            self.probes_in_flight = 0
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        """Seconds until an open breaker lets a probe through"""
+        if self.state != self.OPEN:
+            return 0.0
+        now = now if now is not None else time.monotonic()
+        return max(0.0, self.cooldown_seconds - (now - self.opened_at))
+
+class ModelHealth:
+    """Breaker plus exponentially weighted success rate and latency for one model.
+
+    The last `latency_window` successful latencies are also kept, for
+    quantiles such as the p95 that request hedging waits for.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, alpha: float = 0.2, prior_latency: float = 1.0,
+                 latency_window: int = 200):
+        self.breaker = breaker
+        self.alpha = alpha
+        self.success_rate = 1.0
+        self.latency = prior_latency
+        self.recent_latencies: Deque[float] = deque(maxlen=latency_window)
+        self._sorted_latencies: Optional[List[float]] = None
+        self.successes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def record_success(self, latency: float):
+        if self.successes == 0:
+            self.latency = latency
+        else:
+            self.latency += self.alpha * (latency - self.latency)
+        self.success_rate += self.alpha * (1.0 - self.success_rate)
+        self.successes += 1
+        self.recent_latencies.append(latency)
+        self._sorted_latencies = None
+        self.breaker.record_success()
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile of recent successful latencies; None before the first success"""
+        if not self.recent_latencies:
+            return None
+        if self._sorted_latencies is None:
+            # Sorted once per new sample, however many requests ask in between
+            self._sorted_latencies = sorted(self.recent_latencies)
+        ranked = self._sorted_latencies
+        return ranked[min(len(ranked) - 1, max(0, int(q * len(ranked) + 0.5) - 1))]
+
+    def record_failure(self, error: str = "", trip: bool = False):
+        self.success_rate -= self.alpha * self.success_rate
+        self.failures += 1
+        self.last_error = error[:200] if error else None
+        self.breaker.record_failure(trip=trip)
+
+    def expected_cost(self) -> float:
+        """Expected seconds to a successful answer; lower ranks first"""
+        return self.latency / max(self.success_rate, 0.05)
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+class ModelHealthRegistry:
+    """Per-model health used to skip dead models and rank the live ones"""
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30.0, half_open_probes: int = 1,
+                 latency_window: int = 200):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_probes = half_open_probes
+        self.latency_window = latency_window
+        self.models: Dict[str, ModelHealth] = {}
+
+    def get(self, model: str) -> ModelHealth:
+        health = self.models.get(model)
+        if health is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.cooldown_seconds, self.half_open_probes)
+            health = self.models[model] = ModelHealth(breaker, latency_window=self.latency_window)
+        return health
+
+    def ordered(self, models: Iterable[str]) -> List[str]:
+        """Available models, best first; ties keep the configured order"""
+        candidates = [model for model in models if self.get(model).breaker.is_available()]
+        return sorted(candidates, key=lambda model: self.models[model].expected_cost())
+
+    def allow(self, model: str) -> bool:
+        return self.get(model).breaker.allow_request()
+
+    def record_success(self, model: str, latency: float):
+        self.get(model).record_success(latency)
+
+    def record_failure(self, model: str, error: str = "", trip: bool = False):
+        """Count a failure; trip=True opens the breaker at once (e.g. model decommissioned)"""
+        self.get(model).record_failure(error, trip=trip)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            model: {
+                "state": health.breaker.current_state(),
+                "consecutive_failures": health.breaker.consecutive_failures,
+                "retry_in_seconds": round(health.breaker.retry_in(), 1),
+                "success_rate": round(health.success_rate, 3),
+                "latency_seconds": round(health.latency, 3),
+                "p95_seconds": _rounded(health.latency_quantile(0.95)),
+                "successes": health.successes,
+                "failures": health.failures,
+                "last_error": health.last_error
+            }
+            for model, health in self.models.items()
+        }
@@ -0,0 +1,87 @@
+"""Hedged requests: race a backup model against a slow primary.
+
+A call goes to the best-ranked model first. If it has not answered after
+that model's recent p95 latency (clamped to a configured range, with a
+default until enough samples exist), the same prompt is sent to the next
+model and whichever answers first wins; the other call is cancelled. So
+only the slowest few percent of calls are duplicated.
+
+Hedges draw on a budget: every request earns `max_fraction` of a hedge,
+up to `burst` saved, and each hedge spends one. Over any stretch of
+traffic at most that fraction of requests (plus the burst) is hedged,
+however slow the models get.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from app.health import ModelHealth
+
+class HedgePolicy:
+    def __init__(self, quantile: float = 0.95, min_delay: float = 0.05, max_delay: float = 5.0,
+                 default_delay: float = 1.0, min_samples: int = 20, max_fraction: float = 0.1, burst: float = 10.0):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        # Used until a model has min_samples successful latencies
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_fraction = max_fraction
+        self.burst = burst
+        self.budget = burst
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+        self.primary_wins = 0
+        self.budget_exhausted = 0
+
+    def delay_for(self, health: ModelHealth) -> float:
+        """Seconds to wait on this model before hedging"""
+        if len(health.recent_latencies) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, health.latency_quantile(self.quantile)))
+
+    def note_request(self):
+        """Called once per request that may hedge; earns max_fraction of a hedge"""
+        self.requests += 1
+        self.budget = min(self.burst, self.budget + self.max_fraction)
+
+    def has_budget(self) -> bool:
+        if self.budget >= 1.0:
+            return True
+        self.budget_exhausted += 1
+        return False
+
+    def record_hedge(self):
+        self.budget -= 1.0
+        self.hedged += 1
+
+    def record_winner(self, backup: bool):
+        if backup:
+            self.backup_wins += 1
+        else:
+            self.primary_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedged_fraction": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "backup_wins": self.backup_wins,
+            "primary_wins": self.primary_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "max_fraction": self.max_fraction
+        }
+
+def hedge_policy_from_env() -> Optional[HedgePolicy]:
+    """HedgePolicy configured from HEDGE_* settings, or None unless HEDGING is on"""
+    if os.getenv("HEDGING", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return HedgePolicy(
+        quantile=float(os.getenv("HEDGE_QUANTILE", "0.95")),
+        min_delay=float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05")),
+        max_delay=float(os.getenv("HEDGE_MAX_DELAY_SECONDS", "5")),
+        default_delay=float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "1")),
+        min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+        max_fraction=float(os.getenv("HEDGE_MAX_FRACTION", "0.1")),
+        burst=float(os.getenv("HEDGE_BURST", "10"))
+    )
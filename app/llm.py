@@ -0,0 +1,285 @@
+"""Async chat-completion backends for AIQuestionAnswerAgent.
+
+Every backend speaks the OpenAI chat completions wire format over one
+pooled httpx.AsyncClient per process, so concurrent requests reuse
+keep-alive connections instead of each opening its own. Rate limits
+(429), server errors (5xx) and transport failures are retried with
+full-jitter exponential backoff, honouring Retry-After when the provider
+sends one; anything else fails at once.
+
+LLM_BACKEND picks the implementation:
+
+- groq (default): api.groq.com, or GROQ_BASE_URL, with GROQ_API_KEY
+- openai: any OpenAI-compatible endpoint (OPENAI_API_BASE, OPENAI_API_KEY)
+- fake: deterministic local answers for tests and offline runs
+"""
+import abc
+import asyncio
+import json
+import os
+import random
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from app.logs import get_logger
+
+log = get_logger("llm")
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+# Overrides the backend's default model
+LLM_MODEL = os.getenv("LLM_MODEL")
+# Read timeout per attempt; connecting has its own, shorter limit
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# Retries after the first attempt, and the backoff they draw their delays from
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.25"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "4"))
+# Keep-alive pool shared by every backend in this process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+
+GROQ_DEFAULT_MODEL = "llama-3.1-8b-instant"
+OPENAI_DEFAULT_MODEL = "gpt-3.5-turbo"
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+def shared_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled client, created on first use"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                keepalive_expiry=30.0
+            )
+        )
+    return _shared_client
+
+async def close_shared_http_client():
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.aclose()
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: Callable[[float, float], float] = random.uniform) -> float:
+    """Full jitter: uniform in [0, min(cap, base * 2**attempt)], so retrying clients spread out"""
+    return rng(0.0, min(cap, base * (2 ** attempt)))
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+class LLMBackend(abc.ABC):
+    """Base class: complete() returns the whole answer, stream() yields it in pieces"""
+
+    name = "base"
+    model = ""
+
+    @abc.abstractmethod
+    async def complete(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> str:
+        """The model's whole answer to messages"""
+
+    async def stream(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> AsyncIterator[str]:
+        # Backends without real streaming send the whole answer as one piece
+        yield await self.complete(messages, temperature, max_tokens)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "model": self.model}
+
+class OpenAICompatibleBackend(LLMBackend):
+    """POST {base_url}/chat/completions with a bearer key, retrying transient failures"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str, api_key: str, model: str, http_client: Optional[httpx.AsyncClient] = None,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_seconds: float = LLM_BACKOFF_SECONDS,
+                 backoff_max_seconds: float = LLM_BACKOFF_MAX_SECONDS):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        # None means the shared pool, looked up per call so a closed pool is replaced
+        self._http_client = http_client
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or shared_http_client()
+
+    def _body(self, messages: List[Dict], temperature: float, max_tokens: int, stream: bool) -> Dict[str, Any]:
+        return {"model": self.model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens,
+                "stream": stream}
+
+    async def _check(self, response: httpx.Response):
+        if response.status_code < 400:
+            return
+        body = (await response.aread()).decode("utf-8", "replace")[:300]
+        raise LLMError(
+            f"{self.name} returned {response.status_code}: {body}",
+            status=response.status_code,
+            retryable=response.status_code in RETRYABLE_STATUS,
+            retry_after=_retry_after(response)
+        )
+
+    async def _with_retries(self, attempt_call):
+        attempt = 0
+        while True:
+            self.attempts += 1
+            try:
+                return await attempt_call()
+            except httpx.TransportError as e:
+                error = LLMError(f"{self.name} request failed: {e!r}", retryable=True)
+            except LLMError as e:
+                error = e
+            if not error.retryable or attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+            delay = backoff_delay(attempt, self.backoff_seconds, self.backoff_max_seconds)
+            if error.retry_after is not None:
+                delay = max(delay, min(error.retry_after, self.backoff_max_seconds))
+            self.retries += 1
+            log.warning("llm_retry", backend=self.name, model=self.model, attempt=attempt + 1,
+                        delay=round(delay, 3), error=str(error)[:200])
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def complete(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> str:
+        body = self._body(messages, temperature, max_tokens, stream=False)
+
+        async def attempt() -> str:
+            response = await self.http_client.post(self.url, json=body, headers=self.headers)
+            await self._check(response)
+            return response.json()["choices"][0]["message"]["content"] or ""
+
+        return await self._with_retries(attempt)
+
+    async def stream(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> AsyncIterator[str]:
+        """Yield content deltas; only opening the stream is retried, never a stream already under way.
+        Closing the generator early closes the upstream response."""
+        request = self.http_client.build_request(
+            "POST", self.url, json=self._body(messages, temperature, max_tokens, stream=True), headers=self.headers
+        )
+
+        async def attempt() -> httpx.Response:
+            response = await self.http_client.send(request, stream=True)
+            try:
+                await self._check(response)
+            except BaseException:
+                await response.aclose()
+                raise
+            return response
+
+        response = await self._with_retries(attempt)
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
+        finally:
+            await response.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+class GroqBackend(OpenAICompatibleBackend):
+    """Groq's OpenAI-compatible endpoint; base_url is the host, as with GROQ_BASE_URL"""
+
+    name = "groq"
+
+    def __init__(self, api_key: str, model: str = GROQ_DEFAULT_MODEL, base_url: Optional[str] = None, **options):
+        host = (base_url or "https://api.groq.com").rstrip("/")
+        super().__init__(f"{host}/openai/v1", api_key, model, **options)
+
+class FakeBackend(LLMBackend):
+    """Deterministic local answers: the same messages always give the same reply.
+
+    By default the reply echoes the last user message; latency_seconds
+    simulates a slow model and the first `failures` calls raise LLMError.
+    Every call's messages are kept in `calls`.
+    """
+
+    name = "fake"
+
+    def __init__(self, answer: Optional[str] = None, latency_seconds: float = 0.0, failures: int = 0,
+                 model: str = "fake-model"):
+        self.answer = answer
+        self.latency_seconds = latency_seconds
+        self.failures = failures
+        self.model = model
+        self.calls: List[List[Dict]] = []
+
+    def reply(self, messages: List[Dict]) -> str:
+        if self.answer is not None:
+            return self.answer
+        last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"Fake answer to: {' '.join(last_user.split())}"
+
+    async def complete(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> str:
+        self.calls.append(messages)
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.failures > 0:
+            self.failures -= 1
+            raise LLMError("Injected failure", status=503, retryable=True)
+        return self.reply(messages)
+
+    async def stream(self, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 500) -> AsyncIterator[str]:
+        words = (await self.complete(messages, temperature, max_tokens)).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "model": self.model, "calls": len(self.calls)}
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """Backend selected by LLM_BACKEND; raises ValueError when its API key is missing"""
+    name = (name or LLM_BACKEND).lower()
+    if name == "fake":
+        return FakeBackend(answer=os.getenv("FAKE_LLM_ANSWER"), latency_seconds=float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0")))
+    if name == "groq":
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        return GroqBackend(api_key, model=LLM_MODEL or GROQ_DEFAULT_MODEL, base_url=os.getenv("GROQ_BASE_URL"))
+    if name == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables")
+        return OpenAICompatibleBackend(
+            os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1"), api_key, model=LLM_MODEL or OPENAI_DEFAULT_MODEL
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
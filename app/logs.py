@@ -0,0 +1,132 @@
+"""Structured, non-blocking logging.
+
+Request handlers only put records on an in-memory queue; a QueueListener
+thread formats them as JSON lines and does the stdout I/O, so a slow
+terminal or log shipper never stalls the event loop. Extra fields are
+passed as keyword arguments and land as top-level JSON keys, together with
+the current request ID when there is one.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+# Set per request by the tracing middleware; read by every log record
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class _RequestIdFilter(logging.Filter):
+    # Runs in the caller's context, where the request ID is visible
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class StructuredLogger:
+    """Thin wrapper so call sites read log.info("event", key=value)"""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def _log(self, level: int, event: str, exc_info: Any = None, **fields: Any):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields: Any):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, exc_info: Any = None, **fields: Any):
+        self._log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+    def exception(self, event: str, **fields: Any):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(name))
+
+def configure_logging(level: str = "INFO", stream=None, max_queue: int = 10_000):
+    """Route the root logger through a bounded queue to a background JSON writer.
+
+    When the writer falls behind and the queue is full, new records are
+    dropped rather than blocking the request. Safe to call more than once;
+    the previous listener is stopped first.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max_queue)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(_RequestIdFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    return _listener
+
+def flush_logging(timeout: float = 1.0):
+    """Wait (briefly) for queued records to be written, e.g. before exit or in tests"""
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not _listener.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep fields structured; the listener does the (slow) formatting
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+atexit.register(_stop_listener)
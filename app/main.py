@@ -1,24 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 import os
+import time
 
-# Import our agent - use absolute imports
-try:
+from app.admission import AdmissionRejected, admission_from_env, estimate_tokens
+from app.llm import close_shared_http_client
+from app.startup import LazyClient, StartupState
+from app.streaming import format_sse
+
+def create_agent():
+    # Imported here: app.agent builds the search index and session store, which only requests need
     from app.agent import AIQuestionAnswerAgent
-    agent_instance = AIQuestionAnswerAgent()
-    print("✅ Agent initialized successfully!")
-except ImportError as e:
-    print(f"❌ Import error: {e}")
-    agent_instance = None
-except Exception as e:
-    print(f"❌ Agent initialization error: {e}")
-    agent_instance = None
+    return AIQuestionAnswerAgent()
+
+# Built during startup or by the first request; a failure (e.g. no GROQ_API_KEY) is retried later
+agent_init = LazyClient("agent", create_agent, retry_seconds=float(os.getenv("AGENT_INIT_RETRY_SECONDS", "30")))
+# Build the search index before reporting ready
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+startup = StartupState()
+
+async def get_agent():
+    """The agent, created on first use off the event loop; None while creation fails"""
+    return agent_init.peek() or await run_in_threadpool(agent_init.get)
+
+def warm_search_index():
+    agent = agent_init.peek()
+    if agent is not None:
+        agent.search_tool("warm up")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    phases = [("agent", get_agent)]
+    if WARMUP:
+        phases.append(("search_index", lambda: run_in_threadpool(warm_search_index)))
+    startup.begin(phases)
+    yield
+    await startup.stop()
+    # Every model backend shares this pool
+    await close_shared_http_client()
 
 app = FastAPI(
     title="AI Question-Answer Helper",
     description="A simple AI agent that answers user questions with search tool integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class ChatRequest(BaseModel):
@@ -30,18 +59,60 @@ class ChatResponse(BaseModel):
     used_tool: bool
     tool_result: Optional[str] = None
     status: str
+    # Tokens sent to the model for this answer (0 when served from cache)
+    prompt_tokens: Optional[int] = None
+
+# Largest accepted batch and the default/maximum parallel model calls per batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Per-user and global rate limits (ADMISSION_CONTROL=true); see app/admission.py
+admission = admission_from_env()
+
+async def admit(user_id: str, user_messages: List[str]):
+    """Wait for admission control; 429 with Retry-After when over the limit and the queue is full"""
+    if admission is None:
+        return
+    try:
+        await admission.acquire(user_id, estimate_tokens(user_messages), requests=len(user_messages))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": e.retry_after_header})
+
+class BatchChatRequest(BaseModel):
+    messages: List[str]
+    user_id: Optional[str] = "default"
+    # Parallel model calls for this batch; capped at BATCH_MAX_CONCURRENCY
+    max_concurrency: Optional[int] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    response: Optional[str] = None
+    used_tool: bool = False
+    tool_result: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    error: Optional[str] = None
+    elapsed_ms: float
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    succeeded: int
+    failed: int
+    elapsed_ms: float
 
 @app.get("/")
 async def root():
     return {
         "message": "AI Question-Answer Helper API is running!",
-        "status": "healthy" if agent_instance else "agent_not_initialized"
+        "status": "healthy" if agent_init.peek() else "agent_not_initialized"
     }
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Chat endpoint that processes user messages"""
     try:
+        agent_instance = await get_agent()
         if not agent_instance:
             raise HTTPException(
                 status_code=500, 
@@ -51,14 +122,17 @@ async def chat_endpoint(request: ChatRequest):
         if not request.message or not request.message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
+        await admit(request.user_id or "default", [request.message])
+        
         # Generate response using the agent
-        result = agent_instance.generate_response(request.message.strip())
+        result = await agent_instance.generate_response(request.message.strip(), request.user_id or "default")
         
         return ChatResponse(
             response=result["response"],
             used_tool=result["used_tool"],
             tool_result=result.get("tool_result"),
-            status="success"
+            status="success",
+            prompt_tokens=result.get("prompt_tokens")
         )
     
     except HTTPException:
@@ -66,11 +140,86 @@ async def chat_endpoint(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest):
+    """Answer many independent questions at once; results come back in request order"""
+    agent_instance = await get_agent()
+    if not agent_instance:
+        raise HTTPException(
+            status_code=500, 
+            detail="AI agent is not initialized. Check if GROQ_API_KEY is set correctly."
+        )
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="messages cannot be empty")
+    if len(request.messages) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_SIZE} messages per batch")
+    await admit(request.user_id or "default", request.messages)
+    
+    started = time.perf_counter()
+    concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    results = await agent_instance.generate_batch([message.strip() for message in request.messages], concurrency)
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    return BatchChatResponse(
+        results=[BatchItemResult(**result) for result in results],
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the answer as Server-Sent Events: meta, token..., done"""
+    agent_instance = await get_agent()
+    if not agent_instance:
+        raise HTTPException(
+            status_code=500, 
+            detail="AI agent is not initialized. Check if GROQ_API_KEY is set correctly."
+        )
+        
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    await admit(request.user_id or "default", [request.message])
+    
+    events = agent_instance.stream_response(request.message.strip(), request.user_id or "default")
+    meta = await events.__anext__()
+    
+    async def event_stream():
+        try:
+            yield format_sse(meta, event="meta")
+            async for token in events:
+                yield format_sse({"token": token})
+            yield format_sse({"status": "success"}, event="done")
+        except Exception as e:
+            yield format_sse({"status": "error", "detail": str(e)}, event="error")
+        finally:
+            # Runs on client disconnect too, closing the upstream model stream
+            await events.aclose()
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/health")
 async def health_check():
+    agent_instance = agent_init.peek()
     agent_status = "healthy" if agent_instance else "unhealthy"
     return {
         "status": agent_status, 
         "service": "AI Question-Answer Helper",
-        "agent_initialized": agent_instance is not None
-    }
\ No newline at end of file
+        "agent_initialized": agent_instance is not None,
+        "agent_error": agent_init.error,
+        "llm": agent_instance.backend.stats() if agent_instance else None,
+        "ready": startup.ready,
+        "admission": admission.stats() if admission else None
+    }
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about the agent"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once warm-up has finished and the agent exists, 503 before"""
+    ready = startup.ready and agent_init.peek() is not None
+    body = {"status": "ready" if ready else "not_ready", "startup": startup.snapshot(), "agent": agent_init.stats()}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
\ No newline at end of file
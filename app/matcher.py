@@ -0,0 +1,123 @@
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+")
+_SUFFIXES = ("ations", "ation", "ions", "ion", "ings", "ing", "ors", "or", "ers", "er", "ed", "es", "s")
+
+STOPWORDS = frozenset("""
+a an and are as at be by did do does for from how i in is it its me of on or s the this to
+was what when where which who whom why will with you your tell please about
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; the unit the matcher works on"""
+    return _TOKEN.findall(text.lower())
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+def content_tokens(text: str) -> List[str]:
+    """Lowercased tokens with stopwords removed"""
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+def content_terms(text: str) -> List[str]:
+    """content_tokens, lightly stemmed so "invented" and "inventor" compare equal"""
+    return [_stem(token) for token in content_tokens(text)]
+
+def key_coverage(key: str, query_tokens: Iterable[str]) -> float:
+    """Share of a knowledge base key's terms that the query mentions"""
+    key_terms = set(content_terms(key))
+    if not key_terms:
+        return 0.0
+    query_terms = {_stem(token) for token in query_tokens}
+    return len(key_terms & query_terms) / len(key_terms)
+
+class TokenAhoCorasick:
+    """Aho-Corasick automaton over word tokens.
+
+    Patterns are phrases ("south africa", "speed of light"). Matching walks the
+    query's tokens once and reports every pattern occurrence, so the cost does
+    not grow with the number of patterns loaded. Working on tokens instead of
+    characters keeps the trie small and only ever matches whole words.
+    """
+
+    def __init__(self):
+        # Transitions live in one flat dict keyed by (node, token); far leaner than a dict per node
+        self._goto: Dict[Tuple[int, str], int] = {}
+        self._fail: List[int] = [0]
+        self._own: List[Optional[List[Tuple[int, Any]]]] = [None]
+        self._outputs: List[Optional[List[Tuple[int, Any]]]] = [None]
+        self._children: List[List[str]] = [[]]
+        # Tokens of any pattern; every other token sends the walk straight back to the root
+        self._vocabulary = set()
+        self._built = True
+        self.pattern_count = 0
+
+    def add(self, phrase: str, value: Any):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        node = 0
+        self._vocabulary.update(tokens)
+        for token in tokens:
+            child = self._goto.get((node, token))
+            if child is None:
+                child = len(self._fail)
+                self._goto[(node, token)] = child
+                self._fail.append(0)
+                self._own.append(None)
+                self._children.append([])
+                self._children[node].append(token)
+            node = child
+        if self._own[node] is None:
+            self._own[node] = []
+        self._own[node].append((len(tokens), value))
+        self.pattern_count += 1
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first and merge suffix outputs into each node"""
+        outputs = list(self._own)
+        queue = deque(self._goto[(0, token)] for token in self._children[0])
+        while queue:
+            node = queue.popleft()
+            for token in self._children[node]:
+                child = self._goto[(node, token)]
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and (fallback, token) not in self._goto:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto.get((fallback, token), 0)
+                inherited = outputs[self._fail[child]]
+                if inherited:
+                    outputs[child] = (self._own[child] or []) + inherited
+        self._outputs = outputs
+        self._built = True
+
+    def find_all(self, tokens: List[str]) -> List[Tuple[int, int, Any]]:
+        """Every (start, end, value) occurrence in the token list, end exclusive"""
+        if not self._built:
+            self.build()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        vocabulary = self._vocabulary
+        matches = []
+        node = 0
+        for position, token in enumerate(tokens):
+            if token not in vocabulary:
+                node = 0
+                continue
+            while node and (node, token) not in goto:
+                node = fail[node]
+            node = goto.get((node, token), 0)
+            found = outputs[node]
+            if found:
+                end = position + 1
+                for length, value in found:
+                    matches.append((end - length, end, value))
+        return matches
@@ -1,44 +1,199 @@
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
 
 class ShortTermMemory:
-    """Simple short-term memory for conversation context"""
-    
-    def __init__(self, max_size: int = 5, ttl_minutes: int = 30):
+    """Simple short-term memory for conversation context.
+
+    Messages sit in a fixed-size ring buffer, so adding one never copies the
+    history. Timestamps only grow, so expired messages are always at the
+    front and expiry pops just those: amortized O(1) per call.
+    """
+
+    __slots__ = ("max_size", "ttl_seconds", "conversation_history", "last_used", "summary")
+
+    def __init__(self, max_size: int = 5, ttl_minutes: Optional[float] = 30):
         self.max_size = max_size
-        self.ttl_minutes = ttl_minutes
-        self.conversation_history = []
-    
+        self.ttl_seconds = ttl_minutes * 60 if ttl_minutes else None
+        self.conversation_history = deque(maxlen=max_size)
+        self.last_used = time.monotonic()
+        # Running summary of turns folded out of the buffer by compaction
+        self.summary: Optional[str] = None
+
     def add_message(self, role: str, content: str):
         """Add a message to memory"""
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now()
-        }
-        
-        self.conversation_history.append(message)
-        self._cleanup()
-    
+        now = time.monotonic()
+        self._expire(now)
+        # Tuples rather than dicts keep per-message overhead small and predictable
+        self.conversation_history.append((role, content, now))
+        self.last_used = now
+
     def get_recent_context(self, max_messages: int = 3) -> List[Dict]:
         """Get recent conversation context"""
-        self._cleanup()
-        return self.conversation_history[-max_messages:] if self.conversation_history else []
-    
-    def _cleanup(self):
-        """Remove old messages and enforce size limits"""
-        now = datetime.now()
-        
-        # Remove expired messages
-        self.conversation_history = [
-            msg for msg in self.conversation_history
-            if now - msg["timestamp"] < timedelta(minutes=self.ttl_minutes)
+        now = time.monotonic()
+        self._expire(now)
+        self.last_used = now
+        # Walk back from the newest end: O(max_messages) however long the history is
+        recent = list(islice(reversed(self.conversation_history), max_messages))
+        return [
+            {"role": role, "content": content, "timestamp": timestamp}
+            for role, content, timestamp in reversed(recent)
         ]
-        
-        # Enforce size limit
-        if len(self.conversation_history) > self.max_size:
-            self.conversation_history = self.conversation_history[-self.max_size:]
-    
+
+    def _expire(self, now: float):
+        """Drop expired messages from the old end of the buffer"""
+        if self.ttl_seconds is None:
+            return
+        history = self.conversation_history
+        cutoff = now - self.ttl_seconds
+        while history and history[0][2] < cutoff:
+            history.popleft()
+
+    def __len__(self) -> int:
+        return len(self.conversation_history)
+
+    def fold(self, until: float, summary: str):
+        """Replace messages stamped up to `until` with a running summary"""
+        history = self.conversation_history
+        while history and history[0][2] <= until:
+            history.popleft()
+        self.summary = summary
+
     def clear(self):
         """Clear all memory"""
-        self.conversation_history.clear()
\ No newline at end of file
+        self.conversation_history.clear()
+        self.summary = None
+
+class SessionStore:
+    """Per-user conversation memory with a bounded number of sessions.
+
+    Sessions are kept in least-recently-used order. Creating a session beyond
+    max_sessions evicts the idlest one, and sessions idle for longer than the
+    TTL are dropped a few at a time from the LRU end as the store is used, so
+    RAM stays bounded by max_sessions x max_messages without a sweeper.
+    """
+
+    # Calls only touch this process's memory, so the event loop can make them directly
+    blocking = False
+
+    def __init__(self, max_sessions: int = 100_000, max_messages: int = 5, ttl_minutes: Optional[float] = 30):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_minutes = ttl_minutes
+        self.idle_seconds = ttl_minutes * 60 if ttl_minutes else None
+        self._sessions: "OrderedDict[str, ShortTermMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict_idle(self, now: float, limit: int = 2):
+        # Amortized: each call looks at no more than `limit` sessions at the LRU end
+        if self.idle_seconds is None:
+            return
+        for _ in range(limit):
+            if not self._sessions:
+                return
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.idle_seconds:
+                return
+            del self._sessions[user_id]
+            self.evictions += 1
+
+    def _session(self, user_id: str, create: bool) -> Optional[ShortTermMemory]:
+        self._evict_idle(time.monotonic())
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self._sessions.move_to_end(user_id)
+        elif create:
+            session = self._sessions[user_id] = ShortTermMemory(self.max_messages, self.ttl_minutes)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def add_message(self, user_id: str, role: str, content: str):
+        with self._lock:
+            self._session(user_id, create=True).add_message(role, content)
+
+    def get_context(self, user_id: str, max_messages: int = 3) -> List[Dict]:
+        with self._lock:
+            session = self._session(user_id, create=False)
+            return session.get_recent_context(max_messages) if session else []
+
+    def get_summary(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            session = self._sessions.get(user_id)
+            return session.summary if session else None
+
+    def compaction_candidate(self, user_id: str, threshold: int, keep_recent: int) -> Optional[Tuple[Optional[str], List[Dict]]]:
+        """(current summary, turns to fold) once a session holds more than threshold messages"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None or len(session) <= threshold:
+                return None
+            history = list(session.conversation_history)
+            folded = history[:max(len(history) - keep_recent, 0)]
+            return session.summary, [
+                {"role": role, "content": content, "timestamp": timestamp}
+                for role, content, timestamp in folded
+            ]
+
+    def apply_compaction(self, user_id: str, until: float, summary: str):
+        """Fold messages up to timestamp `until` into the session's summary"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                session.fold(until, summary)
+
+    def clear(self, user_id: Optional[str] = None):
+        """Clear one user's session, or every session when no user is given"""
+        with self._lock:
+            if user_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(user_id, None)
+
+    def close(self):
+        """Nothing to flush; present so backends are interchangeable"""
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            messages = sum(len(session) for session in self._sessions.values())
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "messages": messages,
+            "max_sessions": self.max_sessions,
+            "max_messages_per_session": self.max_messages,
+            "evictions": self.evictions
+        }
+
+async def call_store(store, method: str, *args):
+    """Call a session store method from the event loop without stalling it
+
+    Stores that do file I/O (blocking = True) run the call in a worker
+    thread; the in-process store is called directly.
+    """
+    call = getattr(store, method)
+    if getattr(store, "blocking", False):
+        return await asyncio.to_thread(call, *args)
+    return call(*args)
+
+def create_session_store(max_sessions: int = 100_000, max_messages: int = 5, ttl_minutes: Optional[float] = 30):
+    """Session store for the configured backend: a SQLite file shared by every worker process
+    when SESSION_DB_PATH is set, otherwise this process's memory"""
+    db_path = os.getenv("SESSION_DB_PATH")
+    if db_path:
+        from app.session_db import SQLiteSessionStore
+        return SQLiteSessionStore(
+            db_path, max_sessions=max_sessions, max_messages=max_messages, ttl_minutes=ttl_minutes,
+            cache_size=int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+            flush_interval=float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "0.02"))
+        )
+    return SessionStore(max_sessions=max_sessions, max_messages=max_messages, ttl_minutes=ttl_minutes)
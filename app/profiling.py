@@ -0,0 +1,95 @@
+"""On-demand cProfile capture over the next N requests.
+
+arm(n) starts a profiler with the next request and stops it once n
+requests have finished. The event loop runs every request on one thread,
+so the capture covers everything the worker did in that window:
+requests overlapping the profiled ones are included, which is what a
+flame graph of the worker would show as well.
+"""
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+from typing import Any, Dict, Optional
+
+# Keys pstats can sort a report by ("cumulative", "tottime", "ncalls", ...)
+SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+
+class RequestProfiler:
+    def __init__(self):
+        self._profiler: Optional[cProfile.Profile] = None
+        self._target = 0
+        self._started_requests = 0
+        self._finished_requests = 0
+        self._done: Optional[asyncio.Event] = None
+        self._started_at = 0.0
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def active(self) -> bool:
+        return self._target > 0
+
+    def arm(self, requests: int) -> asyncio.Event:
+        """Profile the next `requests` requests; the event is set when the capture ends"""
+        if self.active:
+            raise RuntimeError("A profile capture is already in progress")
+        self._target = requests
+        self._started_requests = 0
+        self._finished_requests = 0
+        self._done = asyncio.Event()
+        self.last_result = None
+        return self._done
+
+    def request_started(self) -> bool:
+        """Returns whether this request counts towards the capture"""
+        if self._started_requests >= self._target:
+            return False
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._started_at = time.perf_counter()
+            self._profiler.enable()
+        self._started_requests += 1
+        return True
+
+    def request_finished(self, counted: bool):
+        if not counted or self._profiler is None:
+            return
+        self._finished_requests += 1
+        if self._finished_requests >= self._target:
+            self._stop()
+
+    def cancel(self):
+        """End the capture early, keeping whatever was recorded"""
+        if self._profiler is not None:
+            self._stop()
+        else:
+            self._target = 0
+            if self._done:
+                self._done.set()
+
+    def _stop(self):
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        self._target = 0
+        self.last_result = {
+            "requests": self._started_requests,
+            "wall_seconds": round(time.perf_counter() - self._started_at, 4),
+            "stats": profiler
+        }
+        if self._done:
+            self._done.set()
+
+    def report(self, sort: str = "cumulative", limit: int = 40) -> Optional[Dict[str, Any]]:
+        """Aggregated stats of the last capture as pstats text"""
+        if not self.last_result:
+            return None
+        buffer = io.StringIO()
+        stats = pstats.Stats(self.last_result["stats"], stream=buffer)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return {
+            "requests": self.last_result["requests"],
+            "wall_seconds": self.last_result["wall_seconds"],
+            "sort": sort,
+            "profile": buffer.getvalue()
+        }
@@ -0,0 +1,263 @@
+"""Routes a message to search (factual) or straight to the model (conversational).
+
+Both servers share one IntentRouter. By default it scores messages with
+keyword rules compiled into a single token Aho-Corasick automaton, so a
+message is scanned once however many rules there are, and only whole
+words match. Each rule carries a weight; matched weights are combined
+as independent evidence into a confidence in [0, 1], and conversational
+cues ("what do you think", "how are you") pull it back down. A lone weak
+cue such as "year" is no longer enough to trigger a search.
+
+Optionally a small linear model replaces the rules: word unigrams and
+bigrams are hashed into a fixed-size sparse vector and scored by logistic
+regression trained from a labelled JSONL or CSV file. Batches are scored
+with one sparse matrix product. NumPy and SciPy are only imported when a
+model is used.
+
+    python -m app.router train app/router_examples.jsonl --out router.npz
+    python -m app.router classify "What year did the war end?" "Tell me a joke" [--model router.npz]
+"""
+import argparse
+import csv
+import json
+import os
+import string
+import sys
+import zlib
+from typing import TYPE_CHECKING, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.matcher import TokenAhoCorasick, tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class RoutingDecision(NamedTuple):
+    factual: bool
+    # Estimated probability that the message needs a knowledge base lookup
+    confidence: float
+    source: str
+
+SUPERLATIVES = ("largest", "smallest", "biggest", "tallest", "highest", "longest", "deepest", "fastest", "oldest")
+
+# Phrases that suggest a factual question, with the weight of that evidence
+FACTUAL_RULES: List[Tuple[str, float]] = [
+    (phrase, 0.6) for phrase in (
+        "what is", "what are", "what was", "who is", "who was", "when was", "when did", "when is",
+        "where is", "where are", "how many", "how much", "how tall", "how big", "how far", "how old",
+        "how long", "who invented", "who discovered", "who founded", "who wrote", "who painted", "who built",
+        "what language", "what currency", "which country", "which city", "which planet", "which is the"
+    )
+] + [
+    (phrase, 0.8) for phrase in (
+        "capital of", "population of", "height of", "inventor of", "founder of", "speed of", "distance to",
+        "distance from", "chemical symbol", "boiling point", "melting point", "what year", "which year"
+    )
+] + [
+    # With the superlative and a question mark this clears the threshold ("Which ocean is the largest?");
+    # without the question mark it does not ("This is the largest mess I have ever made")
+    (f"{verb} the {superlative}", 0.25) for verb in ("is", "are", "s") for superlative in SUPERLATIVES
+] + [
+    # Weak on their own: "what a year", "my largest worry"
+    (phrase, 0.3) for phrase in ("year",) + SUPERLATIVES
+]
+# Cues that the user is talking to the assistant rather than asking about the world
+CONVERSATIONAL_RULES: List[Tuple[str, float]] = [
+    (phrase, 0.9) for phrase in (
+        "what do you think", "how are you", "what is your", "what are your", "who are you", "tell me a joke",
+        "thank you", "thanks", "what about you", "do you like"
+    )
+]
+# Evidence from a trailing question mark
+QUESTION_MARK_WEIGHT = 0.2
+
+# Punctuation to spaces, so str.split() gives the same words as tokenize() at a fraction of the cost
+_PUNCTUATION = str.maketrans({character: " " for character in string.punctuation if character != "_"})
+
+def _words(text: str) -> List[str]:
+    return text.lower().translate(_PUNCTUATION).split()
+
+class HashingLinearModel:
+    """Logistic regression over hashed word unigrams and bigrams"""
+
+    def __init__(self, weights: "np.ndarray", bias: float, n_features: int):
+        self.weights = weights
+        self.bias = bias
+        self.n_features = n_features
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        tokens = tokenize(text)
+        features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        if text.rstrip().endswith("?"):
+            features.append("?")
+        return features
+
+    @classmethod
+    def vectorize(cls, texts: Sequence[str], n_features: int):
+        """Sparse rows of signed feature hashes, L2-normalized so long messages do not dominate"""
+        import numpy as np
+        from scipy import sparse
+
+        indptr, indices, values = [0], [], []
+        for text in texts:
+            row = {}
+            for feature in cls.features(text):
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                # The top bit picks a sign so colliding features tend to cancel rather than add up
+                column = hashed % n_features
+                row[column] = row.get(column, 0.0) + (1.0 if hashed & 0x80000000 else -1.0)
+            indices.extend(row)
+            values.extend(row.values())
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.array(values, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(texts), n_features)
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+    def predict_proba(self, texts: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+        scores = self.vectorize(texts, self.n_features) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-scores))
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[bool], n_features: int = 1 << 16, epochs: int = 400,
+              learning_rate: float = 4.0, l2: float = 1e-4) -> "HashingLinearModel":
+        """Full-batch gradient descent on the logistic loss; fine for thousands of examples"""
+        import numpy as np
+        matrix = cls.vectorize(texts, n_features)
+        transposed = matrix.T.tocsr()
+        targets = np.asarray(labels, dtype=np.float32)
+        weights = np.zeros(n_features, dtype=np.float32)
+        bias = 0.0
+        count = max(len(texts), 1)
+        for _ in range(epochs):
+            probabilities = 1.0 / (1.0 + np.exp(-(matrix @ weights + bias)))
+            error = probabilities - targets
+            weights -= learning_rate * (transposed @ error / count + l2 * weights)
+            bias -= learning_rate * float(error.mean())
+        return cls(weights, bias, n_features)
+
+    def save(self, path: str):
+        import numpy as np
+        np.savez_compressed(path, weights=self.weights, bias=np.float32(self.bias), n_features=self.n_features)
+
+    @classmethod
+    def load(cls, path: str) -> "HashingLinearModel":
+        import numpy as np
+        with np.load(path) as data:
+            return cls(data["weights"].astype(np.float32), float(data["bias"]), int(data["n_features"]))
+
+def _parse_label(value) -> bool:
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ("factual", "fact", "search", "1", "true", "yes"):
+            return True
+        if value in ("conversational", "chat", "0", "false", "no"):
+            return False
+        raise ValueError(f"Unknown label: {value}")
+    return bool(value)
+
+def read_labelled(path: str) -> Iterator[Tuple[str, bool]]:
+    """(text, is_factual) rows from a .jsonl or .csv file with ``text`` and ``label`` fields"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(handle):
+                yield row["text"], _parse_label(row["label"])
+        else:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["text"], _parse_label(record["label"])
+
+class IntentRouter:
+    def __init__(self, model: Optional[HashingLinearModel] = None, threshold: float = 0.5,
+                 factual_rules: Sequence[Tuple[str, float]] = FACTUAL_RULES,
+                 conversational_rules: Sequence[Tuple[str, float]] = CONVERSATIONAL_RULES):
+        self.model = model
+        self.threshold = threshold
+        self._automaton = TokenAhoCorasick()
+        for phrase, weight in factual_rules:
+            self._automaton.add(phrase, (phrase, weight))
+        for phrase, weight in conversational_rules:
+            self._automaton.add(phrase, (phrase, -weight))
+        self._automaton.build()
+
+    def rule_confidence(self, text: str) -> float:
+        """Noisy-OR of matched factual weights, discounted by matched conversational cues"""
+        factual_miss = 1.0
+        conversational_miss = 1.0
+        # Each rule counts once, however often its phrase occurs
+        matched = {rule for _, _, rule in self._automaton.find_all(_words(text))}
+        for _, weight in matched:
+            if weight > 0:
+                factual_miss *= 1.0 - weight
+            else:
+                conversational_miss *= 1.0 + weight
+        if text.rstrip().endswith("?"):
+            factual_miss *= 1.0 - QUESTION_MARK_WEIGHT
+        return (1.0 - factual_miss) * conversational_miss
+
+    def _decision(self, confidence: float, source: str) -> RoutingDecision:
+        return RoutingDecision(confidence >= self.threshold, round(confidence, 4), source)
+
+    def classify(self, text: str) -> RoutingDecision:
+        if self.model is not None:
+            return self.classify_batch([text])[0]
+        return self._decision(self.rule_confidence(text), "rules")
+
+    def classify_batch(self, texts: Sequence[str]) -> List[RoutingDecision]:
+        """Decisions in input order; with a model every text is scored in one matrix product"""
+        if not texts:
+            return []
+        if self.model is None:
+            return [self._decision(self.rule_confidence(text), "rules") for text in texts]
+        return [self._decision(float(p), "model") for p in self.model.predict_proba(texts)]
+
+    def is_factual(self, text: str) -> bool:
+        return self.classify(text).factual
+
+def create_router() -> IntentRouter:
+    """Router for the configured backend: the linear model at ROUTER_MODEL_PATH when set (a saved
+    .npz, or a labelled .jsonl/.csv file to train from at startup), otherwise the keyword rules"""
+    threshold = float(os.getenv("ROUTER_THRESHOLD", "0.5"))
+    model_path = os.getenv("ROUTER_MODEL_PATH")
+    if not model_path:
+        return IntentRouter(threshold=threshold)
+    if model_path.endswith(".npz"):
+        model = HashingLinearModel.load(model_path)
+    else:
+        texts, labels = zip(*read_labelled(model_path))
+        model = HashingLinearModel.train(texts, labels)
+    return IntentRouter(model=model, threshold=threshold)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train or try the factual/conversational router")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="fit the linear model on a labelled JSONL or CSV file")
+    train_parser.add_argument("path")
+    train_parser.add_argument("--out", default="router.npz")
+    train_parser.add_argument("--features", type=int, default=1 << 16)
+    train_parser.add_argument("--epochs", type=int, default=400)
+    classify_parser = commands.add_parser("classify", help="route messages with the rules or a saved model")
+    classify_parser.add_argument("texts", nargs="+")
+    classify_parser.add_argument("--model", help="saved .npz model (default: keyword rules)")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        texts, labels = zip(*read_labelled(args.path))
+        model = HashingLinearModel.train(texts, labels, n_features=args.features, epochs=args.epochs)
+        router = IntentRouter(model=model)
+        correct = sum(decision.factual == label for decision, label in zip(router.classify_batch(texts), labels))
+        model.save(args.out)
+        print(f"✅ Trained on {len(texts)} examples ({correct / len(texts):.1%} training accuracy), saved to {args.out}")
+    else:
+        router = IntentRouter(model=HashingLinearModel.load(args.model) if args.model else None)
+        for text, decision in zip(args.texts, router.classify_batch(args.texts)):
+            label = "factual" if decision.factual else "conversational"
+            print(f"{decision.confidence:6.3f}  {label:<14}  {text}")
+
+if __name__ == "__main__":
+    sys.exit(main())
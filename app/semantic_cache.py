@@ -0,0 +1,193 @@
+"""Answer cache that also matches paraphrases of a cached question.
+
+Questions are embedded on the CPU by hashing word unigrams and character
+trigrams (with common question words dropped) into a fixed-size, L2
+normalized vector. Entries live in one preallocated NumPy matrix, so a
+lookup is a single matrix-vector product over the candidate rows followed
+by an argmax; it returns the cached answer when the cosine similarity is
+at least the threshold.
+
+Entries are partitioned by scope, and only rows in the question's own
+scope are candidates:
+
+- factual answers are scoped by the knowledge base result they were
+  written from, so "capital of France" can never match "capital of Spain"
+  (different search results) however similar the wording
+- conversational answers are scoped by user, so they are never served
+  to anyone else
+- within either, by the kind of question: its interrogative (who, when,
+  where, why, how) and any numbers in it. "When was Microsoft founded?"
+  and "Who founded Microsoft?", or "population of China in 1950" and
+  "population of China", share nearly every word yet want different answers
+
+Capacity is fixed; when it is full the least recently used entry is
+evicted. Entries expire after a TTL. NumPy is imported on first use.
+"""
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from app.matcher import tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Dropped before embedding: they say nothing about which fact is being asked for
+STOPWORDS = frozenset((
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "is", "are", "was", "were", "be", "s", "do", "does",
+    "did", "what", "whats", "which", "who", "whos", "please", "tell", "me", "can", "you", "could", "i", "know",
+    "want", "about", "and", "or", "its", "it"
+))
+# Character trigrams count for less than whole words; they catch plurals and small spelling changes
+TRIGRAM_WEIGHT = 0.5
+# Interrogatives that change what is being asked; "what" and "which" do not ("capital of France?" means the same)
+QUESTION_WORDS = {"who": "who", "whos": "who", "whom": "who", "whose": "who", "when": "when", "where": "where",
+                  "why": "why", "how": "how"}
+
+class HashingEmbedder:
+    """Signed feature hashing of words and character trigrams into `dimensions` floats"""
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    @staticmethod
+    def features(text: str) -> List[Tuple[str, float]]:
+        words = [word for word in tokenize(text) if word not in STOPWORDS]
+        features = [(word, 1.0) for word in words]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend((f"#{padded[i:i + 3]}", TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> "np.ndarray":
+        import numpy as np
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self.features(text):
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            vector[hashed % self.dimensions] += weight if hashed & 0x80000000 else -weight
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+class SemanticCache:
+    def __init__(self, capacity: int = 4096, threshold: float = 0.9, ttl_seconds: float = 3600.0,
+                 embedder: Optional[HashingEmbedder] = None):
+        import numpy as np
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.embedder = embedder or HashingEmbedder()
+        self._vectors = np.zeros((capacity, self.embedder.dimensions), dtype=np.float32)
+        self._last_used = np.full(capacity, -np.inf)
+        self._expires_at = np.zeros(capacity)
+        self._answers: List[Any] = [None] * capacity
+        self._slot_scope: List[Optional[Tuple[str, str, str]]] = [None] * capacity
+        self._scopes: Dict[Tuple[str, str, str], List[int]] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def question_kind(question: str) -> str:
+        """First interrogative and every number in the question, e.g. "when 1950"; "" for neither"""
+        words = tokenize(question)
+        asked = next((QUESTION_WORDS[word] for word in words if word in QUESTION_WORDS), "")
+        return " ".join([asked] + [word for word in words if word.isdigit()]).strip()
+
+    @classmethod
+    def scope(cls, question: str, used_tool: bool, tool_result: Optional[str], user_id: str) -> Tuple[str, str, str]:
+        """Factual answers are shared by everyone who got the same search result; the rest stay per user"""
+        kind = cls.question_kind(question)
+        return ("fact", tool_result or "", kind) if used_tool else ("user", user_id, kind)
+
+    def _release(self, slot: int):
+        scope = self._slot_scope[slot]
+        slots = self._scopes[scope]
+        slots.remove(slot)
+        if not slots:
+            del self._scopes[scope]
+        self._slot_scope[slot] = self._answers[slot] = None
+        self._last_used[slot] = float("-inf")
+        self._free.append(slot)
+
+    def get(self, question: str, used_tool: bool, tool_result: Optional[str] = None,
+            user_id: str = "default") -> Optional[Any]:
+        """The answer cached for the most similar question in this scope, if similar enough"""
+        vector = self.embedder.embed(question)
+        scope = self.scope(question, used_tool, tool_result, user_id)
+        now = time.monotonic()
+        with self._lock:
+            slot, similarity = self._nearest(scope, vector)
+            if slot is None or similarity < self.threshold:
+                self.misses += 1
+                return None
+            if self._expires_at[slot] <= now:
+                self._release(slot)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._answers[slot]
+
+    def _nearest(self, scope: Tuple[str, str, str], vector: "np.ndarray") -> Tuple[Optional[int], float]:
+        """Slot and cosine similarity of the closest entry in the scope, in one matrix-vector product"""
+        import numpy as np
+        slots = self._scopes.get(scope)
+        if not slots:
+            return None, 0.0
+        candidates = np.fromiter(slots, dtype=np.intp, count=len(slots))
+        if len(slots) * 4 > self.capacity:
+            # Multiplying every row beats copying out a large share of them first
+            similarities = (self._vectors @ vector)[candidates]
+        else:
+            similarities = self._vectors[candidates] @ vector
+        best = int(np.argmax(similarities))
+        return int(candidates[best]), float(similarities[best])
+
+    def put(self, question: str, used_tool: bool, tool_result: Optional[str], answer: Any,
+            user_id: str = "default"):
+        vector = self.embedder.embed(question)
+        scope = self.scope(question, used_tool, tool_result, user_id)
+        now = time.monotonic()
+        with self._lock:
+            slot, similarity = self._nearest(scope, vector)
+            if slot is None or similarity < self.threshold:
+                # A paraphrase of a cached question refreshes that entry instead of taking a new slot
+                if not self._free:
+                    # Least recently used goes first; expired entries have usually aged out by then too
+                    self._release(int(self._last_used.argmin()))
+                    self.evictions += 1
+                slot = self._free.pop()
+                self._vectors[slot] = vector
+                self._slot_scope[slot] = scope
+                self._scopes.setdefault(scope, []).append(slot)
+            self._last_used[slot] = now
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._answers[slot] = answer
+
+    def clear(self):
+        """Drop every entry, e.g. after the knowledge base changed"""
+        with self._lock:
+            for slot in [slot for slots in self._scopes.values() for slot in slots]:
+                self._release(slot)
+
+    def __len__(self) -> int:
+        return self.capacity - len(self._free)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
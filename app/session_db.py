@@ -0,0 +1,358 @@
+"""Conversation memory in a SQLite file shared by every worker process.
+
+With several uvicorn workers a user's follow-up usually lands on a process
+that never saw the earlier turns, so the in-process SessionStore forgets
+them. SQLiteSessionStore keeps the same interface over one database file in
+WAL mode, where readers never block the writer:
+
+- add_message() only queues the row; a background thread commits queued
+  rows in one transaction every flush_interval seconds (or sooner once
+  flush_batch rows are waiting), so a burst of turns costs one fsync.
+- Hot sessions are served from a small in-process LRU cache. It stays
+  valid while no other process has written: SQLite's data_version pragma
+  reports that without reading any table, and the cache is dropped as soon
+  as it changes.
+- The same thread deletes expired messages and idle sessions every
+  sweep_interval seconds, so no request pays for TTL expiry.
+- While another process holds SQLite's write lock, the writer waits for it
+  without holding the store's own lock, so requests keep reading sessions
+  and queueing turns. Queued rows leave the queue only once their
+  transaction has committed.
+- Every call may wait on SQLite or on the writer thread, so async callers
+  go through app.memory.call_store(), which runs them in a worker thread.
+
+Timestamps are wall-clock (time.time()) because they are compared across
+processes. Another worker sees a turn once it has been flushed, i.e.
+within flush_interval.
+"""
+import atexit
+import contextlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_user ON messages(user_id, id);
+CREATE INDEX IF NOT EXISTS messages_by_age ON messages(created);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT PRIMARY KEY,
+    summary TEXT,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_age ON sessions(last_used);
+"""
+
+# Reads may wait this long for SQLite; writes wait for its write lock in _writing() instead
+BUSY_TIMEOUT_MS = 10_000
+
+# (role, content, timestamp), oldest first
+Turn = Tuple[str, str, float]
+
+class _CachedSession:
+    __slots__ = ("turns", "summary")
+
+    def __init__(self, turns: List[Turn], summary: Optional[str]):
+        self.turns = turns
+        self.summary = summary
+
+class SQLiteSessionStore:
+    """SessionStore backed by a SQLite file; safe to share between processes"""
+
+    # Calls do file I/O and can wait up to lock_timeout for SQLite's write lock
+    blocking = True
+
+    def __init__(self, db_path: str, max_sessions: int = 100_000, max_messages: int = 5,
+                 ttl_minutes: Optional[float] = 30, cache_size: int = 1024, flush_interval: float = 0.02,
+                 flush_batch: int = 256, sweep_interval: float = 60.0, lock_timeout: float = 10.0):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_minutes * 60 if ttl_minutes else None
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.sweep_interval = sweep_interval
+        self.lock_timeout = lock_timeout
+        # One connection for reads and writes, so our own commits do not look like another process's
+        self._connection = sqlite3.connect(
+            db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        # _lock guards the connection and in-memory state; _write_lock lets one writer at a time wait for SQLite's
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._data_version = self._read_data_version()
+        self._wake = threading.Event()
+        self._closed = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flushes = 0
+        self.expired = 0
+        self._writer = threading.Thread(target=self._run_writer, name="session-db-writer", daemon=True)
+        self._writer.start()
+        # Processes without a lifespan hook (app.main) still flush their last turns on exit
+        atexit.register(self.close)
+
+    def _read_data_version(self) -> int:
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cutoff(self, now: float) -> float:
+        return now - self.ttl_seconds if self.ttl_seconds else float("-inf")
+
+    def _check_cache(self):
+        # Another process committed since we last looked: anything cached may be stale
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    def _load(self, user_id: str) -> _CachedSession:
+        """The session as stored plus our unflushed turns, through the read cache"""
+        self._check_cache()
+        session = self._cache.get(user_id)
+        if session is not None:
+            self._cache.move_to_end(user_id)
+            self.cache_hits += 1
+            return session
+        self.cache_misses += 1
+        rows = self._connection.execute(
+            "SELECT role, content, created FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, self.max_messages)
+        ).fetchall()
+        turns = [tuple(row) for row in reversed(rows)]
+        turns += [(role, content, created) for pending_user, role, content, created in self._pending if pending_user == user_id]
+        summary_row = self._connection.execute("SELECT summary FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        session = _CachedSession(turns[-self.max_messages:], summary_row[0] if summary_row else None)
+        self._cache[user_id] = session
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return session
+
+    def add_message(self, user_id: str, role: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._pending.append((user_id, role, content, now))
+            session = self._cache.get(user_id)
+            if session is not None:
+                session.turns.append((role, content, now))
+                del session.turns[:-self.max_messages]
+            queued = len(self._pending)
+        if queued >= self.flush_batch:
+            self._wake.set()
+
+    def get_context(self, user_id: str, max_messages: int = 3) -> List[Dict]:
+        cutoff = self._cutoff(time.time())
+        with self._lock:
+            turns = self._load(user_id).turns
+            recent = turns[max(len(turns) - max_messages, 0):]
+        return [
+            {"role": role, "content": content, "timestamp": timestamp}
+            for role, content, timestamp in recent if timestamp >= cutoff
+        ]
+
+    def get_summary(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            return self._load(user_id).summary
+
+    def compaction_candidate(self, user_id: str, threshold: int, keep_recent: int) -> Optional[Tuple[Optional[str], List[Dict]]]:
+        """(current summary, turns to fold) once a session holds more than threshold messages"""
+        cutoff = self._cutoff(time.time())
+        with self._lock:
+            session = self._load(user_id)
+            turns = [turn for turn in session.turns if turn[2] >= cutoff]
+            if len(turns) <= threshold:
+                return None
+            folded = turns[:max(len(turns) - keep_recent, 0)]
+            return session.summary, [
+                {"role": role, "content": content, "timestamp": timestamp}
+                for role, content, timestamp in folded
+            ]
+
+    def apply_compaction(self, user_id: str, until: float, summary: str):
+        """Fold messages up to timestamp `until` into the session's summary"""
+        with self._writing():
+            with self._connection:
+                self._write_pending()
+                self._connection.execute("DELETE FROM messages WHERE user_id = ? AND created <= ?", (user_id, until))
+                self._connection.execute(
+                    "INSERT INTO sessions(user_id, summary, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET summary = excluded.summary, last_used = excluded.last_used",
+                    (user_id, summary, time.time())
+                )
+            self._pending = []
+            session = self._cache.get(user_id)
+            if session is not None:
+                session.turns = [turn for turn in session.turns if turn[2] > until]
+                session.summary = summary
+
+    def clear(self, user_id: Optional[str] = None):
+        """Clear one user's session, or every session when no user is given"""
+        with self._writing():
+            with self._connection:
+                self._write_pending()
+                if user_id is None:
+                    self._connection.execute("DELETE FROM messages")
+                    self._connection.execute("DELETE FROM sessions")
+                else:
+                    self._connection.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+                    self._connection.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            self._pending = []
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Open a write transaction and hold _lock until the block ends
+
+        isolation_level=None leaves transactions to us: the body commits or
+        rolls back with `with self._connection:`. Waiting for another process
+        to release SQLite's write lock happens with _lock released; each
+        attempt fails fast instead of busy-waiting inside SQLite, which would
+        block every request reading a session on this connection.
+        Raises sqlite3.OperationalError after lock_timeout seconds.
+        """
+        with self._write_lock:
+            deadline = time.monotonic() + self.lock_timeout
+            delay = 0.001
+            while True:
+                self._lock.acquire()
+                self._connection.execute("PRAGMA busy_timeout = 0")
+                try:
+                    self._connection.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError:
+                    self._connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+                    self._lock.release()
+                    if time.monotonic() >= deadline:
+                        raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            try:
+                self._connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+                yield
+            finally:
+                if self._connection.in_transaction:
+                    self._connection.rollback()
+                self._lock.release()
+
+    def _write_pending(self):
+        """Insert queued turns and trim each touched session to max_messages; the caller commits"""
+        if not self._pending:
+            return
+        users = {user_id: created for user_id, _, _, created in self._pending}
+        self._connection.executemany(
+            "INSERT INTO messages(user_id, role, content, created) VALUES (?, ?, ?, ?)", self._pending
+        )
+        self._connection.executemany(
+            "INSERT INTO sessions(user_id, last_used) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET last_used = excluded.last_used",
+            users.items()
+        )
+        self._connection.executemany(
+            "DELETE FROM messages WHERE user_id = ? AND id < "
+            "(SELECT min(id) FROM (SELECT id FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT ?))",
+            [(user_id, user_id, self.max_messages) for user_id in users]
+        )
+
+    def flush(self):
+        """Make queued turns visible to other processes now
+
+        Queued turns are dropped from the queue only after their transaction
+        commits; if SQLite stays locked they wait for the next flush.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+        with self._writing():
+            with self._connection:
+                self._write_pending()
+            self._pending = []
+            self.flushes += 1
+
+    def sweep(self):
+        """Delete expired messages, idle sessions and sessions beyond max_sessions"""
+        now = time.time()
+        with self._writing():
+            with self._connection:
+                self._write_pending()
+                if self.ttl_seconds:
+                    cutoff = now - self.ttl_seconds
+                    expired = self._connection.execute("DELETE FROM messages WHERE created < ?", (cutoff,)).rowcount
+                    self._connection.execute("DELETE FROM sessions WHERE last_used < ?", (cutoff,))
+                    self.expired += max(expired, 0)
+                (sessions,) = self._connection.execute("SELECT count(*) FROM sessions").fetchone()
+                if sessions > self.max_sessions:
+                    self._connection.execute(
+                        "DELETE FROM messages WHERE user_id IN "
+                        "(SELECT user_id FROM sessions ORDER BY last_used LIMIT ?)", (sessions - self.max_sessions,)
+                    )
+                    self._connection.execute(
+                        "DELETE FROM sessions WHERE user_id IN "
+                        "(SELECT user_id FROM sessions ORDER BY last_used LIMIT ?)", (sessions - self.max_sessions,)
+                    )
+            self._pending = []
+            self._cache.clear()
+
+    def _run_writer(self):
+        next_sweep = time.monotonic() + self.sweep_interval
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.sweep_interval
+                    self.sweep()
+            except sqlite3.Error:
+                # Locked or busy for longer than the timeout; the rows stay queued for the next round
+                pass
+
+    def close(self):
+        """Flush queued turns and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT count(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (sessions,) = self._connection.execute("SELECT count(*) FROM sessions").fetchone()
+            (messages,) = self._connection.execute("SELECT count(*) FROM messages").fetchone()
+            pending = len(self._pending)
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "messages": messages + pending,
+            "max_sessions": self.max_sessions,
+            "max_messages_per_session": self.max_messages,
+            "pending_writes": pending,
+            "flushes": self.flushes,
+            "expired": self.expired,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses
+        }
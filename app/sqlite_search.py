@@ -0,0 +1,223 @@
+"""Disk-backed search tool over a SQLite FTS5 index.
+
+The index lives in a single SQLite file that is memory-mapped read-only by
+every worker, so millions of facts cost page cache rather than per-process
+heap, and startup does not depend on knowledge base size.
+
+Bulk import (JSONL lines or CSV rows with ``key`` and ``answer`` fields):
+
+    python -m app.sqlite_search --db knowledge.db import facts.jsonl
+    python -m app.sqlite_search --db knowledge.db search "capital of france"
+
+Each key is stored once: importing or adding a fact under an existing key
+replaces it. FTS5 can only find a key by full scan, so a plain fact_keys
+table maps every key to its row and replacements delete by rowid.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from app.matcher import content_tokens, key_coverage
+
+# Terms matching at least this many facts are too common to drive candidate retrieval
+COMMON_TERM_DOCS = 1_000
+# Memory-map up to this many bytes of the index instead of reading pages into the heap
+DEFAULT_MMAP_BYTES = 1 << 30
+IMPORT_BATCH_SIZE = 10_000
+
+def create_index(db_path: str) -> sqlite3.Connection:
+    """Open (creating if needed) an index database for writing"""
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS facts USING fts5(key, answer, tokenize='porter unicode61')"
+    )
+    create_key_map(connection)
+    return connection
+
+def create_key_map(connection: sqlite3.Connection):
+    """Create the key -> rowid table, filling it from the facts of an index built without one"""
+    with connection:
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'fact_keys'").fetchone()
+        if exists:
+            return
+        connection.execute("CREATE TABLE fact_keys (key TEXT PRIMARY KEY, fact_rowid INTEGER NOT NULL)")
+        connection.execute("INSERT OR REPLACE INTO fact_keys(key, fact_rowid) SELECT key, rowid FROM facts ORDER BY rowid")
+
+def _replace_imported(connection: sqlite3.Connection, first_rowid: int):
+    """Map keys inserted from first_rowid on, dropping the rows they replace (earlier duplicates included)"""
+    connection.execute(
+        "DELETE FROM facts WHERE rowid IN (SELECT fact_rowid FROM fact_keys WHERE key IN "
+        "(SELECT key FROM facts WHERE rowid >= ?))", (first_rowid,)
+    )
+    connection.execute(
+        "DELETE FROM facts WHERE rowid >= ? AND rowid NOT IN "
+        "(SELECT max(rowid) FROM facts WHERE rowid >= ? GROUP BY key)", (first_rowid, first_rowid)
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO fact_keys(key, fact_rowid) "
+        "SELECT key, rowid FROM facts WHERE rowid >= ?", (first_rowid,)
+    )
+
+def read_fact_rows(path: str) -> Iterator[Tuple[str, str]]:
+    """Stream (key, answer) rows from a .jsonl or .csv dump without loading it whole"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(handle):
+                yield row["key"], row["answer"]
+        else:
+            for line in handle:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["key"], record["answer"]
+
+def bulk_import(db_path: str, rows: Iterable[Tuple[str, str]], batch_size: int = IMPORT_BATCH_SIZE) -> int:
+    """Insert rows in large batches inside one transaction; returns the row count"""
+    connection = create_index(db_path)
+    connection.execute("PRAGMA synchronous=OFF")
+    count = 0
+    batch = []
+    with connection:
+        last = connection.execute("SELECT rowid FROM facts ORDER BY rowid DESC LIMIT 1").fetchone()
+        first_rowid = last[0] + 1 if last else 1
+        for key, answer in rows:
+            batch.append((key.lower().strip(), answer))
+            if len(batch) >= batch_size:
+                connection.executemany("INSERT INTO facts(key, answer) VALUES (?, ?)", batch)
+                count += len(batch)
+                batch.clear()
+        if batch:
+            connection.executemany("INSERT INTO facts(key, answer) VALUES (?, ?)", batch)
+            count += len(batch)
+        _replace_imported(connection, first_rowid)
+        connection.execute("INSERT INTO facts(facts) VALUES ('optimize')")
+    connection.close()
+    return count
+
+class SQLiteSearchTool:
+    """Ranked top-k retrieval over an FTS5 index with the SearchTool interface"""
+
+    def __init__(self, db_path: str, min_coverage: float = 0.6, candidates: int = 20,
+                 common_term_docs: int = COMMON_TERM_DOCS, mmap_bytes: int = DEFAULT_MMAP_BYTES):
+        if not os.path.exists(db_path):
+            create_index(db_path).close()
+        self.db_path = db_path
+        self.min_coverage = min_coverage
+        self.candidates = candidates
+        self.common_term_docs = common_term_docs
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._change_listeners: List[Callable[[], None]] = []
+        self._key_map_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections are per-thread; the mapped pages are shared by all of them
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path)
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._local.connection = connection
+        return connection
+
+    def on_change(self, callback: Callable[[], None]):
+        """Register a callback to run whenever the knowledge base is modified"""
+        self._change_listeners.append(callback)
+
+    def add_fact(self, key: str, answer: str):
+        """Add or replace a fact and notify listeners (e.g. to flush answer caches)"""
+        connection = self._connection()
+        if not self._key_map_ready:
+            create_key_map(connection)
+            self._key_map_ready = True
+        key = key.lower().strip()
+        with connection:
+            replaced = connection.execute("SELECT fact_rowid FROM fact_keys WHERE key = ?", (key,)).fetchone()
+            if replaced:
+                connection.execute("DELETE FROM facts WHERE rowid = ?", replaced)
+            rowid = connection.execute("INSERT INTO facts(key, answer) VALUES (?, ?)", (key, answer)).lastrowid
+            connection.execute("INSERT OR REPLACE INTO fact_keys(key, fact_rowid) VALUES (?, ?)", (key, rowid))
+        for callback in self._change_listeners:
+            callback()
+
+    def _match_expression(self, tokens: List[str]) -> str:
+        """FTS5 query over the selective tokens.
+
+        Scoring an OR that includes a term like "capital" would rank every
+        fact containing it, so common terms only take part when the query has
+        nothing rarer; then all tokens must match, which keeps the set to rank
+        as small as the query allows. Prefix queries let the porter stemmer
+        line up "invented" with "inventor".
+        """
+        connection = self._connection()
+        rare = []
+        for token in tokens:
+            (count,) = connection.execute(
+                "SELECT count(*) FROM (SELECT 1 FROM facts WHERE facts MATCH ? LIMIT ?)",
+                (f'"{token}"', self.common_term_docs)
+            ).fetchone()
+            if count < self.common_term_docs:
+                rare.append(token)
+        if rare:
+            return " OR ".join(f'"{token}"*' for token in rare)
+        return " AND ".join(f'"{token}"*' for token in tokens)
+
+    def search_topk(self, query: str, k: int = 5) -> List[Tuple[str, str, float]]:
+        """Top-k (key, answer, score) hits, best first.
+
+        FTS5 BM25 (key column weighted up) picks the candidates; they are then
+        re-ranked by how much of each key the query actually covers, and hits
+        below min_coverage are dropped so one shared word is not an answer.
+        """
+        tokens = list(dict.fromkeys(content_tokens(query)))
+        if not tokens:
+            return []
+        # Always ranked: an unordered LIMIT over common terms keeps arbitrary rows and can miss the right one
+        rows = self._connection().execute(
+            "SELECT key, answer, bm25(facts, 5.0, 1.0) AS score FROM facts WHERE facts MATCH ? ORDER BY score LIMIT ?",
+            (self._match_expression(tokens), max(k, self.candidates))
+        ).fetchall()
+
+        ranked = []
+        for key, answer, score in rows:
+            coverage = key_coverage(key, tokens)
+            if coverage >= self.min_coverage:
+                # bm25() is lower-is-better; flip it so higher scores rank first
+                ranked.append((coverage, -score, key, answer))
+        ranked.sort(reverse=True)
+        return [(key, answer, round(coverage * bm25, 4)) for coverage, bm25, key, answer in ranked[:k]]
+
+    def search(self, query: str) -> str:
+        """Search for factual information in the knowledge base"""
+        hits = self.search_topk(query, k=1)
+        if hits:
+            return hits[0][1]
+        return f"I couldn't find specific information about '{query}'. Please try another factual question."
+
+    def __call__(self, query: str) -> str:
+        return self.search(query)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build or query the SQLite FTS5 knowledge index")
+    parser.add_argument("--db", default=os.getenv("SEARCH_DB_PATH", "knowledge.db"), help="index database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="bulk import a JSONL or CSV fact dump")
+    import_parser.add_argument("path")
+    search_parser = commands.add_parser("search", help="run a query against the index")
+    search_parser.add_argument("query")
+    search_parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        count = bulk_import(args.db, read_fact_rows(args.path))
+        print(f"✅ Imported {count} facts into {args.db}")
+    else:
+        for key, answer, score in SQLiteSearchTool(args.db).search_topk(args.query, args.k):
+            print(f"{score:8.3f}  {key}: {answer}")
+
+if __name__ == "__main__":
+    sys.exit(main())
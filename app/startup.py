@@ -0,0 +1,127 @@
+"""Lazy client creation and startup tracking for liveness vs readiness.
+
+Heavy SDKs (groq, openai) are imported and their clients built on first
+use or during the warm-up phase, not when the server module is imported.
+A failed creation, such as a missing API key, is retried after a pause
+instead of leaving the process without a client until it restarts.
+
+Warm-up runs as a background task started from the lifespan hook, so the
+server accepts connections (and answers liveness probes) at once while
+readiness reports 503 until every phase has finished.
+"""
+import asyncio
+import inspect
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union
+
+from app.logs import get_logger
+
+log = get_logger("startup")
+
+T = TypeVar("T")
+
+# Measured from import of this module, which every server does first thing
+PROCESS_STARTED = time.monotonic()
+
+class LazyClient(Generic[T]):
+    def __init__(self, name: str, factory: Callable[[], T], retry_seconds: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.retry_seconds = retry_seconds
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self.error: Optional[str] = None
+        self.init_seconds: Optional[float] = None
+
+    def peek(self) -> Optional[T]:
+        """The client if it has been created, without trying to create it"""
+        return self._value
+
+    def get(self) -> Optional[T]:
+        """The client, created now if needed; None while creation keeps failing"""
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None and time.monotonic() >= self._retry_at:
+                started = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                    self.error = None
+                    self.init_seconds = round(time.perf_counter() - started, 4)
+                    log.info("client_ready", client=self.name, seconds=self.init_seconds)
+                except Exception as e:
+                    self.error = str(e)
+                    self._retry_at = time.monotonic() + self.retry_seconds
+                    log.error("client_unavailable", client=self.name, error=self.error, retry_in=self.retry_seconds)
+            return self._value
+
+    def reset(self) -> Optional[T]:
+        """Forget the client (returned so the caller can close it)"""
+        with self._lock:
+            value, self._value = self._value, None
+            self._retry_at = 0.0
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ready": self._value is not None, "error": self.error, "init_seconds": self.init_seconds}
+
+Phase = Tuple[str, Callable[[], Union[Any, Awaitable[Any]]]]
+
+class StartupState:
+    """Runs startup phases in the background and reports whether they are done"""
+
+    def __init__(self):
+        self.ready = False
+        self.ready_after_seconds: Optional[float] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_phase(self, name: str, step: Callable[[], Union[Any, Awaitable[Any]]]):
+        """Run one step, recording its duration; a failed step is logged but does not stop startup"""
+        started = time.perf_counter()
+        record: Dict[str, Any] = {}
+        try:
+            result = step()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            record["error"] = str(e)
+            log.warning("startup_phase_failed", phase=name, error=str(e))
+        record["seconds"] = round(time.perf_counter() - started, 4)
+        self.phases[name] = record
+
+    async def _run(self, phases: List[Phase]):
+        for name, step in phases:
+            await self.run_phase(name, step)
+        self.ready = True
+        self.ready_after_seconds = round(time.monotonic() - PROCESS_STARTED, 4)
+        log.info("ready", seconds=self.ready_after_seconds, phases=self.phases)
+
+    def begin(self, phases: List[Phase]) -> asyncio.Task:
+        """Start the phases on the running loop; the server keeps serving meanwhile"""
+        self._task = asyncio.get_running_loop().create_task(self._run(phases))
+        return self._task
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._task is not None:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        return self.ready
+
+    async def stop(self):
+        """Cancel unfinished warm-up at shutdown"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.monotonic() - PROCESS_STARTED, 3),
+            "ready_after_seconds": self.ready_after_seconds,
+            "phases": self.phases
+        }
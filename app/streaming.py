@@ -0,0 +1,16 @@
+import json
+import re
+from typing import Any, Optional
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Encode a payload as a single Server-Sent Events message"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    # The line breaks SSE itself knows; splitlines() would also split tokens on U+2028, U+0085 and the like
+    for line in _LINE_BREAK.split(payload):
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.memory import SessionStore, call_store
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the previous summary (if any) with the new turns into one short paragraph.
+Keep names, facts, preferences and open questions; drop pleasantries."""
+
+# (previous summary, turns to fold) -> new summary, or None if it could not be produced
+Summarizer = Callable[[Optional[str], List[Dict]], Awaitable[Optional[str]]]
+
+def summary_request(previous_summary: Optional[str], turns: List[Dict]) -> List[Dict]:
+    """Message list asking a chat model to fold turns into the running summary"""
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    content = f"Previous summary: {previous_summary}\n\n" if previous_summary else ""
+    content += f"New turns:\n{transcript}\n\nUpdated summary:"
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": content}
+    ]
+
+class ConversationCompactor:
+    """Folds old turns into a running summary, off the request path.
+
+    After a reply is stored, maybe_schedule() checks the session size; past
+    the threshold it starts a background task that summarizes everything but
+    the newest keep_recent turns and swaps them for the summary. At most one
+    compaction runs per user, and a failed summary leaves the history as is.
+    """
+
+    def __init__(self, store: SessionStore, summarize: Summarizer, threshold: int = 8, keep_recent: int = 4):
+        if keep_recent >= threshold:
+            raise ValueError("keep_recent must be smaller than threshold")
+        self.store = store
+        self.summarize = summarize
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def maybe_schedule(self, user_id: str) -> Optional[asyncio.Task]:
+        """Start a compaction for this user if one is due; needs a running event loop"""
+        if user_id in self._in_flight:
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread; the next call from the loop will pick it up
+            return None
+        if getattr(self.store, "blocking", False):
+            # Checking the session size reads the database too, so the task does it off the loop
+            task = loop.create_task(self._check_and_compact(user_id))
+        else:
+            candidate = self.store.compaction_candidate(user_id, self.threshold, self.keep_recent)
+            if candidate is None:
+                return None
+            task = loop.create_task(self._compact(user_id, *candidate))
+        self._in_flight[user_id] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(user_id, None))
+        return task
+
+    async def _check_and_compact(self, user_id: str):
+        candidate = await call_store(self.store, "compaction_candidate", user_id, self.threshold, self.keep_recent)
+        if candidate is not None:
+            await self._compact(user_id, *candidate)
+
+    async def _compact(self, user_id: str, previous_summary: Optional[str], turns: List[Dict]):
+        if not turns:
+            return
+        try:
+            summary = await self.summarize(previous_summary, turns)
+        except Exception:
+            summary = None
+        if not summary:
+            self.failed += 1
+            return
+        await call_store(self.store, "apply_compaction", user_id, turns[-1]["timestamp"], summary.strip())
+        self.completed += 1
+
+    async def drain(self):
+        """Wait for every in-flight compaction (shutdown and tests)"""
+        tasks: Set[asyncio.Task] = set(self._in_flight.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threshold": self.threshold,
+            "keep_recent": self.keep_recent,
+            "in_flight": len(self._in_flight),
+            "completed": self.completed,
+            "failed": self.failed
+        }
@@ -1,9 +1,23 @@
-from typing import Dict
+import os
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from app.matcher import content_tokens, key_coverage
 
 class SearchTool:
-    """Simple dictionary-based search tool for factual queries"""
+    """Simple dictionary-based search tool for factual queries.
+    
+    mode="substring" (default) returns the first entry whose key and the query
+    contain one another. mode="bm25" ranks every entry with BM25 instead and
+    falls back to substring matching when nothing ranks well enough.
+    """
     
-    def __init__(self):
+    def __init__(self, mode: str = "substring", min_coverage: float = 0.6):
+        if mode not in ("substring", "bm25"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        self.mode = mode
+        self.min_coverage = min_coverage
+        self._bm25 = None
+        self._keys: List[str] = []
         self.knowledge_base = {
             "capital of france": "The capital of France is Paris.",
             "population of china": "The population of China is approximately 1.4 billion.",
@@ -16,9 +30,48 @@ class SearchTool:
             "founder of microsoft": "Microsoft was founded by Bill Gates and Paul Allen.",
             "speed of light": "The speed of light in vacuum is 299,792,458 meters per second."
         }
+        self._change_listeners: List[Callable[[], None]] = []
+    
+    def on_change(self, callback: Callable[[], None]):
+        """Register a callback to run whenever the knowledge base is modified"""
+        self._change_listeners.append(callback)
+    
+    def add_fact(self, key: str, answer: str):
+        """Add or replace a fact and notify listeners (e.g. to flush answer caches)"""
+        self.knowledge_base[key.lower().strip()] = answer
+        self._bm25 = None
+        for callback in self._change_listeners:
+            callback()
+    
+    def _index(self):
+        # Built on first use and after every change; the import keeps numpy optional for substring mode
+        if self._bm25 is None:
+            from app.bm25 import BM25Index
+            self._keys = list(self.knowledge_base)
+            self._bm25 = BM25Index([f"{key} {answer}" for key, answer in self.knowledge_base.items()])
+        return self._bm25
+    
+    def search_topk(self, query: str, k: int = 5) -> List[Tuple[str, str, float]]:
+        """Top-k (key, answer, score) BM25 hits, best first"""
+        return self.search_batch([query], k)[0]
+    
+    def search_batch(self, queries: Sequence[str], k: int = 5) -> List[List[Tuple[str, str, float]]]:
+        """BM25 top-k for a batch of queries, scored in one matrix product"""
+        index = self._index()
+        return [
+            [(self._keys[doc], self.knowledge_base[self._keys[doc]], score) for doc, score in hits]
+            for hits in index.search_batch(list(queries), k)
+        ]
     
     def search(self, query: str) -> str:
         """Search for factual information in the knowledge base"""
+        if self.mode == "bm25":
+            tokens = content_tokens(query)
+            for key, answer, _ in self.search_topk(query, k=3):
+                # A high score on one shared word is not an answer; require most of the key
+                if key_coverage(key, tokens) >= self.min_coverage:
+                    return answer
+        
         query_lower = query.lower().strip()
         
         # Exact match
@@ -33,4 +86,13 @@ class SearchTool:
         return f"I couldn't find specific information about '{query}'. Please try another factual question."
 
     def __call__(self, query: str) -> str:
-        return self.search(query)
\ No newline at end of file
+        return self.search(query)
+
+def create_search_tool():
+    """SearchTool for the configured backend: the SQLite FTS5 index when SEARCH_DB_PATH is set,
+    otherwise the in-memory dictionary in SEARCH_MODE ("substring" or "bm25")"""
+    db_path = os.getenv("SEARCH_DB_PATH")
+    if db_path:
+        from app.sqlite_search import SQLiteSearchTool
+        return SQLiteSearchTool(db_path)
+    return SearchTool(mode=os.getenv("SEARCH_MODE", "substring"))
@@ -0,0 +1,145 @@
+"""Per-request trace spans with a request ID.
+
+Every HTTP request gets a request ID (taken from X-Request-ID when the
+client sends one) that is echoed in the response and attached to its log
+records. A sampled fraction of requests also records spans such as
+classify, search, each model attempt and the memory write; when the
+response has been fully sent the whole trace is logged as one structured
+record. Unsampled requests pay for a contextvar lookup per span and
+nothing else.
+"""
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from app.logs import get_logger, request_id_var
+
+log = get_logger("trace")
+
+class Trace:
+    __slots__ = ("request_id", "name", "started", "spans")
+
+    def __init__(self, request_id: str, name: str):
+        self.request_id = request_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def record(self, name: str, started: float, ended: float, attributes: Dict[str, Any]):
+        span = {
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+        }
+        if attributes:
+            span.update(attributes)
+        self.spans.append(span)
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+@contextmanager
+def _null_span():
+    yield {}
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.01, rng: Callable[[], float] = random.random):
+        self.sample_rate = sample_rate
+        self._rng = rng
+        self.sampled = 0
+        self.traced_requests = 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1.0 or (self.sample_rate > 0 and self._rng() < self.sample_rate)
+
+    def span(self, name: str, **attributes: Any):
+        """Time a block as a span of the current trace.
+
+        Yields a dict the block may add attributes to (e.g. the outcome of
+        a model attempt). Outside a sampled request this is a no-op.
+        """
+        trace = _current_trace.get()
+        if trace is None:
+            return _null_span()
+        return self._span(trace, name, attributes)
+
+    @contextmanager
+    def _span(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            trace.record(name, started, time.perf_counter(), attributes)
+
+    def begin(self, request_id: str, name: str):
+        """Start a request; returns a token for finish()"""
+        trace = Trace(request_id, name) if self.should_sample() else None
+        self.traced_requests += 1
+        return request_id_var.set(request_id), _current_trace.set(trace), trace
+
+    def finish(self, token, status: Optional[int] = None):
+        request_token, trace_token, trace = token
+        if trace is not None:
+            self.sampled += 1
+            log.info(
+                "trace",
+                name=trace.name,
+                status=status,
+                duration_ms=round((time.perf_counter() - trace.started) * 1000, 3),
+                spans=trace.spans
+            )
+        _current_trace.reset(trace_token)
+        request_id_var.reset(request_token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sample_rate": self.sample_rate, "requests": self.traced_requests, "sampled": self.sampled}
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+class TracingMiddleware:
+    """ASGI middleware assigning request IDs and closing traces after the last body chunk.
+
+    Written against raw ASGI rather than BaseHTTPMiddleware so streamed
+    responses keep their spans until the stream actually ends, and
+    request_started/request_finished hooks (e.g. the profiler) see the
+    same boundaries.
+    """
+
+    def __init__(self, app, tracer: Tracer, hooks: Optional[List[Any]] = None):
+        self.app = app
+        self.tracer = tracer
+        self.hooks = hooks or []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = self.tracer.begin(request_id, f"{scope['method']} {scope['path']}")
+        started = [hook.request_started() for hook in self.hooks]
+        status = {"code": None}
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            for hook, counted in zip(self.hooks, started):
+                hook.request_finished(counted)
+            self.tracer.finish(token, status["code"])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""BM25 ranking vs substring matching in SearchTool.
+
+Builds a synthetic knowledge base, then scores queries one at a time, as one
+batch (a sparse matrix product per chunk), and with the substring loop.
+
+    python -m benchmarks.bench_bm25 [--docs 100000] [--queries 1000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.tools import SearchTool
+
+def make_corpus(doc_count: int, vocabulary_size: int = 20_000, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(vocabulary_size)]
+    # Zipf-like term frequencies, like real text
+    probabilities = 1.0 / np.arange(1, vocabulary_size + 1)
+    probabilities /= probabilities.sum()
+    knowledge_base = {}
+    for doc in range(doc_count):
+        key_words = rng.choice(vocabulary_size, size=rng.integers(2, 5), p=probabilities)
+        answer_words = rng.choice(vocabulary_size, size=rng.integers(6, 16), p=probabilities)
+        key = " ".join(words[i] for i in key_words) + f" item{doc}"
+        knowledge_base[key] = " ".join(words[i] for i in answer_words) + "."
+    return knowledge_base
+
+def make_queries(knowledge_base: dict, count: int, seed: int = 5):
+    rng = random.Random(seed)
+    keys = list(knowledge_base)
+    queries = []
+    for _ in range(count):
+        tokens = rng.choice(keys).split()
+        rng.shuffle(tokens)
+        queries.append("what about " + " ".join(tokens[:3]))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--substring-queries", type=int, default=100,
+                        help="the substring loop is O(docs) per query, so time a sample and extrapolate")
+    args = parser.parse_args()
+    
+    knowledge_base = make_corpus(args.docs)
+    queries = make_queries(knowledge_base, args.queries)
+    tool = SearchTool(mode="bm25")
+    tool.knowledge_base = knowledge_base
+    
+    start = time.perf_counter()
+    tool._index()
+    build = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for query in queries:
+        tool.search_topk(query, k=5)
+    single = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    tool.search_batch(queries, k=5)
+    batch = time.perf_counter() - start
+    
+    substring_tool = SearchTool()
+    substring_tool.knowledge_base = knowledge_base
+    sample = queries[:args.substring_queries]
+    start = time.perf_counter()
+    for query in sample:
+        substring_tool.search(query)
+    substring = (time.perf_counter() - start) / len(sample) * len(queries)
+    
+    print(f"docs={args.docs} queries={args.queries} vocabulary={len(tool._bm25.vocabulary)}")
+    print(f"  index build            {build:8.2f} s")
+    print(f"  bm25 one at a time     {single:8.2f} s  ({single / len(queries) * 1e3:.2f} ms/query)")
+    print(f"  bm25 batch             {batch:8.2f} s  ({batch / len(queries) * 1e3:.2f} ms/query)")
+    print(f"  substring (est.)       {substring:8.2f} s  ({substring / len(queries) * 1e3:.2f} ms/query)")
+
+if __name__ == "__main__":
+    main()
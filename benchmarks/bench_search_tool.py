@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compare the indexed FactStore lookup with the original linear-scan search_tool.
+
+    python -m benchmarks.bench_search_tool [--sizes 1000 10000 100000] [--queries 1000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.facts import FactStore
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vo", "zu", "bel", "dra", "nor", "qui", "sha", "tor", "ul", "wen", "yx"]
+ATTRIBUTES = ["capital", "population", "height", "founder"]
+
+def legacy_search_tool(query: str, knowledge_base: dict, countries: list) -> str:
+    """The pre-index search_tool: linear scans over countries, topics and every key (prints removed)"""
+    query_lower = query.lower().strip()
+    topics = ["capital", "population", "height", "inventor", "founder", "speed", "symbol", "formula"]
+    
+    found_country = None
+    for country in countries:
+        if country in query_lower:
+            found_country = country
+            break
+    
+    found_topic = None
+    for topic in topics:
+        if topic in query_lower:
+            found_topic = topic
+            break
+    
+    if found_country and ("capital" in query_lower or "capital of" in query_lower):
+        if found_country in knowledge_base and "capital" in knowledge_base[found_country]:
+            return knowledge_base[found_country]["full_answer"]
+    elif found_country and "population" in query_lower:
+        if found_country in knowledge_base and "population" in knowledge_base[found_country]:
+            return knowledge_base[found_country]["full_answer"]
+    
+    for key, value in knowledge_base.items():
+        if key in query_lower and "full_answer" in value:
+            return value["full_answer"]
+    
+    return f"I couldn't find specific information about '{query}' in my knowledge base."
+
+def make_entities(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = rng.randint(1, 3)
+        names.add(" ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(words)))
+    return sorted(names)
+
+def make_queries(entities: list, count: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        if i % 4 == 3:
+            queries.append("tell me something about the weather today please")
+        else:
+            queries.append(f"what is the {rng.choice(ATTRIBUTES)} of {rng.choice(entities)}?")
+    return queries
+
+def time_calls(fn, queries: list) -> dict:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99) - 1]
+    }
+
+def run(size: int, query_count: int) -> dict:
+    entities = make_entities(size)
+    rows = [(entity, ATTRIBUTES[i % len(ATTRIBUTES)], "v", f"The {ATTRIBUTES[i % len(ATTRIBUTES)]} of {entity} is v.")
+            for i, entity in enumerate(entities)]
+    
+    build_start = time.perf_counter()
+    store = FactStore()
+    store.add_many(rows)
+    store.lookup("warm up")
+    build_seconds = time.perf_counter() - build_start
+    
+    knowledge_base = {entity: {attribute: value, "full_answer": answer} for entity, attribute, value, answer in rows}
+    countries = [entity for entity, attribute, _, _ in rows if attribute in ("capital", "population")]
+    queries = make_queries(entities, query_count)
+    
+    return {
+        "entities": size,
+        "index_build_seconds": build_seconds,
+        "fact_store": time_calls(store.lookup, queries),
+        "legacy": time_calls(lambda q: legacy_search_tool(q, knowledge_base, countries), queries)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+    
+    print(f"{'entities':>9} {'build s':>8} {'store p50 µs':>13} {'store p99 µs':>13} {'legacy p50 µs':>14} {'legacy p99 µs':>14} {'speedup':>8}")
+    for size in args.sizes:
+        result = run(size, args.queries)
+        store, legacy = result["fact_store"], result["legacy"]
+        print(f"{size:>9} {result['index_build_seconds']:>8.2f} {store['p50_us']:>13.1f} {store['p99_us']:>13.1f} "
+              f"{legacy['p50_us']:>14.1f} {legacy['p99_us']:>14.1f} {legacy['mean_us'] / store['mean_us']:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
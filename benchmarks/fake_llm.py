@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Groq / OpenAI chat completions API.
+
+Serves POST /openai/v1/chat/completions (the Groq SDK's path) and
+POST /v1/chat/completions (OpenAI clients), with or without streaming, plus
+GET .../models for connection warm-up, so both servers can be exercised
+without network access or API quota.
+Latency (overall or per model), jitter, a random failure rate and
+per-model outages are configurable at start-up and can be changed while running via
+POST /_fake/config; GET /_fake/stats reports calls per model.
+
+    python -m benchmarks.fake_llm --port 9000 --latency-ms 300 --failure-rate 0.05 --down llama-3.1-8b-instant
+    python -m benchmarks.fake_llm --latency-ms 100 --slow llama-3.1-8b-instant=2000
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake python groq_server.py
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 503, down_models: Iterable[str] = (), outage_status: int = 503,
+                 answer: str = "fake answer", chunk_delay_ms: float = 5.0, seed: Optional[int] = None,
+                 model_latency_ms: Optional[Dict[str, float]] = None):
+        self.latency_ms = latency_ms
+        # Overrides latency_ms for the models listed
+        self.model_latency_ms = dict(model_latency_ms or {})
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.down_models = set(down_models)
+        self.outage_status = outage_status
+        self.answer = answer
+        # Pause between streamed chunks, after the first-token latency
+        self.chunk_delay_ms = chunk_delay_ms
+        self.rng = random.Random(seed)
+
+    def update(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name) or name == "rng":
+                raise ValueError(f"Unknown setting: {name}")
+            setattr(self, name, set(value) if name == "down_models" else value)
+
+    def delay_seconds(self, model: Optional[str] = None) -> float:
+        jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(self.model_latency_ms.get(model, self.latency_ms) + jitter, 0.0) / 1000
+
+    def as_dict(self):
+        return {
+            "latency_ms": self.latency_ms,
+            "model_latency_ms": self.model_latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "failure_rate": self.failure_rate,
+            "failure_status": self.failure_status,
+            "down_models": sorted(self.down_models),
+            "outage_status": self.outage_status,
+            "answer": self.answer,
+            "chunk_delay_ms": self.chunk_delay_ms
+        }
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"message": message, "type": "server_error", "code": status}})
+
+def _completion(model: str, content: str, prompt_tokens: int) -> dict:
+    completion_tokens = max(len(content.split()), 1)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+def create_fake_llm_app(config: Optional[FakeLLMConfig] = None) -> FastAPI:
+    config = config or FakeLLMConfig()
+    fake = FastAPI(title="Fake LLM")
+    fake.state.config = config
+    fake.state.calls = Counter()
+    fake.state.failures = Counter()
+    # Streams sent to the end vs closed early by the client (which stops a real model generating)
+    fake.state.streams = Counter()
+
+    async def chat_completions(body: dict):
+        model = body.get("model", "unknown")
+        fake.state.calls[model] += 1
+        if model in config.down_models:
+            fake.state.failures[model] += 1
+            return _error(config.outage_status, f"Model {model} is unavailable")
+        await asyncio.sleep(config.delay_seconds(model))
+        if config.failure_rate and config.rng.random() < config.failure_rate:
+            fake.state.failures[model] += 1
+            return _error(config.failure_status, "Injected failure")
+
+        # Roughly one token per four characters of prompt
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4
+        if not body.get("stream"):
+            return _completion(model, config.answer, prompt_tokens)
+
+        async def stream():
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            finished = False
+            try:
+                yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+                words = config.answer.split(" ")
+                for i, word in enumerate(words):
+                    yield _chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+                    if config.chunk_delay_ms:
+                        await asyncio.sleep(config.chunk_delay_ms / 1000)
+                yield _chunk(completion_id, model, {}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+                finished = True
+            finally:
+                fake.state.streams["completed" if finished else "abandoned"] += 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    fake.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+    fake.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+
+    async def list_models():
+        # Free call the servers use to open pooled connections during warm-up; not counted as a completion
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model", "owned_by": "fake"}]}
+
+    fake.add_api_route("/openai/v1/models", list_models, methods=["GET"])
+    fake.add_api_route("/v1/models", list_models, methods=["GET"])
+
+    @fake.post("/_fake/config")
+    async def update_config(settings: dict):
+        try:
+            config.update(**settings)
+        except ValueError as e:
+            return _error(400, str(e))
+        return config.as_dict()
+
+    @fake.get("/_fake/stats")
+    async def stats():
+        return {
+            "calls": dict(fake.state.calls),
+            "failures": dict(fake.state.failures),
+            "streams": dict(fake.state.streams),
+            "config": config.as_dict()
+        }
+
+    return fake
+
+def _listening_socket(port: int) -> socket.socket:
+    sock = socket.socket()
+    # Accepted connections inherit this; without it Nagle plus delayed ACKs add ~40ms per call
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind(("127.0.0.1", port))
+    return sock
+
+def start_fake_llm(fake: Optional[FastAPI] = None, port: int = 0):
+    """Serve a fake app on a background thread; returns (server, port)"""
+    fake = fake or create_fake_llm_app()
+    sock = _listening_socket(port)
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, port
+
+def _serve(port: int, settings: dict, ready):
+    # Bound here rather than inherited, so any start method works (spawn on Windows and macOS)
+    sock = _listening_socket(port)
+    ready.send(sock.getsockname()[1])
+    ready.close()
+    fake = create_fake_llm_app(FakeLLMConfig(**settings))
+    uvicorn.Server(uvicorn.Config(fake, log_level="warning")).run(sockets=[sock])
+
+def start_fake_llm_process(port: int = 0, **settings):
+    """Serve the fake from a child process so it does not share a GIL with the load.
+
+    Returns (process, port); read call counts from GET /_fake/stats and
+    stop it with process.terminate().
+    """
+    context = multiprocessing.get_context()
+    ready, child_ready = context.Pipe(duplex=False)
+    process = context.Process(target=_serve, args=(port, settings, child_ready), daemon=True)
+    process.start()
+    child_ready.close()
+    deadline = time.monotonic() + 10
+    try:
+        if not ready.poll(10):
+            raise EOFError
+        port = ready.recv()
+    except EOFError:
+        process.terminate()
+        raise RuntimeError("Fake LLM process did not start")
+    finally:
+        ready.close()
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_fake/stats", timeout=1).raise_for_status()
+            return process, port
+        except httpx.HTTPError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError("Fake LLM process did not start")
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--down", action="append", default=[], metavar="MODEL", help="model to report as unavailable (repeatable)")
+    parser.add_argument("--slow", action="append", default=[], metavar="MODEL=MS", help="per-model latency (repeatable)")
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+        down_models=args.down, chunk_delay_ms=args.chunk_delay_ms, seed=args.seed,
+        model_latency_ms={model: float(ms) for model, ms in (item.split("=", 1) for item in args.slow)}
+    )
+    print(f"🧪 Fake LLM on http://127.0.0.1:{args.port} ({json.dumps(config.as_dict())})")
+    uvicorn.run(create_fake_llm_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
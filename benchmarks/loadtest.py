@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""End-to-end load test of groq_server.app and app.main.app against the fake LLM.
+
+Starts benchmarks.fake_llm on a local port, points both servers at it,
+then drives each app in-process at every concurrency level with a
+closed loop of workers (each sends its next request as soon as the last
+one returns) and reports latency percentiles and throughput. Nothing
+leaves the machine.
+
+    python -m benchmarks.loadtest [--target groq_server app.main] [--concurrency 1 8 32 128]
+        [--requests 400] [--latency-ms 100] [--failure-rate 0.01] [--down MODEL] [--stream] [--json out.json]
+
+Factual questions get a unique suffix so they exercise search and the
+model call rather than the answer cache; pass --allow-cache to measure
+the cached path instead. The in-process transport delivers a response
+only once it is complete, so --stream measures whole streams, not time
+to first token.
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from benchmarks.fake_llm import start_fake_llm_process
+
+FACTUAL_QUESTIONS = [
+    "What is the capital of France?",
+    "Who invented the telephone?",
+    "How tall is Mount Everest?",
+    "What is the speed of light?",
+    "What is the population of Japan?",
+    "What is the chemical symbol for gold?",
+]
+CONVERSATIONAL_MESSAGES = [
+    "Tell me a joke",
+    "Thanks, that was helpful",
+    "Can you explain that differently?",
+    "What do you think about that?",
+]
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def make_payload(sequence: int, factual_ratio: float, users: int, allow_cache: bool, rng: random.Random) -> dict:
+    user_id = f"load-{sequence % users}"
+    if rng.random() < factual_ratio:
+        message = rng.choice(FACTUAL_QUESTIONS)
+        if not allow_cache:
+            message = f"{message} (request {sequence})"
+    else:
+        message = rng.choice(CONVERSATIONAL_MESSAGES)
+    return {"message": message, "user_id": user_id}
+
+async def timed_request(client: httpx.AsyncClient, payload: dict, stream: bool) -> Dict[str, float]:
+    started = time.perf_counter()
+    try:
+        if stream:
+            response = await client.post("/chat/stream", json=payload)
+            ok = response.status_code == 200 and "event: done" in response.text
+        else:
+            response = await client.post("/chat", json=payload)
+            ok = response.status_code == 200
+    except Exception:
+        ok = False
+    return {"ok": ok, "latency": time.perf_counter() - started}
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int, args, rng: random.Random) -> dict:
+    counter = itertools.count()
+    samples: List[dict] = []
+
+    async def worker():
+        while True:
+            sequence = next(counter)
+            if sequence >= total:
+                return
+            payload = make_payload(sequence, args.factual_ratio, args.users, args.allow_cache, rng)
+            samples.append(await timed_request(client, payload, args.stream))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample["latency"] * 1000 for sample in samples)
+    succeeded = sum(1 for sample in samples if sample["ok"])
+    result = {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "succeeded": succeeded,
+        "failed": len(samples) - succeeded,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+    return result
+
+def load_target(name: str):
+    """Import a server module and return (asgi_app, reason it cannot serve or None)"""
+    module = importlib.import_module(name)
+    if name == "app.main" and module.agent_init.get() is None:
+        return module.app, f"agent failed to initialize: {module.agent_init.error}"
+    return module.app, None
+
+async def run_target(name: str, args) -> List[dict]:
+    target_app, problem = load_target(name)
+    if problem:
+        print(f"⏭️  {name}: skipped, {problem}")
+        return [{"target": name, "skipped": problem}]
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=target_app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+        # Warm connection pools and lazy indexes before measuring
+        await run_level(client, min(4, max(args.concurrency)), args.warmup, args, rng)
+        for concurrency in args.concurrency:
+            result = {"target": name, "mode": "stream" if args.stream else "chat"}
+            result.update(await run_level(client, concurrency, args.requests, args, rng))
+            results.append(result)
+            print(
+                f"{name:<12} {result['mode']:<6} c={concurrency:<4} {result['requests']:>6} req "
+                f"{result['failed']:>4} err {result['rps']:>8.1f} rps   "
+                f"p50 {result['p50_ms']:>8.1f}  p95 {result['p95_ms']:>8.1f}  p99 {result['p99_ms']:>8.1f} ms"
+            )
+    if name == "groq_server":
+        module = sys.modules[name]
+        if module.groq_client:
+            await module.groq_client.close()
+    else:
+        # app.main's backends share one pool, bound to this event loop
+        from app.llm import close_shared_http_client
+        await close_shared_http_client()
+    return results
+
+async def run(args) -> List[dict]:
+    results = []
+    for name in args.target:
+        results.extend(await run_target(name, args))
+    return results
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", nargs="+", default=["groq_server", "app.main"], choices=["groq_server", "app.main"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--factual-ratio", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=1000, help="distinct user_ids to spread conversations over")
+    parser.add_argument("--allow-cache", action="store_true", help="repeat factual questions verbatim so the answer cache serves them")
+    parser.add_argument("--stream", action="store_true", help="drive /chat/stream instead of /chat")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="fake model latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--down", action="append", default=[], metavar="MODEL", help="model to take down in the fake (repeatable)")
+    parser.add_argument("--slow", action="append", default=[], metavar="MODEL=MS", help="per-model fake latency, e.g. to try HEDGING=true (repeatable)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    fake_settings = {
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "failure_rate": args.failure_rate,
+        "down_models": args.down, "seed": args.seed,
+        "model_latency_ms": {model: float(ms) for model, ms in (item.split("=", 1) for item in args.slow)}
+    }
+    # A separate process, so the fake's own CPU time does not count against the servers under test
+    fake, port = start_fake_llm_process(**fake_settings)
+    # Both servers read these at import time, so set them before loading either
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    try:
+        fake_stats = httpx.get(f"http://127.0.0.1:{port}/_fake/stats").json()
+        print(f"🧪 Fake LLM on port {port}: {json.dumps(fake_stats['config'])}")
+        results = asyncio.run(run(args))
+        fake_stats = httpx.get(f"http://127.0.0.1:{port}/_fake/stats").json()
+    finally:
+        fake.terminate()
+    print(f"🧮 Fake LLM calls per model: {fake_stats['calls']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"config": vars(args), "fake_llm": fake_stats, "results": results}, handle, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main()
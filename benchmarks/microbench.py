@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the pure-Python code every request runs.
+
+Times groq_server.search_tool and router.classify, SearchTool.search
+(substring and BM25), ShortTermMemory.add_message/get_recent_context and
+SessionStore.add_message/get_context over synthetic knowledge bases,
+histories and session counts from 10 to 1M entries. Data is generated
+from fixed seeds, so runs are comparable.
+
+    python -m benchmarks.microbench [--sizes 10 1000 100000 1000000] [--only search_tool]
+        [--json results.json] [--baseline benchmarks/baseline.json] [--threshold 0.25]
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+
+With --baseline the run exits non-zero when any case got slower than its
+baseline by more than the threshold (a fraction: 0.25 is 25%). Baselines
+are machine-specific; regenerate them on the machine that runs the check.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# groq_server logs through a background writer; keep benchmark output readable
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import groq_server
+from app.facts import FactStore
+from app.memory import SessionStore, ShortTermMemory
+from app.tools import SearchTool
+
+DEFAULT_SIZES = [10, 1_000, 100_000, 1_000_000]
+DEFAULT_THRESHOLD = 0.25
+# Each timing sample runs long enough to swamp timer resolution
+TARGET_SAMPLE_SECONDS = 0.05
+REPEATS = 5
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vo", "zu", "bel", "dra", "nor", "qui", "sha", "tor", "ul", "wen", "yx"]
+ATTRIBUTES = ["capital", "population", "height", "founder"]
+MESSAGES = [
+    "What is the capital of France?",
+    "Tell me a joke about programmers",
+    "How tall is Mount Everest?",
+    "I had a long day at work and want to relax",
+    "Who invented the telephone?",
+    "Can you help me plan a birthday party for my daughter next weekend?",
+]
+
+def make_entities(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        words = rng.randint(1, 3)
+        names.add(" ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(words)))
+    return sorted(names)
+
+def make_queries(entities: List[str], count: int = 256, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        if i % 4 == 3:
+            queries.append("tell me something about the weather today please")
+        else:
+            queries.append(f"what is the {rng.choice(ATTRIBUTES)} of {rng.choice(entities)}?")
+    return queries
+
+def cycle(items: List) -> Callable[[], object]:
+    """Round-robin over inputs so one hot item does not flatter the timing"""
+    state = {"i": 0}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return next_item
+
+# Each setup takes a size and returns a zero-argument callable performing one operation
+
+def setup_search_tool(size: int) -> Callable[[], object]:
+    entities = make_entities(size)
+    store = FactStore()
+    store.add_many(
+        (entity, ATTRIBUTES[i % len(ATTRIBUTES)], "v", f"The {ATTRIBUTES[i % len(ATTRIBUTES)]} of {entity} is v.")
+        for i, entity in enumerate(entities)
+    )
+    for attribute, phrases in groq_server.ATTRIBUTE_PHRASES.items():
+        store.add_attribute_phrases(attribute, *phrases)
+    groq_server.fact_store = store
+    next_query = cycle(make_queries(entities))
+    search_tool = groq_server.search_tool
+    return lambda: search_tool(next_query())
+
+def setup_router_classify(size: int) -> Callable[[], object]:
+    # size is the message length in words; the automaton scan is linear in it
+    rng = random.Random(size)
+    words = " ".join(rng.choice(message.split()) for message in MESSAGES for _ in range(2)).split()
+    messages = [" ".join(rng.choice(words) for _ in range(size)) + " " + tail for tail in MESSAGES]
+    next_message = cycle(messages)
+    classify = groq_server.router.classify
+    return lambda: classify(next_message())
+
+def _search_tool_with(size: int, mode: str) -> Tuple[SearchTool, Callable[[], str]]:
+    entities = make_entities(size)
+    tool = SearchTool(mode=mode)
+    tool.knowledge_base = {
+        f"{ATTRIBUTES[i % len(ATTRIBUTES)]} of {entity}": f"The {ATTRIBUTES[i % len(ATTRIBUTES)]} of {entity} is v."
+        for i, entity in enumerate(entities)
+    }
+    return tool, cycle(make_queries(entities))
+
+def setup_search_substring(size: int) -> Callable[[], object]:
+    tool, next_query = _search_tool_with(size, "substring")
+    return lambda: tool.search(next_query())
+
+def setup_search_bm25(size: int) -> Callable[[], object]:
+    tool, next_query = _search_tool_with(size, "bm25")
+    tool._index()
+    return lambda: tool.search(next_query())
+
+def setup_memory_add(size: int) -> Callable[[], object]:
+    # A full ring buffer of `size` messages: every add also drops the oldest
+    memory = ShortTermMemory(max_size=size, ttl_minutes=30)
+    for i in range(size):
+        memory.add_message("user" if i % 2 else "assistant", f"message {i}")
+    return lambda: memory.add_message("user", "one more message")
+
+def setup_memory_context(size: int) -> Callable[[], object]:
+    memory = ShortTermMemory(max_size=size, ttl_minutes=30)
+    for i in range(size):
+        memory.add_message("user" if i % 2 else "assistant", f"message {i}")
+    return lambda: memory.get_recent_context(4)
+
+def _filled_session_store(size: int) -> Tuple[SessionStore, List[str]]:
+    store = SessionStore(max_sessions=size, max_messages=6, ttl_minutes=30)
+    users = [f"user-{i}" for i in range(size)]
+    for user in users:
+        store.add_message(user, "user", "hello")
+        store.add_message(user, "assistant", "hi there")
+    rng = random.Random(size)
+    return store, [rng.choice(users) for _ in range(1024)]
+
+def setup_sessions_add(size: int) -> Callable[[], object]:
+    store, users = _filled_session_store(size)
+    next_user = cycle(users)
+    return lambda: store.add_message(next_user(), "user", "another question")
+
+def setup_sessions_context(size: int) -> Callable[[], object]:
+    store, users = _filled_session_store(size)
+    next_user = cycle(users)
+    return lambda: store.get_context(next_user(), 4)
+
+# name -> (setup, largest size worth running; None for no limit)
+CASES: Dict[str, Tuple[Callable[[int], Callable[[], object]], Optional[int]]] = {
+    "search_tool": (setup_search_tool, None),
+    "router.classify": (setup_router_classify, 100_000),
+    "SearchTool.search[substring]": (setup_search_substring, None),
+    # The index for 1M keys takes minutes and gigabytes to build; 100k shows the trend
+    "SearchTool.search[bm25]": (setup_search_bm25, 100_000),
+    "ShortTermMemory.add_message": (setup_memory_add, None),
+    "ShortTermMemory.get_recent_context": (setup_memory_context, None),
+    "SessionStore.add_message": (setup_sessions_add, None),
+    "SessionStore.get_context": (setup_sessions_context, None),
+}
+
+def measure(operation: Callable[[], object], repeats: int = REPEATS) -> Dict[str, float]:
+    """Nanoseconds per call: the median and best of `repeats` calibrated samples.
+
+    Like timeit, the garbage collector is off while timing, so collections
+    triggered by whatever earlier cases left on the heap do not leak into
+    this one.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        return _measure(operation, repeats)
+    finally:
+        gc.enable()
+
+def _measure(operation: Callable[[], object], repeats: int) -> Dict[str, float]:
+    operation()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        elapsed = time.perf_counter() - started
+        if elapsed >= TARGET_SAMPLE_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(int(TARGET_SAMPLE_SECONDS / elapsed * 1.2), 16))
+    samples = [elapsed / loops]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        samples.append((time.perf_counter() - started) / loops)
+    return {
+        "ns_per_op": round(statistics.median(samples) * 1e9, 1),
+        "best_ns_per_op": round(min(samples) * 1e9, 1),
+        "loops": loops,
+    }
+
+def case_key(name: str, size: int) -> str:
+    return f"{name}[n={size}]"
+
+def run_case(name: str, size: int, repeats: int = REPEATS) -> Dict[str, float]:
+    setup = CASES[name][0]
+    original_store = groq_server.fact_store
+    try:
+        setup_started = time.perf_counter()
+        operation = setup(size)
+        setup_seconds = time.perf_counter() - setup_started
+        result = measure(operation, repeats)
+    finally:
+        groq_server.fact_store = original_store
+    result.update(name=name, size=size, setup_seconds=round(setup_seconds, 3))
+    return result
+
+def report_case(result: Dict[str, float]):
+    key = case_key(result["name"], result["size"])
+    print(f"{key:<48} {result['ns_per_op']:>14,.1f} ns/op  (setup {result['setup_seconds']:.2f}s)")
+
+def run(sizes: List[int], only: Optional[List[str]] = None, repeats: int = REPEATS, report=report_case) -> dict:
+    results = {}
+    for name, (_, max_size) in CASES.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            result = results[case_key(name, size)] = run_case(name, size, repeats)
+            report(result)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Keys of cases slower than baseline by more than threshold.
+
+    Best-of-repeats times are compared: noise from the rest of the machine
+    only ever adds time, so the minimum is the most stable estimate.
+    """
+    regressions = []
+    for key, result in results["results"].items():
+        reference = baseline.get("results", {}).get(key)
+        if reference and result["best_ns_per_op"] > reference["best_ns_per_op"] * (1 + threshold):
+            regressions.append(key)
+    return regressions
+
+def confirm(results: dict, keys: List[str], repeats: int):
+    """Measure suspected regressions again, keeping each case's better run.
+
+    A one-off stall on a shared machine then needs to happen twice in the
+    same case to fail the check.
+    """
+    for key in keys:
+        previous = results["results"][key]
+        retry = run_case(previous["name"], previous["size"], repeats)
+        if retry["best_ns_per_op"] < previous["best_ns_per_op"]:
+            results["results"][key] = retry
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run cases whose name contains any of these")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a stored baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.repeats)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        suspects = compare(results, baseline, args.threshold)
+        if suspects:
+            print(f"🔁 Re-measuring {len(suspects)} case(s) over the threshold")
+            confirm(results, suspects, args.repeats)
+        regressions = compare(results, baseline, args.threshold)
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+
+    if not args.baseline:
+        return 0
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for key in regressions:
+            best, reference = results["results"][key]["best_ns_per_op"], baseline["results"][key]["best_ns_per_op"]
+            print(f"  {key}: best {best:,.1f} ns/op vs baseline {reference:,.1f} ({best / reference - 1:+.0%})")
+        return 1
+    print(f"✅ No regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark for groq_server.app and app.main.app.
+
+For each target this measures, in fresh interpreters:
+
+- import: seconds to import the server module (best and median of --repeats)
+- live: seconds from launching uvicorn until GET /health/live answers
+- ready: seconds from launching uvicorn until GET /health/ready returns 200,
+  i.e. clients created and warm-up done (pooled connections opened against
+  the fake LLM, lookup indexes built)
+
+    python -m benchmarks.startup [--target groq_server app.main] [--repeats 5] [--no-warmup] [--json out.json]
+
+Servers talk to benchmarks.fake_llm, so nothing leaves the machine. A
+target that never becomes ready (one without an API key, for instance)
+is reported with the reason from /health/ready.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_llm import start_fake_llm_process
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import(module: str, env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_boot(module: str, env: Dict[str, str], timeout: float) -> Dict[str, Optional[float]]:
+    """Launch uvicorn and poll until live and ready; returns seconds for each (None if never)"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    result: Dict[str, Optional[float]] = {"live": None, "ready": None, "not_ready_reason": None}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            deadline = started + timeout
+            while time.perf_counter() < deadline and server.poll() is None:
+                try:
+                    if result["live"] is None and client.get("/health/live").status_code == 200:
+                        result["live"] = time.perf_counter() - started
+                    if result["live"] is not None:
+                        response = client.get("/health/ready")
+                        if response.status_code == 200:
+                            result["ready"] = time.perf_counter() - started
+                            break
+                        result["not_ready_reason"] = response.text
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return result
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {"best": round(min(values), 4), "median": round(statistics.median(values), 4)}
+
+def run_target(module: str, env: Dict[str, str], repeats: int, timeout: float) -> dict:
+    imports = [measure_import(module, env) for _ in range(repeats)]
+    boots = [measure_boot(module, env, timeout) for _ in range(repeats)]
+    result = {"target": module, "import_seconds": summarize(imports)}
+    lives = [boot["live"] for boot in boots if boot["live"] is not None]
+    readies = [boot["ready"] for boot in boots if boot["ready"] is not None]
+    result["live_seconds"] = summarize(lives) if lives else None
+    result["ready_seconds"] = summarize(readies) if readies else None
+    if not readies:
+        result["not_ready_reason"] = boots[-1]["not_ready_reason"] or "server exited or timed out"
+    return result
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", nargs="+", default=["groq_server", "app.main"], choices=["groq_server", "app.main"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for readiness per launch")
+    parser.add_argument("--no-warmup", action="store_true", help="set WARMUP=false in the servers")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    fake, port = start_fake_llm_process(latency_ms=0)
+    env = dict(os.environ)
+    env.update({
+        "GROQ_BASE_URL": f"http://127.0.0.1:{port}",
+        "OPENAI_API_BASE": f"http://127.0.0.1:{port}/v1",
+        "LOG_LEVEL": "WARNING",
+        "WARMUP": "false" if args.no_warmup else "true",
+    })
+    env.setdefault("GROQ_API_KEY", "fake-key")
+
+    results = []
+    try:
+        for module in args.target:
+            result = run_target(module, env, args.repeats, args.timeout)
+            results.append(result)
+            live, ready = result["live_seconds"], result["ready_seconds"]
+            print(
+                f"{module:<12} import {result['import_seconds']['best'] * 1000:>7.1f} ms   "
+                f"live {live['best'] * 1000 if live else float('nan'):>7.1f} ms   "
+                f"ready {ready['best'] * 1000 if ready else float('nan'):>7.1f} ms   (best of {args.repeats})"
+            )
+            if not ready:
+                print(f"   ⚠️  never ready: {result['not_ready_reason'][:200]}")
+    finally:
+        fake.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"config": vars(args), "results": results}, handle, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main()
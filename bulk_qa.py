@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Answer a large question set offline, without going through the HTTP API.
+
+Reads one JSON object per line (``{"id": ..., "question": "..."}``; a
+``message`` field or a bare JSON string also work), answers with the same
+router, knowledge base, caches and Groq client as groq_server, and appends
+one JSON result per line as soon as each answer is ready. Results carry the
+input line number, so they can be put back in order afterwards.
+
+    python bulk_qa.py questions.jsonl answers.jsonl [--concurrency 16] [--direct-answer] [--limit 1000] [--retry-failed]
+
+Progress is checkpointed to answers.jsonl.checkpoint: the highest line
+below which everything is done (the watermark), the few lines past it that
+finished out of order, and the size of the output at that point. Run the
+same command again after a crash or Ctrl+C and it picks up where it left
+off: the output is cut back to the checkpointed size and only unanswered
+lines are sent. Lines are never started more than --window past the
+watermark, so memory stays flat however large the input is.
+
+A line that failed (unparseable, or the model was unavailable) still gets
+an error result and does not hold the watermark back, but the checkpoint
+lists it; --retry-failed sends those lines again. A retried line then has
+more than one result in the output, and the last one counts.
+
+Questions are answered independently, with no conversation history.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Set
+
+import groq_server
+
+class Checkpoint:
+    def __init__(self, path: str, input_path: str, watermark: int = 0, done: Optional[Set[int]] = None,
+                 output_bytes: int = 0, failed: Optional[Set[int]] = None):
+        self.path = path
+        self.input_path = input_path
+        # Every line numbered <= watermark has its result in the output
+        self.watermark = watermark
+        # Finished lines past the watermark; never more than the window
+        self.done: Set[int] = done or set()
+        self.output_bytes = output_bytes
+        # Lines whose last result is an error, wherever they are; --retry-failed sends them again
+        self.failed: Set[int] = failed or set()
+
+    @classmethod
+    def load(cls, path: str, input_path: str) -> "Checkpoint":
+        if not os.path.exists(path):
+            return cls(path, input_path)
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        if os.path.abspath(data["input"]) != os.path.abspath(input_path):
+            raise ValueError(f"{path} belongs to {data['input']}, not {input_path}; delete it to start over")
+        return cls(path, input_path, data["watermark"], set(data["done"]), data["output_bytes"], set(data.get("failed", ())))
+
+    def is_done(self, line: int) -> bool:
+        return line <= self.watermark or line in self.done
+
+    def mark_done(self, line: int):
+        self.failed.discard(line)
+        if line <= self.watermark:
+            # A retried line the watermark had already passed
+            return
+        self.done.add(line)
+        while self.watermark + 1 in self.done:
+            self.watermark += 1
+            self.done.remove(self.watermark)
+
+    def mark_failed(self, line: int):
+        """Done for this run, so the watermark moves on, but remembered for --retry-failed"""
+        self.mark_done(line)
+        self.failed.add(line)
+
+    def save(self, output_bytes: int):
+        """Atomically replace the checkpoint; a crash leaves the previous one intact"""
+        self.output_bytes = output_bytes
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({
+                "input": self.input_path,
+                "watermark": self.watermark,
+                "done": sorted(self.done),
+                "failed": sorted(self.failed),
+                "output_bytes": output_bytes
+            }, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, self.path)
+
+def parse_question(raw: str) -> Dict[str, Any]:
+    record = json.loads(raw)
+    if isinstance(record, str):
+        return {"id": None, "question": record}
+    question = record.get("question", record.get("message"))
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("expected a non-empty 'question' or 'message' field")
+    return {"id": record.get("id"), "question": question}
+
+async def answer_question(question: str, direct: bool) -> Dict[str, Any]:
+    """Answer like POST /chat/batch does, minus HTTP and conversation memory"""
+    user_message = question.strip()
+    is_factual = groq_server.classify(user_message)
+    if is_factual:
+        tool_result, response, prompt_tokens, source = await groq_server.answer_factual(user_message, direct=direct)
+    else:
+        tool_result, source = None, "model"
+        messages, prompt_tokens = groq_server.build_prompt(user_message, False, None)
+        response = await groq_server.generate_groq_response(messages)
+    groq_server.ANSWER_SOURCES[source].inc()
+    result = {
+        "response": response,
+        "used_tool": is_factual,
+        "tool_result": tool_result,
+        "prompt_tokens": prompt_tokens,
+        "source": source,
+        "direct_answer": source == "direct",
+        "status": "success"
+    }
+    if groq_server.is_degraded_response(response):
+        result["status"] = "error"
+        result["error"] = response
+    return result
+
+async def run_bulk(input_path: str, output_path: str, checkpoint_path: Optional[str] = None, concurrency: int = 16,
+                   window: Optional[int] = None, direct: bool = False, limit: Optional[int] = None,
+                   checkpoint_every: int = 100, retry_failed: bool = False, report=print) -> Dict[str, int]:
+    """Answer every unanswered line of input_path, appending results to output_path; returns counts"""
+    checkpoint = Checkpoint.load(checkpoint_path or f"{output_path}.checkpoint", input_path)
+    window = max(window or concurrency * 4, concurrency)
+    counts = {"started": 0, "answered": 0, "failed": 0}
+    # Results written after the last checkpoint will be redone, so drop them
+    output = open(output_path, "r+b" if checkpoint.output_bytes and os.path.exists(output_path) else "wb")
+    output.truncate(checkpoint.output_bytes)
+    output.seek(checkpoint.output_bytes)
+
+    slots = asyncio.Semaphore(concurrency)
+    progress = asyncio.Condition()
+    tasks: Set[asyncio.Task] = set()
+    since_checkpoint = 0
+    started = time.perf_counter()
+
+    def save_checkpoint():
+        nonlocal since_checkpoint
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint.save(output.tell())
+        since_checkpoint = 0
+
+    async def process(line: int, raw: str):
+        nonlocal since_checkpoint
+        item_started = time.perf_counter()
+        try:
+            try:
+                question = parse_question(raw)
+                result = {"line": line, "id": question["id"], "question": question["question"]}
+                result.update(await answer_question(question["question"], direct))
+            except Exception as e:
+                result = {"line": line, "status": "error", "error": str(e)}
+            result["elapsed_ms"] = round((time.perf_counter() - item_started) * 1000, 2)
+            succeeded = result["status"] == "success"
+            counts["answered" if succeeded else "failed"] += 1
+            # Written, then marked, with no await in between, so a checkpoint never counts a result it lacks
+            output.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+            if succeeded:
+                checkpoint.mark_done(line)
+            else:
+                checkpoint.mark_failed(line)
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                save_checkpoint()
+                report(f"💾 line {checkpoint.watermark} done, {counts['answered']} answered, {counts['failed']} failed")
+        finally:
+            slots.release()
+        async with progress:
+            progress.notify_all()
+
+    try:
+        with open(input_path, encoding="utf-8") as questions:
+            for line, raw in enumerate(questions, 1):
+                if checkpoint.is_done(line) and not (retry_failed and line in checkpoint.failed):
+                    continue
+                if not raw.strip():
+                    checkpoint.mark_done(line)
+                    continue
+                if limit is not None and counts["started"] >= limit:
+                    break
+                counts["started"] += 1
+                # Keep the out-of-order set bounded: a slow line holds back at most `window` lines after it
+                async with progress:
+                    await progress.wait_for(lambda: line - checkpoint.watermark <= window)
+                await slots.acquire()
+                task = asyncio.get_running_loop().create_task(process(line, raw))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        save_checkpoint()
+        output.close()
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    return counts
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="questions, one JSON object per line")
+    parser.add_argument("output", help="results are appended here, one JSON object per line")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=16, help="questions in flight at once")
+    parser.add_argument("--window", type=int, help="how far past the oldest unfinished line to read (default: 4x concurrency)")
+    parser.add_argument("--direct-answer", action="store_true", help="return exact knowledge base hits without calling Groq")
+    parser.add_argument("--limit", type=int, help="stop after starting this many new questions")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="results between checkpoints")
+    parser.add_argument("--retry-failed", action="store_true", help="send lines that failed in earlier runs again")
+    args = parser.parse_args(argv)
+
+    if groq_server.get_groq_client() is None:
+        print(f"❌ {groq_server.groq_client_init.error}")
+        return 1
+
+    async def run():
+        try:
+            return await run_bulk(
+                args.input, args.output, args.checkpoint, args.concurrency, args.window,
+                args.direct_answer, args.limit, args.checkpoint_every, args.retry_failed
+            )
+        finally:
+            await groq_server.groq_client.close()
+
+    print(f"🚀 Answering {args.input} -> {args.output} ({args.concurrency} at a time)")
+    try:
+        counts = asyncio.run(run())
+    except KeyboardInterrupt:
+        print("⏹️  Interrupted; run the same command again to resume")
+        return 130
+    print(f"✅ {counts['answered']} answered, {counts['failed']} failed in {counts['seconds']}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
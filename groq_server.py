@@ -1,219 +1,467 @@
-import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+from contextlib import asynccontextmanager
+import asyncio
 import os
-import groq
+import secrets
+import time
 from dotenv import load_dotenv
-import traceback
+
+if TYPE_CHECKING:
+    import groq
+
+from app.admission import AdmissionRejected, admission_from_env, estimate_tokens
+from app.cache import AnswerCache, normalize_question
+from app.context import ContextBuilder
+from app.facts import FactMatch, FactStore
+from app.hedging import hedge_policy_from_env
+from app.health import ModelHealthRegistry
+from app.logs import configure_logging, get_logger
+from app.memory import call_store, create_session_store
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from app.profiling import SORT_KEYS as PROFILE_SORT_KEYS, RequestProfiler
+from app.router import create_router
+from app.semantic_cache import SemanticCache
+from app.singleflight import SingleFlight
+from app.startup import LazyClient, StartupState
+from app.streaming import format_sse
+from app.summarizer import ConversationCompactor, summary_request
+from app.tracing import Tracer, TracingMiddleware
 
 load_dotenv()
 
+# Request logging goes through a queue to a background JSON writer
+configure_logging(os.getenv("LOG_LEVEL", "INFO"))
+log = get_logger("groq_server")
+# Fraction of requests whose spans are logged as a trace (0 to 1)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# Required in X-Admin-Token for /admin endpoints, which are disabled while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+tracer = Tracer(sample_rate=TRACE_SAMPLE_RATE)
+profiler = RequestProfiler()
+
+# Upper bound on concurrent in-flight Groq calls per worker
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "32"))
+# Keep-alive pool shared by every request on this worker
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "64"))
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
+# Seconds before retrying a failed Groq client creation (e.g. a missing key)
+GROQ_INIT_RETRY_SECONDS = float(os.getenv("GROQ_INIT_RETRY_SECONDS", "30"))
+# Pre-open pooled connections and build lookup indexes before reporting ready
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+
+startup = StartupState()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In a thread: importing the SDK would otherwise hold up liveness probes
+    phases = [("groq_client", lambda: asyncio.to_thread(get_groq_client))]
+    if WARMUP:
+        phases += [("search_index", warm_search_index), ("groq_connections", warm_groq_connections)]
+    startup.begin(phases)
+    yield
+    await startup.stop()
+    if compactor:
+        await compactor.drain()
+    memory.close()
+    if groq_client:
+        await groq_client.close()
+
 app = FastAPI(
     title="AI Question-Answer Helper",
     description="Simple AI agent with search tool - Powered by Groq",
-    version="4.1.0"
+    version="4.1.0",
+    lifespan=lifespan
 )
+app.add_middleware(TracingMiddleware, tracer=tracer, hooks=[profiler])
 
-# Enhanced knowledge base with better organization
-knowledge_base = {
+# Knowledge base as (entity, attribute, value, full answer) facts
+KNOWLEDGE_FACTS = [
     # Capitals - organized by country
-    "france": {"capital": "Paris", "full_answer": "The capital of France is Paris."},
-    "germany": {"capital": "Berlin", "full_answer": "The capital of Germany is Berlin."},
-    "italy": {"capital": "Rome", "full_answer": "The capital of Italy is Rome."},
-    "spain": {"capital": "Madrid", "full_answer": "The capital of Spain is Madrid."},
-    "japan": {"capital": "Tokyo", "full_answer": "The capital of Japan is Tokyo."},
-    "china": {"capital": "Beijing", "full_answer": "The capital of China is Beijing."},
-    "india": {"capital": "New Delhi", "full_answer": "The capital of India is New Delhi."},
-    "russia": {"capital": "Moscow", "full_answer": "The capital of Russia is Moscow."},
-    "brazil": {"capital": "Brasília", "full_answer": "The capital of Brazil is Brasília."},
-    "canada": {"capital": "Ottawa", "full_answer": "The capital of Canada is Ottawa."},
-    "australia": {"capital": "Canberra", "full_answer": "The capital of Australia is Canberra."},
-    "kenya": {"capital": "Nairobi", "full_answer": "The capital of Kenya is Nairobi."},
-    "egypt": {"capital": "Cairo", "full_answer": "The capital of Egypt is Cairo."},
-    "south africa": {"capital": "Pretoria", "full_answer": "The capital of South Africa is Pretoria."},
-    "nigeria": {"capital": "Abuja", "full_answer": "The capital of Nigeria is Abuja."},
-    "ethiopia": {"capital": "Addis Ababa", "full_answer": "The capital of Ethiopia is Addis Ababa."},
-    "ghana": {"capital": "Accra", "full_answer": "The capital of Ghana is Accra."},
-    "united states": {"capital": "Washington D.C.", "full_answer": "The capital of United States is Washington D.C."},
-    "united kingdom": {"capital": "London", "full_answer": "The capital of United Kingdom is London."},
+    ("france", "capital", "Paris", "The capital of France is Paris."),
+    ("germany", "capital", "Berlin", "The capital of Germany is Berlin."),
+    ("italy", "capital", "Rome", "The capital of Italy is Rome."),
+    ("spain", "capital", "Madrid", "The capital of Spain is Madrid."),
+    ("japan", "capital", "Tokyo", "The capital of Japan is Tokyo."),
+    ("china", "capital", "Beijing", "The capital of China is Beijing."),
+    ("india", "capital", "New Delhi", "The capital of India is New Delhi."),
+    ("russia", "capital", "Moscow", "The capital of Russia is Moscow."),
+    ("brazil", "capital", "Brasília", "The capital of Brazil is Brasília."),
+    ("canada", "capital", "Ottawa", "The capital of Canada is Ottawa."),
+    ("australia", "capital", "Canberra", "The capital of Australia is Canberra."),
+    ("kenya", "capital", "Nairobi", "The capital of Kenya is Nairobi."),
+    ("egypt", "capital", "Cairo", "The capital of Egypt is Cairo."),
+    ("south africa", "capital", "Pretoria", "The capital of South Africa is Pretoria."),
+    ("nigeria", "capital", "Abuja", "The capital of Nigeria is Abuja."),
+    ("ethiopia", "capital", "Addis Ababa", "The capital of Ethiopia is Addis Ababa."),
+    ("ghana", "capital", "Accra", "The capital of Ghana is Accra."),
+    ("united states", "capital", "Washington D.C.", "The capital of United States is Washington D.C."),
+    ("united kingdom", "capital", "London", "The capital of United Kingdom is London."),
     
     # Science facts
-    "mount everest": {"height": "8,848 meters", "full_answer": "Mount Everest is 8,848 meters (29,029 feet) tall."},
-    "telephone": {"inventor": "Alexander Graham Bell", "full_answer": "Alexander Graham Bell is credited with inventing the telephone."},
-    "china": {"population": "1.4 billion", "full_answer": "The population of China is approximately 1.4 billion people."},
-    "india": {"population": "1.3 billion", "full_answer": "The population of India is approximately 1.3 billion people."},
-    "pacific ocean": {"size": "largest", "full_answer": "The Pacific Ocean is the largest ocean on Earth."},
-    "light": {"speed": "299,792,458 m/s", "full_answer": "The speed of light in vacuum is 299,792,458 meters per second."},
-    "gold": {"symbol": "Au", "full_answer": "The chemical symbol for gold is Au."},
-    "oxygen": {"symbol": "O", "full_answer": "The chemical symbol for oxygen is O."},
-    "water": {"formula": "H₂O", "full_answer": "The chemical formula for water is H₂O."},
-    "world war ii": {"end_year": "1945", "full_answer": "World War II ended in 1945."},
-    "microsoft": {"founder": "Bill Gates and Paul Allen", "full_answer": "Microsoft was founded by Bill Gates and Paul Allen."},
-    "apple": {"founder": "Steve Jobs, Steve Wozniak, and Ronald Wayne", "full_answer": "Apple was founded by Steve Jobs, Steve Wozniak, and Ronald Wayne."},
-    "solar system": {"planets": "8", "full_answer": "There are 8 planets in our solar system: Mercury, Venus, Earth, Mars, Jupiter, Saturn, Uranus, and Neptune."},
+    ("mount everest", "height", "8,848 meters", "Mount Everest is 8,848 meters (29,029 feet) tall."),
+    ("telephone", "inventor", "Alexander Graham Bell", "Alexander Graham Bell is credited with inventing the telephone."),
+    ("china", "population", "1.4 billion", "The population of China is approximately 1.4 billion people."),
+    ("india", "population", "1.3 billion", "The population of India is approximately 1.3 billion people."),
+    ("pacific ocean", "size", "largest", "The Pacific Ocean is the largest ocean on Earth."),
+    ("light", "speed", "299,792,458 m/s", "The speed of light in vacuum is 299,792,458 meters per second."),
+    ("gold", "symbol", "Au", "The chemical symbol for gold is Au."),
+    ("oxygen", "symbol", "O", "The chemical symbol for oxygen is O."),
+    ("water", "formula", "H₂O", "The chemical formula for water is H₂O."),
+    ("world war ii", "end_year", "1945", "World War II ended in 1945."),
+    ("microsoft", "founder", "Bill Gates and Paul Allen", "Microsoft was founded by Bill Gates and Paul Allen."),
+    ("apple", "founder", "Steve Jobs, Steve Wozniak, and Ronald Wayne", "Apple was founded by Steve Jobs, Steve Wozniak, and Ronald Wayne."),
+    ("solar system", "planets", "8", "There are 8 planets in our solar system: Mercury, Venus, Earth, Mars, Jupiter, Saturn, Uranus, and Neptune."),
     
     # General knowledge
-    "python": {"description": "programming language", "full_answer": "Python is a high-level programming language known for its simplicity and readability."},
-    "artificial intelligence": {"description": "AI simulation", "full_answer": "Artificial Intelligence (AI) is the simulation of human intelligence in machines."},
-    "machine learning": {"description": "AI subset", "full_answer": "Machine learning is a subset of AI that enables computers to learn without being explicitly programmed."},
-    "groq": {"description": "AI chip company", "full_answer": "Groq is a company that develops AI inference chips and provides fast AI API services."},
+    ("python", "description", "programming language", "Python is a high-level programming language known for its simplicity and readability."),
+    ("artificial intelligence", "description", "AI simulation", "Artificial Intelligence (AI) is the simulation of human intelligence in machines."),
+    ("machine learning", "description", "AI subset", "Machine learning is a subset of AI that enables computers to learn without being explicitly programmed."),
+    ("groq", "description", "AI chip company", "Groq is a company that develops AI inference chips and provides fast AI API services."),
+]
+
+# Other names users give the same entity
+ENTITY_ALIASES = {
+    "united states": ["usa", "united states of america"],
+    "united kingdom": ["uk", "britain", "great britain"],
+    "mount everest": ["everest", "mt everest"],
+    "pacific ocean": ["pacific", "largest ocean"],
+    "world war ii": ["world war 2", "world war two", "second world war", "wwii", "ww2", "world war"],
+    "artificial intelligence": ["ai"],
+    "machine learning": ["ml"],
+    "solar system": ["our solar system"],
 }
 
-# Fixed Simple memory system
-class SimpleMemory:
-    def __init__(self, max_size: int = 6):
-        self.max_size = max_size
-        self.conversation = []  # Initialize the conversation attribute
-    
-    def add_message(self, role: str, content: str):
-        self.conversation.append({"role": role, "content": content})
-        if len(self.conversation) > self.max_size:
-            self.conversation = self.conversation[-self.max_size:]
-    
-    def get_context(self, max_messages: int = 4):
-        return self.conversation[-max_messages:] if len(self.conversation) > max_messages else self.conversation
-    
-    def clear(self):
-        self.conversation.clear()
+# Words that signal which attribute a question is about
+ATTRIBUTE_PHRASES = {
+    "capital": ["capital city"],
+    "population": ["populated", "how many people", "people live"],
+    "height": ["tall", "high", "how tall", "how high"],
+    "inventor": ["invent", "invented", "invention"],
+    "founder": ["founders", "found", "founded", "started"],
+    "speed": ["how fast", "fast"],
+    "symbol": ["chemical symbol"],
+    "formula": ["chemical formula"],
+    "size": ["largest", "biggest"],
+    "end_year": ["end", "ended", "end of", "finish", "finished"],
+    "planets": ["planet", "how many planets"],
+}
+
+def build_fact_store() -> FactStore:
+    store = FactStore()
+    store.add_many(KNOWLEDGE_FACTS)
+    for entity, aliases in ENTITY_ALIASES.items():
+        store.add_entity_aliases(entity, *aliases)
+    for attribute, phrases in ATTRIBUTE_PHRASES.items():
+        store.add_attribute_phrases(attribute, *phrases)
+    return store
+
+fact_store = build_fact_store()
+
+# Rolling summarization of long conversations (off by default)
+MEMORY_COMPACTION = os.getenv("MEMORY_COMPACTION", "false").lower() in ("1", "true", "yes")
+COMPACTION_THRESHOLD = int(os.getenv("COMPACTION_THRESHOLD", "8"))
+COMPACTION_KEEP_RECENT = int(os.getenv("COMPACTION_KEEP_RECENT", "4"))
 
 # Initialize components
-memory = SimpleMemory()
+# Per-user conversation memory; RAM is bounded by MAX_SESSIONS x SESSION_MAX_MESSAGES.
+# Set SESSION_DB_PATH to share it between worker processes through a SQLite file.
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "6"))
+memory = create_session_store(
+    max_sessions=int(os.getenv("MAX_SESSIONS", "100000")),
+    # With compaction on, sessions must hold enough turns to reach the threshold before the ring buffer drops them
+    max_messages=max(SESSION_MAX_MESSAGES, COMPACTION_THRESHOLD + 2) if MEMORY_COMPACTION else SESSION_MAX_MESSAGES,
+    ttl_minutes=float(os.getenv("SESSION_TTL_MINUTES", "30"))
+)
+answer_cache = AnswerCache(
+    max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+)
+# Paraphrases of cached questions ("What's France's capital?") are answered from the nearest cached one
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+semantic_cache = SemanticCache(
+    capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "4096")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+) if SEMANTIC_CACHE else None
+# Cached answers are only valid for the knowledge base they were built from
+fact_store.on_change(answer_cache.clear)
+if semantic_cache:
+    fact_store.on_change(semantic_cache.clear)
+# Concurrent identical factual questions share one lookup and one Groq call
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "true").lower() in ("1", "true", "yes")
+factual_flight = SingleFlight()
+# Batch chat: largest accepted batch and the default/maximum parallel Groq calls per batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Per-user and global rate limits in requests and estimated tokens, with a fair wait queue (off by default)
+admission = admission_from_env()
+# Answer exact knowledge base hits with the stored sentence instead of a Groq call; requests can override
+# with "direct_answer". Only exact (entity, attribute) matches at or above the confidence qualify.
+DIRECT_ANSWERS = os.getenv("DIRECT_ANSWERS", "false").lower() in ("1", "true", "yes")
+DIRECT_ANSWER_MIN_CONFIDENCE = float(os.getenv("DIRECT_ANSWER_MIN_CONFIDENCE", "1.0"))
+# Factual vs conversational routing, shared with app.main; ROUTER_MODEL_PATH swaps the keyword rules for a trained model
+router = create_router()
+# Prompt size cap; older turns are truncated or dropped to fit
+context_builder = ContextBuilder(max_prompt_tokens=int(os.getenv("MAX_PROMPT_TOKENS", "3000")))
+
+def create_groq_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> "groq.AsyncGroq":
+    """Create an async Groq client on a pooled keep-alive HTTP connection"""
+    # Imported here: the SDK is a large share of import time and is only needed once a model is called
+    import groq
+    import httpx
+    http_client = groq.DefaultAsyncHttpxClient(
+        timeout=httpx.Timeout(GROQ_TIMEOUT_SECONDS, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+            keepalive_expiry=30.0
+        )
+    )
+    return groq.AsyncGroq(
+        api_key=api_key,
+        base_url=base_url or os.getenv("GROQ_BASE_URL"),
+        http_client=http_client,
+        # Failures go straight to the circuit breakers and the fallback loop, which move on to the next model;
+        # the SDK's own retries would keep a request on a dead model through its backoff first
+        max_retries=0
+    )
+
+def set_groq_concurrency(limit: int):
+    """Resize the per-worker cap on concurrent Groq calls"""
+    global groq_semaphore
+    groq_semaphore = asyncio.Semaphore(limit)
 
-# Initialize Groq client
-try:
+groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+# Circuit breaker settings for the model fallback loop
+MODEL_FAILURE_THRESHOLD = int(os.getenv("MODEL_FAILURE_THRESHOLD", "3"))
+MODEL_COOLDOWN_SECONDS = float(os.getenv("MODEL_COOLDOWN_SECONDS", "30"))
+
+# Updated list of available Groq models, in fallback order
+GROQ_MODELS = [
+    "llama-3.1-8b-instant",
+    "llama-3.1-70b-versatile", 
+    "mixtral-8x7b-32768",
+    "gemma2-9b-it"
+]
+
+# Canned answers used when Groq could not produce one; never cached
+UNAVAILABLE_RESPONSE = "I'm currently unavailable. Please check if the Groq API key is properly configured."
+FALLBACK_RESPONSE = "I'm currently experiencing technical difficulties with the AI service. However, I can still answer questions using my built-in knowledge base for factual information."
+ERROR_RESPONSE_PREFIX = "I encountered an error: "
+
+def is_degraded_response(text: str) -> bool:
+    return text in (UNAVAILABLE_RESPONSE, FALLBACK_RESPONSE) or text.startswith(ERROR_RESPONSE_PREFIX)
+
+model_health = ModelHealthRegistry(
+    failure_threshold=MODEL_FAILURE_THRESHOLD,
+    cooldown_seconds=MODEL_COOLDOWN_SECONDS
+)
+for _model in GROQ_MODELS:
+    model_health.get(_model)
+# Race the next model against one slower than its p95 (HEDGING=true); see app/hedging.py
+hedger = hedge_policy_from_env()
+
+# Prometheus metrics served at /metrics; hot paths hold their label children directly
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram("chat_stage_seconds", "Time spent in each stage of a chat request", ["stage"])
+CLASSIFY_SECONDS = stage_seconds.labels(stage="classify")
+SEARCH_TOOL_SECONDS = stage_seconds.labels(stage="search_tool")
+CONTEXT_BUILD_SECONDS = stage_seconds.labels(stage="context_build")
+model_attempt_seconds = metrics.histogram(
+    "groq_model_attempt_seconds", "Duration of each Groq call attempt (time to first token for streams)", ["model", "outcome"]
+)
+model_fallbacks = metrics.counter(
+    "groq_model_fallbacks_total", "Models passed over for the next one in the fallback order", ["model", "reason"]
+)
+hedges = metrics.counter(
+    "groq_hedges_total", "Hedged calls by result: fired, backup_won, primary_won, budget_exhausted", ["result"]
+)
+tool_lookups = metrics.counter("search_tool_lookups_total", "Knowledge base lookups by result", ["result"])
+TOOL_HITS = tool_lookups.labels(result="hit")
+TOOL_MISSES = tool_lookups.labels(result="miss")
+prompt_tokens_total = metrics.counter("groq_prompt_tokens_total", "Prompt tokens billed by Groq", ["model"])
+completion_tokens_total = metrics.counter("groq_completion_tokens_total", "Completion tokens billed by Groq", ["model"])
+# Read at scrape time; the store may be swapped out (e.g. in tests)
+metrics.gauge("memory_sessions", "Conversation sessions held in memory").set_function(lambda: len(memory))
+metrics.gauge("answer_cache_entries", "Entries in the factual answer cache").set_function(lambda: len(answer_cache))
+metrics.gauge("semantic_cache_entries", "Entries in the semantic answer cache").set_function(
+    lambda: len(semantic_cache) if semantic_cache else 0
+)
+admission_decisions = metrics.counter("admission_decisions_total", "Chat requests admitted or rejected with 429", ["outcome"])
+ADMITTED = admission_decisions.labels(outcome="admitted")
+REJECTED = admission_decisions.labels(outcome="rejected")
+chat_answers = metrics.counter(
+    "chat_answers_total", "Answers by where they came from; all but model skipped the Groq call", ["source"]
+)
+ANSWER_SOURCES = {
+    source: chat_answers.labels(source=source) for source in ("direct", "cache", "semantic_cache", "coalesced", "model")
+}
+metrics.gauge("admission_queued_requests", "Requests waiting for admission").set_function(
+    lambda: admission.stats()["queued"] if admission else 0
+)
+
+def is_permanent_model_failure(error: Exception) -> bool:
+    """Errors that retrying will not fix, such as an unknown or decommissioned model"""
+    import groq
+    if isinstance(error, groq.NotFoundError):
+        return True
+    return isinstance(error, groq.BadRequestError) and "decommissioned" in str(error).lower()
+
+def _create_default_groq_client() -> "groq.AsyncGroq":
     groq_api_key = os.getenv("GROQ_API_KEY")
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY not found in environment variables")
-    
-    # Correct way to initialize Groq client
-    groq_client = groq.Groq(api_key=groq_api_key)
-    print("✅ Groq client initialized successfully!")
-except Exception as e:
-    print(f"❌ Groq initialization error: {e}")
-    groq_client = None
+    return create_groq_client(api_key=groq_api_key)
+
+# Created at startup or on first use; tests may assign groq_client directly
+groq_client_init = LazyClient("groq", _create_default_groq_client, retry_seconds=GROQ_INIT_RETRY_SECONDS)
+groq_client: Optional["groq.AsyncGroq"] = None
+
+def get_groq_client() -> Optional["groq.AsyncGroq"]:
+    """The shared Groq client, or None while GROQ_API_KEY is missing or invalid"""
+    global groq_client
+    if groq_client is None:
+        groq_client = groq_client_init.get()
+    return groq_client
+
+def warm_search_index():
+    """Build the fact matcher now rather than on the first question"""
+    fact_store.lookup("warm up")
+
+async def warm_groq_connections():
+    """Open WARMUP_CONNECTIONS pooled connections with a free model listing call"""
+    client = get_groq_client()
+    if client is None:
+        return
+    results = await asyncio.gather(
+        *[client.models.list() for _ in range(WARMUP_CONNECTIONS)], return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) == len(results):
+        raise errors[0]
 
 class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = "default"
+    # Return exact knowledge base hits without calling Groq; None follows DIRECT_ANSWERS
+    direct_answer: Optional[bool] = None
 
 class ChatResponse(BaseModel):
     response: str
     used_tool: bool
     tool_result: Optional[str] = None
     status: str
+    # Tokens sent to the model for this answer (0 when served from cache)
+    prompt_tokens: Optional[int] = None
+    # The stored knowledge base answer, returned without a model call
+    direct_answer: bool = False
+
+class BatchChatRequest(BaseModel):
+    messages: List[str]
+    user_id: Optional[str] = "default"
+    # Parallel Groq calls for this batch; capped at BATCH_MAX_CONCURRENCY
+    max_concurrency: Optional[int] = None
+    direct_answer: Optional[bool] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    response: Optional[str] = None
+    used_tool: bool = False
+    tool_result: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    direct_answer: bool = False
+    error: Optional[str] = None
+    elapsed_ms: float
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    succeeded: int
+    failed: int
+    elapsed_ms: float
+
+def search(query: str) -> Tuple[str, Optional[FactMatch]]:
+    """Search the knowledge base; returns the tool result text and the match behind it"""
+    with tracer.span("search") as span, SEARCH_TOOL_SECONDS.time():
+        match = fact_store.lookup(query)
+        span["hit"] = match is not None
+    if match is None:
+        TOOL_MISSES.inc()
+        log.debug("search_miss")
+        return f"I couldn't find specific information about '{query}' in my knowledge base.", None
+    
+    TOOL_HITS.inc()
+    log.debug("search_hit", entity=match.fact.entity, attribute=match.fact.attribute, exact=match.exact)
+    return match.fact.answer, match
 
 def search_tool(query: str) -> str:
     """Search the knowledge base for factual information"""
-    query_lower = query.lower().strip()
-    
-    print(f"🔍 Raw query: '{query_lower}'")
-    
-    # Extract country/city names and topics
-    countries = ["france", "germany", "italy", "spain", "japan", "china", "india", "russia", 
-                "brazil", "canada", "australia", "kenya", "egypt", "south africa", "nigeria",
-                "ethiopia", "ghana", "united states", "united kingdom"]
-    
-    topics = ["capital", "population", "height", "inventor", "founder", "speed", "symbol", "formula"]
-    
-    # Look for country names in the query
-    found_country = None
-    for country in countries:
-        if country in query_lower:
-            found_country = country
-            break
-    
-    # Look for topics in the query
-    found_topic = None
-    for topic in topics:
-        if topic in query_lower:
-            found_topic = topic
-            break
-    
-    print(f"🔍 Found country: {found_country}, topic: {found_topic}")
-    
-    # Case 1: Capital questions
-    if found_country and ("capital" in query_lower or "capital of" in query_lower):
-        if found_country in knowledge_base and "capital" in knowledge_base[found_country]:
-            return knowledge_base[found_country]["full_answer"]
-    
-    # Case 2: Population questions
-    elif found_country and "population" in query_lower:
-        if found_country in knowledge_base and "population" in knowledge_base[found_country]:
-            return knowledge_base[found_country]["full_answer"]
-    
-    # Case 3: Specific fact questions
-    elif "mount everest" in query_lower and "height" in query_lower:
-        return knowledge_base["mount everest"]["full_answer"]
-    
-    elif "telephone" in query_lower and "invent" in query_lower:
-        return knowledge_base["telephone"]["full_answer"]
-    
-    elif "largest ocean" in query_lower:
-        return knowledge_base["pacific ocean"]["full_answer"]
-    
-    elif "speed of light" in query_lower:
-        return knowledge_base["light"]["full_answer"]
-    
-    elif "gold" in query_lower and "symbol" in query_lower:
-        return knowledge_base["gold"]["full_answer"]
-    elif "world war" in query_lower and "end" in query_lower:
-        return knowledge_base["world war ii"]["full_answer"]
-    
-    elif "microsoft" in query_lower and "found" in query_lower:
-        return knowledge_base["microsoft"]["full_answer"]
-    
-    elif "solar system" in query_lower and "planet" in query_lower:
-        return knowledge_base["solar system"]["full_answer"]
-    
-    # Case 4: General "what is" questions
-    elif "what is" in query_lower:
-        if "python" in query_lower:
-            return knowledge_base["python"]["full_answer"]
-        elif "artificial intelligence" in query_lower or "ai" in query_lower:
-            return knowledge_base["artificial intelligence"]["full_answer"]
-        elif "machine learning" in query_lower:
-            return knowledge_base["machine learning"]["full_answer"]
-        elif "groq" in query_lower:
-            return knowledge_base["groq"]["full_answer"]
-    
-    # Fallback: Try direct matching
-    for key, value in knowledge_base.items():
-        if key in query_lower and "full_answer" in value:
-            return value["full_answer"]
-    
-    return f"I couldn't find specific information about '{query}' in my knowledge base."
-
-def is_factual_question(question: str) -> bool:
-    """Determine if a question is factual and requires search"""
-    factual_keywords = [
-        'what is', 'who is', 'when was', 'where is', 'how many', 
-        'how much', 'capital of', 'population of', 'height of',
-        'inventor of', 'year', 'largest', 'smallest', 'chemical symbol',
-        'founder of', 'speed of', 'distance to', 'how tall', 'how big',
-        'what are', 'who invented', 'when did', 'where are'
-    ]
-    question_lower = question.lower()
-    return any(keyword in question_lower for keyword in factual_keywords)
-
-def generate_groq_response(messages: list) -> str:
-    """Generate response using Groq API with latest models"""
-    if not groq_client:
-        return "I'm currently unavailable. Please check if the Groq API key is properly configured."
-    
-    try:
-        # Updated list of available Groq models
-        available_models = [
-            "llama-3.1-8b-instant",
-            "llama-3.1-70b-versatile", 
-            "mixtral-8x7b-32768",
-            "gemma2-9b-it"
-        ]
-        
-        for model in available_models:
-            try:
-                print(f"🔄 Trying model: {model}")
-                response = groq_client.chat.completions.create(
+    return search(query)[0]
+
+def search_batch(queries: List[str]) -> Dict[str, Tuple[str, Optional[FactMatch]]]:
+    """Resolve many lookups in one pass; repeated questions are searched once"""
+    return {query: search(query) for query in dict.fromkeys(queries)}
+
+def wants_direct_answer(requested: Optional[bool]) -> bool:
+    return DIRECT_ANSWERS if requested is None else requested
+
+def is_direct_hit(match: Optional[FactMatch]) -> bool:
+    """Whether the stored answer can stand on its own, so Groq would only rephrase it"""
+    return match is not None and match.exact and match.confidence >= DIRECT_ANSWER_MIN_CONFIDENCE
+
+def semantic_lookup(user_message: str, tool_result: Optional[str]) -> Optional[str]:
+    """Answer cached for a paraphrase of this factual question with the same search result; None when disabled or not found
+
+    Conversational answers are never reused: they depend on the conversation
+    so far ("Tell me more"), which the question alone does not capture.
+    """
+    if semantic_cache is None:
+        return None
+    with tracer.span("semantic_cache") as span:
+        answer = semantic_cache.get(user_message, True, tool_result)
+        span["hit"] = answer is not None
+    return answer
+
+def semantic_store(user_message: str, tool_result: Optional[str], answer: str):
+    if semantic_cache is not None and not is_degraded_response(answer):
+        semantic_cache.put(user_message, True, tool_result, answer)
+
+def answer_source_stats() -> dict:
+    """Answers so far by source, and the share that skipped the Groq call"""
+    counts = {source: int(child.value) for source, child in ANSWER_SOURCES.items()}
+    total = sum(counts.values())
+    return {
+        "direct_answers": DIRECT_ANSWERS,
+        "direct_answer_min_confidence": DIRECT_ANSWER_MIN_CONFIDENCE,
+        "answers": counts,
+        "llm_skip_ratio": round((total - counts["model"]) / total, 4) if total else 0.0
+    }
+
+def update_knowledge(entity: str, attribute: str, value: str, full_answer: str):
+    """Add or replace a fact; the answer cache is flushed via the store's change hook"""
+    fact_store.add(entity, attribute, value, full_answer)
+
+def available_models() -> Iterator[str]:
+    """Models in fallback order, best first; open breakers are skipped outright"""
+    for model in model_health.ordered(GROQ_MODELS):
+        if model_health.allow(model):
+            yield model
+        else:
+            model_fallbacks.labels(model=model, reason="circuit_open").inc()
+
+async def call_model(client: "groq.AsyncGroq", model: str, messages: list) -> str:
+    """One non-streaming Groq call, recorded in model health and metrics; raises on failure"""
+    with tracer.span("llm_attempt", model=model) as span:
+        try:
+            async with groq_semaphore:
+                started = time.perf_counter()
+                response = await client.chat.completions.create(
                     model=model,
                     messages=messages,
                     temperature=0.7,
@@ -221,20 +469,152 @@ def generate_groq_response(messages: list) -> str:
                     top_p=1,
                     stream=False
                 )
-                print(f"✅ Success with model: {model}")
-                return response.choices[0].message.content
-            except Exception as e:
-                print(f"❌ Model {model} failed: {e}")
+        except asyncio.CancelledError:
+            # Lost a hedge race or the client went away; not the model's fault
+            span["outcome"] = "cancelled"
+            raise
+        except Exception as e:
+            model_health.record_failure(model, str(e), trip=is_permanent_model_failure(e))
+            model_attempt_seconds.labels(model=model, outcome="error").observe(time.perf_counter() - started)
+            model_fallbacks.labels(model=model, reason="error").inc()
+            span["outcome"] = "error"
+            log.warning("model_failed", model=model, error=str(e))
+            raise
+        elapsed = time.perf_counter() - started
+        model_health.record_success(model, elapsed)
+        model_attempt_seconds.labels(model=model, outcome="success").observe(elapsed)
+        if response.usage:
+            prompt_tokens_total.labels(model=model).inc(response.usage.prompt_tokens or 0)
+            completion_tokens_total.labels(model=model).inc(response.usage.completion_tokens or 0)
+        span["outcome"] = "success"
+        log.debug("model_success", model=model, seconds=round(elapsed, 4))
+        return response.choices[0].message.content
+
+async def call_model_hedged(client: "groq.AsyncGroq", model: str, candidates: Iterator[str], messages: list) -> str:
+    """Call `model`; if it is slower than its hedge delay, race the next candidate against it.
+    
+    The first successful answer wins and the other call is cancelled. When
+    both fail the last error is raised, and the caller moves on to the
+    candidates after the backup.
+    """
+    primary = asyncio.ensure_future(call_model(client, model, messages))
+    pending = {primary}
+    try:
+        delay = hedger.delay_for(model_health.get(model))
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done or not hedger.has_budget():
+            if not done:
+                hedges.labels(result="budget_exhausted").inc()
+            return await primary
+        backup_model = next(candidates, None)
+        if backup_model is None:
+            return await primary
+        hedger.record_hedge()
+        hedges.labels(result="fired").inc()
+        log.debug("hedged", model=model, backup=backup_model, after_seconds=round(delay, 4))
+        backup = asyncio.ensure_future(call_model(client, backup_model, messages))
+        pending.add(backup)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    hedger.record_winner(backup=task is backup)
+                    hedges.labels(result="backup_won" if task is backup else "primary_won").inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing call, or both if this request was itself cancelled
+        for task in pending:
+            task.cancel()
+
+async def generate_groq_response(messages: list) -> str:
+    """Generate response using Groq API with latest models"""
+    client = get_groq_client()
+    if not client:
+        return UNAVAILABLE_RESPONSE
+    
+    try:
+        candidates = available_models()
+        if hedger:
+            hedger.note_request()
+        for model in candidates:
+            try:
+                if hedger:
+                    return await call_model_hedged(client, model, candidates, messages)
+                return await call_model(client, model, messages)
+            except Exception:
+                # Recorded by call_model; fall back to the next model
                 continue
         
         # If all models fail, provide a helpful fallback response
-        return "I'm currently experiencing technical difficulties with the AI service. However, I can still answer questions using my built-in knowledge base for factual information."
+        return FALLBACK_RESPONSE
         
     except Exception as e:
-        error_msg = f"I encountered an error: {str(e)}"
-        print(f"❌ Groq API error: {traceback.format_exc()}")
+        error_msg = f"{ERROR_RESPONSE_PREFIX}{str(e)}"
+        log.exception("groq_error")
         return error_msg
 
+async def generate_groq_stream(messages: list):
+    """Stream response tokens from Groq, falling back across models until one starts"""
+    client = get_groq_client()
+    if not client:
+        yield UNAVAILABLE_RESPONSE
+        return
+    
+    for model in model_health.ordered(GROQ_MODELS):
+        if not model_health.allow(model):
+            model_fallbacks.labels(model=model, reason="circuit_open").inc()
+            continue
+        async with groq_semaphore:
+            with tracer.span("llm_attempt", model=model, stream=True) as span:
+                try:
+                    started = time.perf_counter()
+                    stream = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=1024,
+                        top_p=1,
+                        stream=True
+                    )
+                    # Time to first byte is what the ranking cares about for streams
+                    elapsed = time.perf_counter() - started
+                    model_health.record_success(model, elapsed)
+                    model_attempt_seconds.labels(model=model, outcome="success").observe(elapsed)
+                    span["outcome"] = "success"
+                except Exception as e:
+                    model_health.record_failure(model, str(e), trip=is_permanent_model_failure(e))
+                    model_attempt_seconds.labels(model=model, outcome="error").observe(time.perf_counter() - started)
+                    model_fallbacks.labels(model=model, reason="error").inc()
+                    span["outcome"] = "error"
+                    log.warning("model_failed", model=model, error=str(e), stream=True)
+                    continue
+            
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Closing the upstream response stops token generation when the client goes away
+                await stream.close()
+            return
+    
+    yield FALLBACK_RESPONSE
+
+async def summarize_conversation(previous_summary: Optional[str], turns: list) -> Optional[str]:
+    """Fold turns into the running summary with the same Groq models as chat"""
+    summary = await generate_groq_response(summary_request(previous_summary, turns))
+    return None if is_degraded_response(summary) else summary
+
+compactor = ConversationCompactor(
+    memory,
+    summarize_conversation,
+    threshold=COMPACTION_THRESHOLD,
+    keep_recent=COMPACTION_KEEP_RECENT
+) if MEMORY_COMPACTION else None
+
 @app.get("/")
 async def root():
     groq_status = "connected" if groq_client else "disconnected"
@@ -246,108 +626,407 @@ async def root():
         "version": "4.1.0"
     }
 
+FACTUAL_SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions using provided search results.
+        
+        Guidelines:
+        - Use the search result to answer factual questions accurately
+        - If the search result doesn't contain the answer, acknowledge this and provide a helpful response
+        - Keep answers concise and informative
+        - Always be helpful and friendly"""
+
+CONVERSATIONAL_SYSTEM_PROMPT = "You are a helpful, friendly, and concise AI assistant. Use the conversation history for context when relevant."
+
+def build_prompt(user_message: str, is_factual: bool, tool_result: Optional[str],
+                 context: list = (), summary: Optional[str] = None):
+    """Groq message list and its prompt-token count for an already classified message"""
+    with CONTEXT_BUILD_SECONDS.time():
+        return _build_prompt(user_message, is_factual, tool_result, context, summary)
+
+def _build_prompt(user_message: str, is_factual: bool, tool_result: Optional[str],
+                  context: list, summary: Optional[str]):
+    if is_factual:
+        return context_builder.build(
+            FACTUAL_SYSTEM_PROMPT,
+            [],
+            {"role": "user", "content": f"Question: {user_message}\n\nSearch Result: {tool_result}\n\nPlease answer the question based on the search result above."}
+        )
+    
+    system_prompt = CONVERSATIONAL_SYSTEM_PROMPT
+    if summary:
+        # Compacted older turns stand in for the raw history they replaced
+        system_prompt += f"\n\nSummary of the earlier conversation: {summary}"
+    if context:
+        # Newest turns first, older ones truncated or dropped to stay in the token budget
+        return context_builder.build(system_prompt, context)
+    return context_builder.build(system_prompt, [], {"role": "user", "content": user_message})
+
+def classify(user_message: str) -> bool:
+    """Route a message with the intent router, timed and traced"""
+    with tracer.span("classify") as span, CLASSIFY_SECONDS.time():
+        decision = router.classify(user_message)
+        span["factual"], span["confidence"] = decision.factual, decision.confidence
+    return decision.factual
+
+async def remember(user_id: str, role: str, content: str):
+    with tracer.span("memory_write", role=role):
+        await call_store(memory, "add_message", user_id, role, content)
+
+async def recall(user_id: str):
+    """The recent turns and running summary that go into a conversational prompt"""
+    context = await call_store(memory, "get_context", user_id, 4)
+    return context, await call_store(memory, "get_summary", user_id)
+
+async def build_messages(user_message: str, user_id: str, direct: bool = False):
+    """Classify the message and build the Groq message list for it.
+    
+    With direct set, an exact knowledge base hit needs no model call:
+    messages is then None and tool_result is the answer.
+    """
+    is_factual = classify(user_message)
+    tool_result = None
+    
+    # Prepare messages for Groq
+    if is_factual:
+        # Use search tool for factual questions
+        tool_result, match = search(user_message)
+        if direct and is_direct_hit(match):
+            return None, is_factual, tool_result, 0
+        messages, prompt_tokens = build_prompt(user_message, is_factual, tool_result)
+    else:
+        # For conversational questions, use context
+        context, summary = await recall(user_id)
+        messages, prompt_tokens = build_prompt(user_message, is_factual, tool_result, context, summary)
+        log.debug("context_used", kept=len(messages) - 1, available=len(context))
+    
+    log.debug("prompt_built", factual=is_factual, prompt_tokens=prompt_tokens)
+    return messages, is_factual, tool_result, prompt_tokens
+
+async def _answer_factual(user_message: str, tool_result: str):
+    # Factual answers depend only on the question and the tool result, so they can be reused
+    ai_response = answer_cache.get(user_message, tool_result)
+    if ai_response is not None:
+        log.debug("answer_cache_hit")
+        return tool_result, ai_response, 0, "cache"
+    ai_response = semantic_lookup(user_message, tool_result)
+    if ai_response is not None:
+        log.debug("semantic_cache_hit")
+        return tool_result, ai_response, 0, "semantic_cache"
+    messages, prompt_tokens = build_prompt(user_message, True, tool_result)
+    ai_response = await generate_groq_response(messages)
+    if not is_degraded_response(ai_response):
+        answer_cache.put(user_message, tool_result, ai_response)
+        semantic_store(user_message, tool_result, ai_response)
+    return tool_result, ai_response, prompt_tokens, "model"
+
+async def answer_factual(user_message: str, direct: bool = False):
+    """(tool_result, answer, prompt_tokens, source) for a factual question.
+    
+    With direct set, an exact knowledge base hit is returned as stored
+    (source "direct"). Otherwise factual prompts carry no per-user context,
+    so concurrent requests with the same normalized question join one
+    in-flight Groq call. Joiners report prompt_tokens=0 and source
+    "coalesced" since they spent nothing. Conversational requests never come
+    through here, so answers cannot leak between sessions.
+    """
+    tool_result, match = search(user_message)
+    if direct and is_direct_hit(match):
+        return tool_result, tool_result, 0, "direct"
+    if not REQUEST_COALESCING:
+        return await _answer_factual(user_message, tool_result)
+    (tool_result, ai_response, prompt_tokens, source), shared = await factual_flight.do(
+        normalize_question(user_message), lambda: _answer_factual(user_message, tool_result)
+    )
+    if shared:
+        log.debug("coalesced")
+        prompt_tokens, source = 0, "coalesced"
+    return tool_result, ai_response, prompt_tokens, source
+
+async def admit(user_id: str, user_messages: List[str]):
+    """Wait for admission control; 429 with Retry-After when over the limit and the queue is full"""
+    if admission is None:
+        return
+    try:
+        await admission.acquire(user_id, estimate_tokens(user_messages), requests=len(user_messages))
+    except AdmissionRejected as e:
+        REJECTED.inc()
+        log.warning("admission_rejected", user_id=user_id, reason=e.reason, retry_after=e.retry_after_header)
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": e.retry_after_header})
+    ADMITTED.inc()
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    await admit(request.user_id or "default", [request.message])
     try:
-        print(f"📨 Received message: {request.message}")
-        
-        if not request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
         user_message = request.message.strip()
-        memory.add_message("user", user_message)
-        is_factual = is_factual_question(user_message)
-        tool_result = None
-        
-        print(f"🔍 Question type: {'Factual' if is_factual else 'Conversational'}")
-        
-        # Prepare messages for Groq
-        messages = []
+        user_id = request.user_id or "default"
+        await remember(user_id, "user", user_message)
+        is_factual = classify(user_message)
         
         if is_factual:
-            # Use search tool for factual questions
-            tool_result = search_tool(user_message)
-            print(f"🔧 Tool result: {tool_result}")
-            
-            system_prompt = """You are a helpful AI assistant that answers questions using provided search results.
-            
-            Guidelines:
-            - Use the search result to answer factual questions accurately
-            - If the search result doesn't contain the answer, acknowledge this and provide a helpful response
-            - Keep answers concise and informative
-            - Always be helpful and friendly"""
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Question: {user_message}\n\nSearch Result: {tool_result}\n\nPlease answer the question based on the search result above."}
-            ]
+            tool_result, ai_response, prompt_tokens, source = await answer_factual(
+                user_message, direct=wants_direct_answer(request.direct_answer)
+            )
         else:
-            # For conversational questions, use context
-            context = memory.get_context()
-            system_prompt = "You are a helpful, friendly, and concise AI assistant. Use the conversation history for context when relevant."
-            
-            messages = [{"role": "system", "content": system_prompt}]
+            tool_result, source = None, "model"
+            context, summary = await recall(user_id)
+            messages, prompt_tokens = build_prompt(user_message, False, None, context, summary)
             
-            # Add conversation history
-            for msg in context:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            print(f"💭 Using {len(context)} context messages")
-        
-        print(f"🤖 Sending {len(messages)} messages to Groq API")
+            # Generate response using Groq
+            ai_response = await generate_groq_response(messages)
+        ANSWER_SOURCES[source].inc()
         
-        # Generate response using Groq
-        ai_response = generate_groq_response(messages)
-        
-        print(f"✅ AI Response: {ai_response[:100]}...")
+        log.info("chat_answered", factual=is_factual, source=source, prompt_tokens=prompt_tokens, response_chars=len(ai_response))
         
         # Add AI response to memory
-        memory.add_message("assistant", ai_response)
+        await remember(user_id, "assistant", ai_response)
+        if compactor:
+            compactor.maybe_schedule(user_id)
         
         return ChatResponse(
             response=ai_response,
             used_tool=is_factual,
             tool_result=tool_result,
-            status="success"
+            status="success",
+            prompt_tokens=prompt_tokens,
+            direct_answer=source == "direct"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        error_trace = traceback.format_exc()
-        print(f"❌ Server error: {error_trace}")
+        log.exception("chat_failed")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest):
+    """Answer many independent questions at once.
+    
+    Items are stateless: they neither read nor write conversation memory.
+    Classification and knowledge base lookups run up front for the whole
+    batch, then Groq calls run concurrently under the batch's cap. Results
+    come back in request order, and a failing item only fails itself.
+    """
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="messages cannot be empty")
+    if len(request.messages) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_SIZE} messages per batch")
+    # Each item counts as a request; a batch larger than the user's burst waits for a full bucket
+    await admit(request.user_id or "default", request.messages)
+    
+    batch_started = time.perf_counter()
+    user_messages = [message.strip() for message in request.messages]
+    factual_flags = [decision.factual for decision in router.classify_batch(user_messages)]
+    search_results = search_batch([m for m, factual in zip(user_messages, factual_flags) if m and factual])
+    direct = wants_direct_answer(request.direct_answer)
+    
+    concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    batch_semaphore = asyncio.Semaphore(max(concurrency, 1))
+    log.info("batch_started", size=len(user_messages), concurrency=concurrency)
+    
+    async def answer(index: int, user_message: str, is_factual: bool) -> BatchItemResult:
+        started = time.perf_counter()
+        tool_result, match = search_results.get(user_message, (None, None)) if is_factual else (None, None)
+        try:
+            if not user_message:
+                raise ValueError("Message cannot be empty")
+            prompt_tokens, source = 0, "cache"
+            if direct and is_direct_hit(match):
+                ai_response, source = tool_result, "direct"
+            else:
+                ai_response = answer_cache.get(user_message, tool_result) if is_factual else None
+            if ai_response is None and is_factual:
+                ai_response, source = semantic_lookup(user_message, tool_result), "semantic_cache"
+            if ai_response is None:
+                messages, prompt_tokens = build_prompt(user_message, is_factual, tool_result)
+                async with batch_semaphore:
+                    ai_response = await generate_groq_response(messages)
+                source = "model"
+                if is_degraded_response(ai_response):
+                    raise RuntimeError(ai_response)
+                if is_factual:
+                    answer_cache.put(user_message, tool_result, ai_response)
+                    semantic_store(user_message, tool_result, ai_response)
+            ANSWER_SOURCES[source].inc()
+            return BatchItemResult(
+                index=index, status="success", response=ai_response, used_tool=is_factual,
+                tool_result=tool_result, prompt_tokens=prompt_tokens, direct_answer=source == "direct",
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+        except Exception as e:
+            return BatchItemResult(
+                index=index, status="error", used_tool=is_factual, tool_result=tool_result,
+                error=str(e), elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+    
+    results = await asyncio.gather(*[
+        answer(index, message, factual)
+        for index, (message, factual) in enumerate(zip(user_messages, factual_flags))
+    ])
+    succeeded = sum(1 for result in results if result.status == "success")
+    return BatchChatResponse(
+        results=results,
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        elapsed_ms=round((time.perf_counter() - batch_started) * 1000, 2)
+    )
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the answer as Server-Sent Events: meta, token..., done"""
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    user_message = request.message.strip()
+    user_id = request.user_id or "default"
+    await admit(user_id, [user_message])
+    await remember(user_id, "user", user_message)
+    messages, is_factual, tool_result, prompt_tokens = await build_messages(
+        user_message, user_id, direct=wants_direct_answer(request.direct_answer)
+    )
+    direct = messages is None
+    
+    async def direct_tokens():
+        yield tool_result
+    
+    async def event_stream():
+        yield format_sse(
+            {"used_tool": is_factual, "tool_result": tool_result, "prompt_tokens": prompt_tokens, "direct_answer": direct},
+            event="meta"
+        )
+        parts = []
+        # A direct answer goes out as a single token
+        tokens = direct_tokens() if direct else generate_groq_stream(messages)
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield format_sse({"token": token})
+        except Exception as e:
+            log.exception("stream_failed")
+            yield format_sse({"status": "error", "detail": str(e)}, event="error")
+            return
+        finally:
+            # Runs on client disconnect too, cancelling the upstream Groq stream
+            await tokens.aclose()
+        # Only reached when the client stayed connected until the last token
+        ANSWER_SOURCES["direct" if direct else "model"].inc()
+        await remember(user_id, "assistant", "".join(parts))
+        if compactor:
+            compactor.maybe_schedule(user_id)
+        yield format_sse({"status": "success"}, event="done")
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/health")
 async def health_check():
     groq_status = "connected" if groq_client else "disconnected"
+    memory_stats = memory.stats()
     return {
         "status": "healthy", 
         "service": "AI Question-Answer Helper",
         "groq_api": groq_status,
-        "memory_size": len(memory.conversation),
+        "memory_size": memory_stats["messages"],
+        "memory": memory_stats,
+        "compaction": compactor.stats() if compactor else None,
+        "models": model_health.snapshot(),
+        "hedging": hedger.stats() if hedger else None,
+        "tracing": tracer.stats(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "coalescing": factual_flight.stats() if REQUEST_COALESCING else None,
+        "admission": admission.stats() if admission else None,
+        "answer_sources": answer_source_stats(),
+        "ready": startup.ready,
         "version": "4.1.0"
     }
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about dependencies"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once warm-up has finished and a Groq client exists, 503 before"""
+    ready = startup.ready and groq_client is not None
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "startup": startup.snapshot(),
+        "groq_client": {"ready": groq_client is not None, "error": groq_client_init.error}
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+def check_admin_token(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        # Profiling exposes code paths and costs every request; never open it by default
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if token is None or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/admin/profile")
+async def profile_requests(
+    requests: int = 20,
+    timeout: float = 60.0,
+    sort: str = "cumulative",
+    limit: int = 40,
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Profile the next `requests` requests with cProfile and return the aggregated stats.
+    
+    Waits up to `timeout` seconds for those requests to arrive and finish;
+    if fewer come in, whatever was captured so far is returned.
+    """
+    check_admin_token(x_admin_token)
+    if requests < 1:
+        raise HTTPException(status_code=400, detail="requests must be at least 1")
+    if sort not in PROFILE_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(sorted(PROFILE_SORT_KEYS))}")
+    try:
+        done = profiler.arm(requests)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    log.info("profile_armed", requests=requests)
+    try:
+        await asyncio.wait_for(done.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        # Timed out or the caller went away: stop profiling either way
+        if profiler.active:
+            profiler.cancel()
+    report = profiler.report(sort=sort, limit=limit)
+    if report is None:
+        return {"requests": 0, "profile": None, "detail": f"No requests arrived within {timeout}s"}
+    return report
+
 @app.post("/clear")
-async def clear_memory():
-    """Clear conversation memory"""
-    memory.clear()
+async def clear_memory(user_id: Optional[str] = None):
+    """Clear conversation memory for one user, or for everyone when no user_id is given"""
+    await call_store(memory, "clear", user_id)
     return {"status": "success", "message": "Memory cleared"}
 
 @app.get("/knowledge")
 async def list_knowledge():
     """Endpoint to see all available knowledge"""
-    countries_with_capitals = [f"{country} - {knowledge_base[country]['capital']}" 
-                              for country in knowledge_base 
-                              if "capital" in knowledge_base[country]]
+    facts = fact_store.facts()
+    countries_with_capitals = [f"{fact.entity} - {fact.value}" for fact in facts if fact.attribute == "capital"]
     
-    science_facts = [key for key in knowledge_base 
-                    if any(word in key for word in ["mount", "telephone", "light", "gold", "oxygen", "water", "solar"])]
+    science_facts = sorted({fact.entity for fact in facts 
+                           if any(word in fact.entity for word in ["mount", "telephone", "light", "gold", "oxygen", "water", "solar"])})
     
-    general_topics = [key for key in knowledge_base 
-                     if key not in countries_with_capitals and key not in science_facts]
+    general_topics = [entity for entity in fact_store.entities() 
+                     if fact_store.get(entity, "capital") is None and entity not in science_facts]
     
     return {
-        "total_topics": len(knowledge_base),
+        "total_topics": len(fact_store.entities()),
+        "total_facts": len(fact_store),
         "capitals": countries_with_capitals,
         "science_facts": science_facts,
         "general_topics": general_topics
@@ -362,4 +1041,5 @@ if __name__ == "__main__":
     print("🐛 Debug mode: ON")
     print("🆕 Using latest Groq models")
     print("🎯 Improved search tool with better matching")
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, access_log=True)
\ No newline at end of file
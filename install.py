@@ -10,7 +10,9 @@ def install_requirements():
         "groq==0.36.0",
         "python-dotenv==1.2.1",
         "requests==2.32.5",
-        "pydantic==2.12.5"
+        "pydantic==2.12.5",
+        "numpy==2.4.6",
+        "scipy==1.17.1"
     ]
     
     print("Installing required packages...")
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+import groq_server
+from app.admission import AdmissionController, AdmissionRejected
+
+def test_queued_requests_are_served_round_robin_across_users():
+    # Global limit of 20 requests/s with room for one at a time; per-user limits out of the way
+    controller = AdmissionController(
+        user_requests_per_minute=60_000, global_requests_per_minute=1200, burst_seconds=0.05,
+        user_tokens_per_minute=1e9, global_tokens_per_minute=1e9, max_queue_per_user=10
+    )
+    order = []
+
+    async def request(user_id, label):
+        await controller.acquire(user_id, tokens=1)
+        order.append(label)
+
+    async def scenario():
+        # The first takes the only token; the heavy user then queues four before the others arrive
+        tasks = [asyncio.create_task(request("heavy", f"heavy-{i}")) for i in range(5)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(request(user, user)) for user in ("light-a", "light-b")]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order[0] == "heavy-0"
+    # Each waiting user gets a turn before the heavy user's backlog drains
+    assert set(order[2:4]) == {"light-a", "light-b"}
+    assert controller.stats()["queued"] == 0
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(
+        user_requests_per_minute=6, burst_seconds=10, max_queue=10, max_queue_per_user=1, max_wait_seconds=5
+    )
+
+    async def scenario():
+        await controller.acquire("alice", tokens=10)
+        waiting = asyncio.create_task(controller.acquire("alice", tokens=10))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("alice", tokens=10)
+        # Another user has a separate bucket and is not held up by the queue for alice
+        await controller.acquire("bob", tokens=10)
+        waiting.cancel()
+        return rejected.value
+
+    rejection = asyncio.run(scenario())
+    # One request per 10 seconds: the next one fits in about 10 seconds
+    assert 9 < rejection.retry_after <= 10
+    assert rejection.retry_after_header == "10"
+    assert controller.stats()["queued"] == 0
+    assert controller.stats()["rejected"] == 1
+
+def test_chat_returns_429_when_over_the_limit():
+    original = groq_server.admission
+    groq_server.admission = AdmissionController(
+        user_requests_per_minute=6, burst_seconds=10, max_queue_per_user=0
+    )
+
+    async def send(payloads):
+        transport = httpx.ASGITransport(app=groq_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/chat", json=payload) for payload in payloads]
+
+    try:
+        # Empty messages are rejected before admission and use none of the budget;
+        # direct answers come from the knowledge base without calling the model
+        question = {"message": "What is the capital of France?", "user_id": "u1", "direct_answer": True}
+        empty, first, second = asyncio.run(send([{"message": " ", "user_id": "u1"}, question, question]))
+        assert empty.status_code == 400
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert second.headers["Retry-After"] == "10"
+        health = asyncio.run(groq_server.health_check())
+        assert health["admission"]["rejected"] == 1
+    finally:
+        groq_server.admission = original
+
+def test_large_batch_is_charged_in_full():
+    original = groq_server.admission
+    # One request per 10 seconds, bursts of one
+    groq_server.admission = AdmissionController(
+        user_requests_per_minute=6, burst_seconds=10, max_queue_per_user=0
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=groq_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            batch = await client.post("/chat/batch", json={
+                "messages": ["What is the capital of France?"] * 5, "user_id": "bulk", "direct_answer": True
+            })
+            after = await client.post("/chat", json={"message": "What is the capital of Japan?", "user_id": "bulk"})
+        return batch, after
+
+    try:
+        batch, after = asyncio.run(scenario())
+        # Let through on a full bucket, but five requests' worth is owed before the next one fits
+        assert batch.status_code == 200 and batch.json()["succeeded"] == 5
+        assert after.status_code == 429
+        assert 45 <= int(after.headers["Retry-After"]) <= 50
+    finally:
+        groq_server.admission = original
@@ -0,0 +1,77 @@
+import asyncio
+import random
+
+import httpx
+
+import app.main
+import groq_server
+from app.agent import AIQuestionAnswerAgent
+from app.llm import FakeBackend
+from app.startup import LazyClient
+
+QUESTIONS = ["Tell me a joke", "Write a haiku about rain", "boom", "  ", "Say hello"]
+
+def post_batches(application, payloads):
+    async def scenario():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/chat/batch", json=payload) for payload in payloads]
+    return asyncio.run(scenario())
+
+def test_groq_server_batch_keeps_order_and_isolates_failures(monkeypatch):
+    calls = []
+
+    async def fake_groq(messages):
+        question = messages[-1]["content"]
+        calls.append(question)
+        # Finish in a shuffled order; results must still come back in request order
+        await asyncio.sleep(random.random() * 0.05)
+        if question == "boom":
+            raise RuntimeError("model exploded")
+        return f"answer to {question}"
+
+    monkeypatch.setattr(groq_server, "generate_groq_response", fake_groq)
+    monkeypatch.setattr(groq_server, "BATCH_MAX_SIZE", 5)
+    batch, too_big, empty = post_batches(groq_server.app, [
+        {"messages": QUESTIONS, "user_id": "batcher"},
+        {"messages": QUESTIONS + ["one too many"]},
+        {"messages": []}
+    ])
+
+    assert batch.status_code == 200
+    body = batch.json()
+    results = body["results"]
+    assert [result["index"] for result in results] == list(range(5))
+    assert [result["response"] for result in results if result["status"] == "success"] == [
+        "answer to Tell me a joke", "answer to Write a haiku about rain", "answer to Say hello"
+    ]
+    assert results[2]["status"] == "error" and results[2]["error"] == "model exploded"
+    assert results[3]["status"] == "error" and results[3]["error"] == "Message cannot be empty"
+    assert (body["total"], body["succeeded"], body["failed"]) == (5, 3, 2)
+    # The empty item never reached the model
+    assert sorted(calls) == sorted(q for q in QUESTIONS if q.strip())
+    assert too_big.status_code == 400 and empty.status_code == 400
+
+def test_agent_batch_keeps_order_and_isolates_failures(monkeypatch):
+    # The first model call fails; the others still succeed
+    backend = FakeBackend(failures=1)
+    agent = AIQuestionAnswerAgent(backend=backend)
+    monkeypatch.setattr(app.main, "agent_init", LazyClient("agent", lambda: agent))
+    monkeypatch.setattr(app.main, "BATCH_MAX_SIZE", 5)
+    batch, too_big, empty = post_batches(app.main.app, [
+        {"messages": QUESTIONS, "max_concurrency": 1},
+        {"messages": QUESTIONS + ["one too many"]},
+        {"messages": []}
+    ])
+
+    assert batch.status_code == 200
+    results = batch.json()["results"]
+    assert [result["index"] for result in results] == list(range(5))
+    assert results[0]["status"] == "error" and "Injected failure" in results[0]["error"]
+    assert results[1]["response"] == "Fake answer to: Write a haiku about rain"
+    assert results[2]["response"] == "Fake answer to: boom"
+    assert results[3]["status"] == "error" and results[3]["error"] == "Message cannot be empty"
+    assert results[3]["response"] is None
+    assert results[4]["response"] == "Fake answer to: Say hello"
+    assert len(backend.calls) == 4
+    assert too_big.status_code == 400 and empty.status_code == 400
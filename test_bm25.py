@@ -0,0 +1,45 @@
+import pytest
+
+from app.bm25 import BM25Index
+from app.tools import SearchTool
+
+def test_rare_terms_and_short_documents_rank_higher():
+    index = BM25Index(["gold ring", "gold coin", "gold medal", "silver coin"])
+    # "silver" is in one document and "gold" in three, so silver decides the ranking
+    hits = index.search("gold silver", k=4)
+    assert hits[0][0] == 3
+    assert sorted(doc for doc, _ in hits) == [0, 1, 2, 3]
+    # Same document length, so the score gap is all idf
+    assert index.search("silver")[0][1] > index.search("gold")[0][1]
+
+    index = BM25Index(["gold", "gold silver copper iron tin zinc lead"])
+    (short, short_score), (long, long_score) = index.search("gold")
+    assert (short, long) == (0, 1) and short_score > long_score
+
+def test_empty_and_unknown_queries_return_nothing():
+    index = BM25Index(["capital of france", "speed of light"])
+    assert index.search("") == []
+    assert index.search("what is the") == []
+    assert index.search("unobtainium") == []
+    assert index.search_batch(["light", "unobtainium", "capital light"], k=1) == [
+        index.search("light", k=1), [], index.search("capital light", k=1)
+    ]
+    assert BM25Index([]).search("anything") == []
+
+def test_search_tool_bm25_mode():
+    substring = SearchTool()
+    assert substring("Who invented the telephone?").startswith("I couldn't find")
+
+    tool = SearchTool(mode="bm25")
+    assert tool("Who invented the telephone?") == substring.knowledge_base["inventor of telephone"]
+    assert tool("How fast is the speed of light?").startswith("The speed of light")
+    assert tool.search_topk("largest ocean", k=1)[0][0] == "largest ocean"
+    # A single shared word does not clear min_coverage; substring matching still gets its turn
+    assert tool("Tell me about the capital of Kenya").startswith("I couldn't find")
+    assert tool("capital of france") == "The capital of France is Paris."
+
+    # New facts are indexed on the next search
+    tool.add_fact("capital of kenya", "The capital of Kenya is Nairobi.")
+    assert tool("Tell me about the capital of Kenya") == "The capital of Kenya is Nairobi."
+    with pytest.raises(ValueError):
+        SearchTool(mode="fuzzy")
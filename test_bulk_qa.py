@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import bulk_qa
+import groq_server
+from app.cache import AnswerCache
+from test_concurrency import start_fake_groq
+
+QUESTIONS = ["What is the capital of France?", "Tell me a joke", "How tall is Mount Everest?", "What is the capital of Japan?"]
+
+def run(input_path, output_path, **options):
+    async def scenario():
+        groq_server.groq_client = groq_server.create_groq_client(api_key="test-key", base_url=f"http://127.0.0.1:{PORT}")
+        try:
+            return await bulk_qa.run_bulk(str(input_path), str(output_path), report=lambda message: None, **options)
+        finally:
+            await groq_server.groq_client.close()
+    return asyncio.run(scenario())
+
+def test_killed_run_resumes_without_repeating_work(tmp_path):
+    global PORT
+    server, PORT = start_fake_groq()
+    original = groq_server.groq_client, groq_server.answer_cache
+    try:
+        groq_server.answer_cache = AnswerCache()
+        input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+        with open(input_path, "w", encoding="utf-8") as handle:
+            for i in range(40):
+                handle.write(json.dumps({"id": f"q{i}", "question": f"{QUESTIONS[i % 4]} ({i})"}) + "\n")
+            handle.write("\n" + json.dumps("Who painted the Mona Lisa?") + "\n{not json\n")
+
+        first = run(input_path, output_path, concurrency=4, limit=15, checkpoint_every=5, direct=True)
+        assert first["started"] == 15
+        # A crash after the checkpoint leaves a half-written result behind; resuming cuts it off
+        with open(output_path, "a", encoding="utf-8") as handle:
+            handle.write('{"line": 999, "resp')
+        second = run(input_path, output_path, concurrency=4, checkpoint_every=5, direct=True)
+        assert second["started"] == 43 - 15 - 1
+
+        with open(output_path, encoding="utf-8") as handle:
+            results = [json.loads(line) for line in handle]
+        lines = sorted(result["line"] for result in results)
+        assert lines == [line for line in range(1, 44) if line != 41]
+        by_line = {result["line"]: result for result in results}
+        assert by_line[1]["id"] == "q0" and by_line[1]["direct_answer"]
+        assert by_line[1]["response"] == "The capital of France is Paris."
+        assert by_line[2]["response"] == "fake answer" and not by_line[2]["used_tool"]
+        assert by_line[42]["question"] == "Who painted the Mona Lisa?"
+        assert by_line[43]["status"] == "error"
+        checkpoint = json.load(open(f"{output_path}.checkpoint", encoding="utf-8"))
+        assert checkpoint["watermark"] == 43 and checkpoint["done"] == []
+        assert checkpoint["failed"] == [43]
+
+        # Failed lines stay failed on a plain rerun and are sent again with retry_failed
+        assert run(input_path, output_path, concurrency=4, direct=True)["started"] == 0
+        text = input_path.read_text(encoding="utf-8")
+        input_path.write_text(text.replace("{not json", json.dumps({"id": "fixed", "question": "Tell me a joke"})), encoding="utf-8")
+        third = run(input_path, output_path, concurrency=4, direct=True, retry_failed=True)
+        assert third["started"] == 1 and third["answered"] == 1
+        with open(output_path, encoding="utf-8") as handle:
+            retried = [json.loads(line) for line in handle if json.loads(line)["line"] == 43]
+        assert [result["status"] for result in retried] == ["error", "success"] and retried[-1]["id"] == "fixed"
+        checkpoint = json.load(open(f"{output_path}.checkpoint", encoding="utf-8"))
+        assert checkpoint["watermark"] == 43 and checkpoint["failed"] == []
+    finally:
+        groq_server.groq_client, groq_server.answer_cache = original
+        server.should_exit = True
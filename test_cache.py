@@ -0,0 +1,44 @@
+import time
+
+from app.cache import AnswerCache
+from app.facts import FactStore
+from app.tools import SearchTool
+
+PARIS = "The capital of France is Paris."
+
+def test_lru_eviction_ttl_and_counters():
+    cache = AnswerCache(max_size=2, ttl_seconds=60)
+    cache.put("What is the capital of France?", PARIS, "Paris.")
+    # Case, punctuation and spacing do not matter; the tool result does
+    assert cache.get("what is the  capital of france", PARIS) == "Paris."
+    assert cache.get("What is the capital of France?", "The capital of Spain is Madrid.") is None
+
+    cache.put("How tall is Everest?", None, "8,848 m.")
+    cache.get("What is the capital of France?", PARIS)
+    cache.put("Who invented the telephone?", None, "Bell.")
+    # Everest was the least recently used once France was read again
+    assert cache.get("How tall is Everest?", None) is None
+    assert cache.get("What is the capital of France?", PARIS) == "Paris."
+    assert len(cache) == 2
+
+    cache.put("Who founded Microsoft?", None, "Gates and Allen.", ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert cache.get("Who founded Microsoft?", None) is None
+    assert cache.stats() == {
+        "size": 1, "max_size": 2, "ttl_seconds": 60, "hits": 3, "misses": 3,
+        "evictions": 2, "expirations": 1, "hit_rate": 0.5
+    }
+
+def test_knowledge_base_changes_flush_the_cache():
+    store, cache = FactStore(), AnswerCache()
+    store.on_change(cache.clear)
+    store.add("france", "capital", "Paris", PARIS)
+    cache.put("What is the capital of France?", PARIS, "Paris.")
+    store.add_entity_aliases("france", "french republic")
+    assert len(cache) == 0
+
+    tool, cache = SearchTool(), AnswerCache()
+    tool.on_change(cache.clear)
+    cache.put("What is the capital of France?", PARIS, "Paris.")
+    tool.add_fact("capital of kenya", "The capital of Kenya is Nairobi.")
+    assert cache.get("What is the capital of France?", PARIS) is None
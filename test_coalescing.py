@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+
+import groq_server
+import test_concurrency
+from app.cache import AnswerCache
+from app.singleflight import SingleFlight
+from test_concurrency import start_fake_groq
+
+async def send_chats(payloads):
+    transport = httpx.ASGITransport(app=groq_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*[client.post("/chat", json=payload) for payload in payloads])
+        await groq_server.groq_client.close()
+    assert all(r.status_code == 200 for r in responses)
+    return [r.json() for r in responses]
+
+def test_identical_factual_questions_share_one_call():
+    server, port = start_fake_groq()
+    original = groq_server.groq_client, groq_server.answer_cache, groq_server.factual_flight
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.answer_cache = AnswerCache()
+        groq_server.factual_flight = SingleFlight()
+        calls_before = test_concurrency.fake_calls()
+
+        # Punctuation and case differences normalize to the same question
+        questions = ["What is the capital of France?", "what is the capital of france"] * 5
+        results = asyncio.run(send_chats([
+            {"message": question, "user_id": f"user-{i}"} for i, question in enumerate(questions)
+        ]))
+
+        assert test_concurrency.fake_calls() - calls_before == 1
+        assert all(result["response"] == "fake answer" for result in results)
+        assert sum(1 for result in results if result["prompt_tokens"]) == 1
+        assert groq_server.factual_flight.stats()["coalesced"] == 9
+        assert len(groq_server.factual_flight) == 0
+    finally:
+        groq_server.groq_client, groq_server.answer_cache, groq_server.factual_flight = original
+        server.should_exit = True
+
+def test_conversational_requests_are_not_coalesced():
+    server, port = start_fake_groq()
+    original = groq_server.groq_client, groq_server.factual_flight
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.factual_flight = SingleFlight()
+        calls_before = test_concurrency.fake_calls()
+
+        asyncio.run(send_chats([{"message": "Tell me about my day", "user_id": f"user-{i}"} for i in range(4)]))
+
+        assert test_concurrency.fake_calls() - calls_before == 4
+        assert groq_server.factual_flight.stats()["leaders"] == 0
+    finally:
+        groq_server.groq_client, groq_server.factual_flight = original
+        server.should_exit = True
+
+def test_failed_flight_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        outcomes = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+        return flight, outcomes
+
+    flight, outcomes = asyncio.run(scenario())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert flight.stats()["leaders"] == 1 and flight.stats()["coalesced"] == 2
+    assert len(flight) == 0
@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+
+import groq_server
+from app.memory import SessionStore
+from app.summarizer import ConversationCompactor
+from test_concurrency import start_fake_groq
+
+async def stand_in_summarizer(previous_summary, turns):
+    """Deterministic local model: lists the folded user turns"""
+    await asyncio.sleep(0.01)
+    said = ", ".join(turn["content"] for turn in turns if turn["role"] == "user")
+    return f"{previous_summary}; {said}" if previous_summary else said
+
+def test_old_turns_fold_into_summary():
+    async def scenario():
+        store = SessionStore(max_messages=10, ttl_minutes=None)
+        compactor = ConversationCompactor(store, stand_in_summarizer, threshold=6, keep_recent=2)
+        for turn in range(4):
+            store.add_message("alice", "user", f"question {turn}")
+            store.add_message("alice", "assistant", f"answer {turn}")
+            compactor.maybe_schedule("alice")
+            await compactor.drain()
+        return store, compactor
+
+    store, compactor = asyncio.run(scenario())
+    assert store.get_summary("alice") == "question 0, question 1, question 2"
+    assert [m["content"] for m in store.get_context("alice", 10)] == ["question 3", "answer 3"]
+    assert compactor.completed == 1
+
+def test_failed_summary_keeps_history():
+    async def failing_summarizer(previous_summary, turns):
+        return None
+
+    async def scenario():
+        store = SessionStore(max_messages=10, ttl_minutes=None)
+        compactor = ConversationCompactor(store, failing_summarizer, threshold=2, keep_recent=1)
+        for turn in range(3):
+            store.add_message("bob", "user", f"message {turn}")
+        compactor.maybe_schedule("bob")
+        await compactor.drain()
+        return store, compactor
+
+    store, compactor = asyncio.run(scenario())
+    assert store.get_summary("bob") is None
+    assert len(store.get_context("bob", 10)) == 3
+    assert compactor.failed == 1
+
+def test_prompt_uses_summary_from_stand_in_groq():
+    server, port = start_fake_groq()
+    original_client, original_memory, original_compactor = groq_server.groq_client, groq_server.memory, groq_server.compactor
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.memory = SessionStore(max_messages=10, ttl_minutes=None)
+        groq_server.compactor = ConversationCompactor(
+            groq_server.memory, groq_server.summarize_conversation, threshold=4, keep_recent=2
+        )
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for turn in range(3):
+                    response = await client.post("/chat", json={"message": f"Let's chat, turn {turn}", "user_id": "carol"})
+                    assert response.status_code == 200
+                    await groq_server.compactor.drain()
+            await groq_server.groq_client.close()
+
+        asyncio.run(scenario())
+        # The stand-in model answers every request, summaries included, with "fake answer"
+        assert groq_server.memory.get_summary("carol") == "fake answer"
+        messages, _, _, _ = asyncio.run(groq_server.build_messages("And now?", "carol"))
+        assert "Summary of the earlier conversation: fake answer" in messages[0]["content"]
+        assert groq_server.memory.get_summary("someone-else") is None
+    finally:
+        groq_server.groq_client = original_client
+        groq_server.memory = original_memory
+        groq_server.compactor = original_compactor
+        server.should_exit = True
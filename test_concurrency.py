@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import httpx
+
+import groq_server
+from benchmarks.fake_llm import FakeLLMConfig, create_fake_llm_app, start_fake_llm
+
+FAKE_LATENCY_SECONDS = 0.5
+
+fake_groq = create_fake_llm_app(FakeLLMConfig(latency_ms=FAKE_LATENCY_SECONDS * 1000))
+
+def fake_calls() -> int:
+    """Completions requested from the stand-in so far, for tests that count upstream calls"""
+    return sum(fake_groq.state.calls.values())
+
+def start_fake_groq():
+    return start_fake_llm(fake_groq)
+
+async def send_concurrent_chats(count: int) -> float:
+    transport = httpx.ASGITransport(app=groq_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/chat", json={"message": f"Tell me a joke number {i}"})
+            for i in range(count)
+        ])
+        elapsed = time.perf_counter() - start
+        await groq_server.groq_client.close()
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["response"] == "fake answer" for r in responses)
+    return elapsed
+
+def test_slow_requests_run_concurrently():
+    server, port = start_fake_groq()
+    original_client = groq_server.groq_client
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.set_groq_concurrency(16)
+        count = 8
+        elapsed = asyncio.run(send_concurrent_chats(count))
+        # Serialized calls would take count * latency; concurrent ones about one latency
+        assert elapsed < FAKE_LATENCY_SECONDS * 2, f"{count} requests took {elapsed:.2f}s"
+    finally:
+        groq_server.groq_client = original_client
+        groq_server.set_groq_concurrency(groq_server.GROQ_MAX_CONCURRENCY)
+        server.should_exit = True
+
+def test_concurrency_limit_is_enforced():
+    server, port = start_fake_groq()
+    original_client = groq_server.groq_client
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.set_groq_concurrency(2)
+        elapsed = asyncio.run(send_concurrent_chats(4))
+        # Two at a time means two rounds of latency
+        assert elapsed >= FAKE_LATENCY_SECONDS * 2
+    finally:
+        groq_server.groq_client = original_client
+        groq_server.set_groq_concurrency(groq_server.GROQ_MAX_CONCURRENCY)
+        server.should_exit = True
+
+def test_stream_falls_back_past_a_model_outage():
+    from app.health import ModelHealthRegistry
+    from benchmarks.fake_llm import FakeLLMConfig, create_fake_llm_app, start_fake_llm
+
+    first_model = groq_server.GROQ_MODELS[0]
+    # 404 is a permanent failure, so the Groq SDK does not retry it
+    outage = create_fake_llm_app(FakeLLMConfig(latency_ms=10, down_models=[first_model], outage_status=404, chunk_delay_ms=0))
+    server, port = start_fake_llm(outage)
+    original_client, original_health = groq_server.groq_client, groq_server.model_health
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.model_health = ModelHealthRegistry()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/chat/stream", json={"message": "Tell me a story", "user_id": "outage"})
+            await groq_server.groq_client.close()
+            return response
+
+        body = asyncio.run(scenario()).text
+        assert '"token": "fake"' in body and "event: done" in body
+        assert outage.state.calls[first_model] == 1
+        assert outage.state.calls[groq_server.GROQ_MODELS[1]] == 1
+        assert groq_server.model_health.get(first_model).breaker.current_state() == "open"
+    finally:
+        groq_server.groq_client, groq_server.model_health = original_client, original_health
+        server.should_exit = True
@@ -0,0 +1,49 @@
+from app.context import MESSAGE_OVERHEAD_TOKENS, TRUNCATION_MARKER, ContextBuilder, count_tokens, message_tokens
+
+SYSTEM = "You are a helpful assistant."
+
+def turn(index, words=20):
+    return {"role": "user" if index % 2 == 0 else "assistant", "content": f"turn {index} " + "word " * words}
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    # Words cost a token per four characters, punctuation one each
+    assert count_tokens("hello") == 2
+    assert count_tokens("a, b.") == 4
+    assert count_tokens("internationalization") == 5
+
+def test_oldest_history_goes_first_and_required_messages_stay():
+    history = [turn(i) for i in range(10)]
+    question = {"role": "user", "content": "What did I say first?"}
+    budget = message_tokens({"content": SYSTEM}) + message_tokens(question) + 3 * message_tokens(history[0])
+    messages, used = ContextBuilder(max_prompt_tokens=budget).build(SYSTEM, history, question)
+    assert messages[0] == {"role": "system", "content": SYSTEM}
+    assert messages[-1] == question
+    # The three newest turns fit exactly; everything older is dropped
+    assert messages[1:-1] == history[-3:]
+    assert used == budget == sum(message_tokens(message) for message in messages)
+
+    unlimited, _ = ContextBuilder(max_prompt_tokens=100_000).build(SYSTEM, history, question)
+    assert unlimited[1:-1] == history
+
+def test_turn_crossing_the_budget_is_truncated_when_useful():
+    history = [turn(0, words=10), turn(1, words=400)]
+    question = {"role": "user", "content": "Summarize that."}
+    builder = ContextBuilder(max_prompt_tokens=200, min_turn_tokens=32)
+    messages, used = builder.build(SYSTEM, history, question)
+    assert len(messages) == 3 and messages[-1] == question
+    assert messages[1]["content"].startswith("turn 1 word") and messages[1]["content"].endswith(TRUNCATION_MARKER)
+    assert used <= 200
+
+    # Too little room left for a useful excerpt: the turn is dropped instead
+    tight = message_tokens({"content": SYSTEM}) + message_tokens(question) + MESSAGE_OVERHEAD_TOKENS + 10
+    messages, _ = ContextBuilder(max_prompt_tokens=tight, min_turn_tokens=32).build(SYSTEM, history, question)
+    assert [message["role"] for message in messages] == ["system", "user"]
+
+def test_oversized_question_is_truncated_to_fit():
+    question = {"role": "user", "content": "Explain this log: " + "error " * 2000}
+    messages, used = ContextBuilder(max_prompt_tokens=300).build(SYSTEM, [turn(0)], question)
+    assert [message["role"] for message in messages] == ["system", "user"]
+    assert messages[-1]["content"].startswith("Explain this log: error")
+    assert messages[-1]["content"].endswith(TRUNCATION_MARKER)
+    assert used <= 300
@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+
+import groq_server
+import test_concurrency
+from app.cache import AnswerCache
+from test_concurrency import start_fake_groq
+
+def test_exact_knowledge_base_hits_skip_groq():
+    server, port = start_fake_groq()
+    original = groq_server.groq_client, groq_server.answer_cache
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+        groq_server.answer_cache = AnswerCache()
+        sources_before = dict(groq_server.answer_source_stats()["answers"])
+        calls_before = test_concurrency.fake_calls()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                direct = await client.post("/chat", json={"message": "What is the capital of France?", "direct_answer": True})
+                # DIRECT_ANSWERS is off by default, so without the flag Groq rephrases the same hit
+                default = await client.post("/chat", json={"message": "What is the capital of France?"})
+                batch = await client.post("/chat/batch", json={
+                    "messages": ["What is the capital of Japan?", "Tell me about Japan"], "direct_answer": True
+                })
+                stream = await client.post("/chat/stream", json={"message": "How tall is Mount Everest?", "direct_answer": True})
+                continent = await client.post("/chat", json={"message": "What is the capital of South America?", "direct_answer": True})
+                health = await client.get("/health")
+            await groq_server.groq_client.close()
+            return direct.json(), default.json(), batch.json(), stream.text, continent.json(), health.json()
+
+        direct, default, batch, stream, continent, health = asyncio.run(scenario())
+        assert direct["direct_answer"] and direct["response"] == direct["tool_result"] == "The capital of France is Paris."
+        assert direct["prompt_tokens"] == 0
+        assert not default["direct_answer"] and default["response"] == "fake answer"
+        exact, entity_only = batch["results"]
+        assert exact["direct_answer"] and exact["response"] == "The capital of Japan is Tokyo."
+        # Naming only the entity is not an exact (entity, attribute) match
+        assert not entity_only["direct_answer"] and entity_only["response"] == "fake answer"
+        assert '"direct_answer": true' in stream and "8,848 meters" in stream
+        # No stored fact is about South America, so it is never answered with the United States' capital
+        assert not continent["direct_answer"] and continent["response"] == "fake answer"
+        assert "Washington" not in (continent["tool_result"] or "")
+        # Groq saw the default request, the entity-only batch item and the continent question, nothing else
+        assert test_concurrency.fake_calls() - calls_before == 3
+
+        answers = health["answer_sources"]["answers"]
+        assert answers["direct"] - sources_before["direct"] == 3
+        assert answers["model"] - sources_before["model"] == 3
+        assert 0.0 < health["answer_sources"]["llm_skip_ratio"] <= 1.0
+    finally:
+        groq_server.groq_client, groq_server.answer_cache = original
+        server.should_exit = True
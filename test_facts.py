@@ -0,0 +1,74 @@
+import groq_server
+from app.facts import ATTRIBUTE_MISMATCH_CONFIDENCE, ENTITY_ONLY_CONFIDENCE, FactStore
+from app.matcher import TokenAhoCorasick, tokenize
+
+def test_aho_corasick_reports_overlapping_matches():
+    matcher = TokenAhoCorasick()
+    for phrase in ("south africa", "africa", "speed of light", "light", "of light year", "ai"):
+        matcher.add(phrase, phrase)
+    found = matcher.find_all(tokenize("Speed of light in South Africa"))
+    assert sorted(found) == [
+        (0, 3, "speed of light"), (2, 3, "light"), (4, 6, "south africa"), (5, 6, "africa")
+    ]
+    # Halfway down "of light year", the suffix "light" is still reported
+    assert matcher.find_all(["of", "light", "month"]) == [(1, 2, "light")]
+    # Whole tokens only: "ai" is not found inside "said"
+    assert matcher.find_all(tokenize("she said hello")) == []
+    # Patterns added after a search are picked up on the next one
+    matcher.add("hello", "hello")
+    assert matcher.find_all(tokenize("she said hello")) == [(2, 3, "hello")]
+
+def test_lookup_by_capital_population_and_alias():
+    store = groq_server.build_fact_store()
+    assert store.lookup("What is the capital of France?").fact.answer == "The capital of France is Paris."
+    assert store.lookup("capital city of kenya").fact.value == "Nairobi"
+    assert store.lookup("How many people live in India?").fact.value == "1.3 billion"
+    assert store.lookup("How tall is Everest?").fact.answer.startswith("Mount Everest is 8,848 meters")
+    assert store.lookup("What is the capital of the USA?").fact.value == "Washington D.C."
+    assert store.lookup("When did WW2 end?").fact.value == "1945"
+    match = store.lookup("Which is the largest ocean?")
+    assert match.fact.entity == "pacific ocean" and match.exact
+    assert store.lookup("What is the weather like today?") is None
+    # Continents are not the country that shares part of their name
+    assert store.lookup("What is the capital of South America?") is None
+    assert store.lookup("capital of North America") is None
+
+def test_china_and_india_keep_both_capital_and_population():
+    # The old nested dict listed each country twice, so the second entry replaced the capital
+    store = groq_server.build_fact_store()
+    for entity, capital, population in (("china", "Beijing", "1.4 billion"), ("india", "New Delhi", "1.3 billion")):
+        capital_match = store.lookup(f"What is the capital of {entity}?")
+        population_match = store.lookup(f"What is the population of {entity}?")
+        assert capital_match.exact and capital_match.fact.value == capital
+        assert population_match.exact and population_match.fact.value == population
+    assert store.get("china", "capital") is not None and store.get("india", "population") is not None
+
+def test_longest_entity_wins_and_confidence_reflects_the_attribute():
+    store = FactStore()
+    store.add("africa", "size", "30.3 million km2", "Africa covers about 30.3 million km2.")
+    store.add("south africa", "capital", "Pretoria", "The capital of South Africa is Pretoria.")
+    store.add_attribute_phrases("size", "how big")
+    changes = []
+    store.on_change(lambda: changes.append(True))
+    assert store.find_mentions("What is the capital of South Africa?") == (["south africa"], ["capital"])
+    assert store.lookup("capital of south africa").confidence == 1.0
+
+    entity_only = store.lookup("Tell me about South Africa")
+    assert entity_only.fact.value == "Pretoria" and not entity_only.exact
+    assert entity_only.confidence == ENTITY_ONLY_CONFIDENCE
+    mismatch = store.lookup("How big is South Africa?")
+    assert not mismatch.exact and mismatch.confidence == ATTRIBUTE_MISMATCH_CONFIDENCE
+
+    store.add("South Africa", "size", "1.2 million km2", "South Africa covers about 1.2 million km2.", aliases=["rsa"])
+    assert changes == [True]
+    assert store.lookup("How big is the RSA?").fact.value == "1.2 million km2"
+
+def test_qualified_place_names_are_not_the_entity():
+    store = FactStore()
+    store.add("sudan", "capital", "Khartoum", "The capital of Sudan is Khartoum.")
+    store.add("america", "capital", "Washington D.C.", "The capital of America is Washington D.C.")
+    assert store.lookup("What is the capital of Sudan?").exact
+    assert store.lookup("What is the capital of South Sudan?") is None
+    assert store.lookup("What is the capital of Latin America?") is None
+    # Only the qualified mention is dropped; another one in the same question still counts
+    assert store.find_mentions("Is South Sudan bigger than Sudan?") == (["sudan"], [])
@@ -6,10 +6,11 @@ load_dotenv()
 
 def test_groq():
     try:
-        client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"))
+        # GROQ_BASE_URL can point this at the local stand-in (python -m benchmarks.fake_llm)
+        client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"), base_url=os.getenv("GROQ_BASE_URL"))
         
         response = client.chat.completions.create(
-            model="llama3-8b-8192",
+            model="llama-3.1-8b-instant",
             messages=[{"role": "user", "content": "Hello, how are you?"}],
             temperature=0.7,
             max_tokens=100
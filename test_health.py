@@ -0,0 +1,59 @@
+from app.health import CircuitBreaker, ModelHealthRegistry
+
+def test_breaker_opens_cools_down_and_probes():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30.0)
+    breaker.record_failure(now=0.0)
+    breaker.record_failure(now=0.0)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow_request(now=0.0)
+    breaker.record_failure(now=1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    # Open for the whole cooldown
+    assert not breaker.allow_request(now=30.9)
+    assert breaker.retry_in(now=11.0) == 20.0
+
+    # Then one probe at a time; a failed probe reopens at once
+    assert breaker.allow_request(now=31.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request(now=31.0)
+    breaker.record_failure(now=32.0)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow_request(now=61.0)
+
+    # A successful probe closes it again
+    assert breaker.allow_request(now=62.0)
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.consecutive_failures == 0
+    assert breaker.allow_request(now=62.0) and breaker.allow_request(now=62.0)
+
+def test_breaker_trips_at_once_and_frees_a_lost_probe():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=10.0)
+    breaker.record_failure(trip=True, now=0.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow_request(now=10.0)
+    # The probe never reports back (e.g. the request was cancelled): another goes out after a cooldown
+    assert not breaker.allow_request(now=15.0)
+    assert breaker.allow_request(now=20.0)
+
+def test_registry_skips_open_models_and_ranks_the_rest():
+    registry = ModelHealthRegistry(failure_threshold=2, cooldown_seconds=60.0)
+    models = ["primary", "secondary", "tertiary"]
+    # Ties keep the configured order
+    assert registry.ordered(models) == models
+
+    registry.record_success("secondary", 0.2)
+    registry.record_success("tertiary", 0.5)
+    registry.record_success("primary", 2.0)
+    assert registry.ordered(models) == ["secondary", "tertiary", "primary"]
+
+    registry.record_failure("secondary", "503 Service Unavailable")
+    # One failure lowers the success rate without opening the breaker
+    assert registry.ordered(models) == ["secondary", "tertiary", "primary"]
+    assert registry.get("secondary").breaker.state == "closed"
+    registry.record_failure("secondary", "503 Service Unavailable")
+    assert registry.ordered(models) == ["tertiary", "primary"]
+    assert not registry.allow("secondary")
+    snapshot = registry.snapshot()["secondary"]
+    assert snapshot["state"] == "open" and snapshot["consecutive_failures"] == 2
+    assert snapshot["last_error"] == "503 Service Unavailable"
+
+    registry.record_failure("primary", "model_decommissioned", trip=True)
+    assert registry.ordered(models) == ["tertiary"]
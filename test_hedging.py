@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import groq_server
+from app.health import ModelHealthRegistry
+from app.hedging import HedgePolicy
+from benchmarks.fake_llm import FakeLLMConfig, create_fake_llm_app, start_fake_llm
+
+def test_hedge_delay_follows_p95_and_budget_caps_fraction():
+    registry = ModelHealthRegistry()
+    health = registry.get("model")
+    policy = HedgePolicy(min_delay=0.05, max_delay=2.0, default_delay=1.0, min_samples=20, max_fraction=0.1, burst=2)
+    assert policy.delay_for(health) == 1.0
+    for latency in range(1, 101):
+        registry.record_success("model", latency / 100)
+    assert policy.delay_for(health) == 0.95
+    for _ in range(10):
+        registry.record_success("model", 50.0)
+    assert policy.delay_for(health) == 2.0
+
+    for _ in range(1000):
+        policy.note_request()
+        if policy.has_budget():
+            policy.record_hedge()
+    # 10% of requests plus the saved-up burst, however often a hedge was wanted
+    assert 100 <= policy.hedged <= 102
+    assert policy.stats()["budget_exhausted"] > 0
+
+def test_slow_primary_loses_to_hedged_backup():
+    primary, backup = groq_server.GROQ_MODELS[:2]
+    fake = create_fake_llm_app(FakeLLMConfig(latency_ms=20, model_latency_ms={primary: 3000}))
+    server, port = start_fake_llm(fake)
+    original = groq_server.groq_client, groq_server.hedger, groq_server.model_health
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(api_key="test-key", base_url=f"http://127.0.0.1:{port}")
+        groq_server.hedger = HedgePolicy(default_delay=0.1, max_fraction=0.5, burst=1)
+        groq_server.model_health = ModelHealthRegistry()
+
+        async def scenario():
+            started = time.perf_counter()
+            answer = await groq_server.generate_groq_response([{"role": "user", "content": "hi"}])
+            elapsed = time.perf_counter() - started
+            await groq_server.groq_client.close()
+            return answer, elapsed
+
+        answer, elapsed = asyncio.run(scenario())
+        assert answer == "fake answer"
+        assert elapsed < 1.5
+        assert fake.state.calls[primary] == fake.state.calls[backup] == 1
+        assert groq_server.hedger.stats()["backup_wins"] == 1
+        # The cancelled primary is not held against the model
+        assert groq_server.model_health.get(primary).failures == 0
+        assert groq_server.model_health.get(backup).successes == 1
+    finally:
+        groq_server.groq_client, groq_server.hedger, groq_server.model_health = original
+        server.should_exit = True
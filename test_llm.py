@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app.main
+from app.agent import AIQuestionAnswerAgent
+from app.llm import FakeBackend, GroqBackend, LLMBackend, LLMError, OpenAICompatibleBackend, backoff_delay
+from app.startup import LazyClient
+from test_concurrency import start_fake_groq
+
+def test_transient_errors_are_retried_with_backoff():
+    statuses = [503, 429, 200, 400]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses.pop(0)
+        if status == 200:
+            return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": "ok"}}]})
+        return httpx.Response(status, json={"error": {"message": "nope"}}, headers={"Retry-After": "0"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            backend = OpenAICompatibleBackend("http://llm/v1", "key", "model", http_client=client,
+                                              max_retries=2, backoff_seconds=0.001)
+            answer = await backend.complete([{"role": "user", "content": "hi"}])
+            try:
+                await backend.complete([{"role": "user", "content": "hi"}])
+            except LLMError as e:
+                # Bad requests are not retried
+                return answer, backend.stats(), e.status
+        raise AssertionError("400 should raise")
+
+    answer, stats, status = asyncio.run(scenario())
+    assert answer == "ok" and status == 400
+    assert stats["attempts"] == 4 and stats["retries"] == 2 and stats["failures"] == 1
+    assert backoff_delay(3, 0.25, 1.0, rng=lambda low, high: high) == 1.0
+    assert backoff_delay(1, 0.25, 1.0, rng=lambda low, high: high) == 0.5
+
+def test_groq_backend_streams_from_a_pooled_client():
+    server, port = start_fake_groq()
+    try:
+        async def scenario():
+            async with httpx.AsyncClient() as client:
+                backend = GroqBackend("test-key", base_url=f"http://127.0.0.1:{port}", http_client=client)
+                tokens = [token async for token in backend.stream([{"role": "user", "content": "hi"}])]
+                answer = await backend.complete([{"role": "user", "content": "hi"}])
+            return tokens, answer
+
+        tokens, answer = asyncio.run(scenario())
+        assert "".join(tokens) == answer == "fake answer"
+        assert len(tokens) == 2
+    finally:
+        server.should_exit = True
+
+def test_agent_requests_no_longer_serialize():
+    backend = FakeBackend(latency_seconds=0.3)
+    agent = AIQuestionAnswerAgent(backend=backend)
+    original_init = app.main.agent_init
+    app.main.agent_init = LazyClient("agent", lambda: agent)
+    try:
+        async def scenario():
+            transport = httpx.ASGITransport(app=app.main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                started = time.perf_counter()
+                responses = await asyncio.gather(*[
+                    client.post("/chat", json={"message": f"Tell me a joke number {i}", "user_id": f"user-{i}"})
+                    for i in range(5)
+                ])
+                elapsed = time.perf_counter() - started
+                stream = await client.post("/chat/stream", json={"message": "Tell me a joke"})
+            return responses, elapsed, stream
+
+        responses, elapsed, stream = asyncio.run(scenario())
+        assert all(response.status_code == 200 for response in responses)
+        assert responses[2].json()["response"] == "Fake answer to: Tell me a joke number 2"
+        # Five 0.3s calls one after another would take 1.5s
+        assert elapsed < 1.0
+        assert stream.text.count("event: meta") == 1 and "event: done" in stream.text
+        assert len(backend.calls) == 6
+    finally:
+        app.main.agent_init = original_init
+
+def test_backends_must_implement_complete():
+    class Incomplete(LLMBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert asyncio.run(FakeBackend(answer="ok").complete([])) == "ok"
@@ -0,0 +1,46 @@
+import time
+
+from app.memory import SessionStore
+
+def contents(store, user_id, max_messages=10):
+    return [message["content"] for message in store.get_context(user_id, max_messages)]
+
+def test_sessions_are_isolated_and_truncated():
+    store = SessionStore(max_messages=3, ttl_minutes=None)
+    store.add_message("alice", "user", "I like tea")
+    store.add_message("bob", "user", "I like coffee")
+    assert contents(store, "alice") == ["I like tea"]
+    assert contents(store, "bob") == ["I like coffee"]
+    assert contents(store, "carol") == [] and len(store) == 2
+
+    for turn in range(5):
+        store.add_message("alice", "assistant", f"reply {turn}")
+    # The ring buffer keeps the newest max_messages, oldest first
+    assert contents(store, "alice") == ["reply 2", "reply 3", "reply 4"]
+    assert contents(store, "alice", max_messages=2) == ["reply 3", "reply 4"]
+    assert contents(store, "bob") == ["I like coffee"]
+
+    store.clear("alice")
+    assert contents(store, "alice") == [] and contents(store, "bob") == ["I like coffee"]
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2, ttl_minutes=None)
+    store.add_message("alice", "user", "one")
+    store.add_message("bob", "user", "two")
+    # Reading alice makes bob the least recently used
+    contents(store, "alice")
+    store.add_message("carol", "user", "three")
+    assert len(store) == 2 and store.stats()["evictions"] == 1
+    assert contents(store, "bob") == []
+    assert contents(store, "alice") == ["one"] and contents(store, "carol") == ["three"]
+
+def test_idle_sessions_and_old_messages_expire():
+    store = SessionStore(ttl_minutes=0.001)
+    store.add_message("alice", "user", "hello")
+    store.add_message("bob", "user", "hi")
+    time.sleep(0.1)
+    assert contents(store, "alice") == []
+    store.add_message("carol", "user", "hey")
+    # Idle sessions are dropped from the LRU end as the store is used
+    assert len(store) == 1 and store.stats()["evictions"] == 2
+    assert contents(store, "carol") == ["hey"]
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import httpx
+
+import groq_server
+from app.metrics import MetricsRegistry
+from test_concurrency import start_fake_groq
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "Stage latency", ["stage"], buckets=(0.1, 1.0))
+    classify = latency.labels(stage="classify")
+    for value in (0.05, 0.5, 0.5, 3.0):
+        classify.observe(value)
+    registry.counter("lookups_total", "Lookups", ["result"]).labels(result="hit").inc(2)
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="classify",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="classify",le="1"} 3' in text
+    assert 'stage_seconds_bucket{stage="classify",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="classify"} 4' in text
+    assert 'lookups_total{result="hit"} 2' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+def test_observation_cost_is_negligible():
+    child = MetricsRegistry().histogram("h", "h").labels()
+    started = time.perf_counter()
+    for _ in range(100_000):
+        child.observe(0.003)
+    per_observation = (time.perf_counter() - started) / 100_000
+    # Requests take milliseconds; a few microseconds of bookkeeping stays well under 1%
+    assert per_observation < 5e-6, f"{per_observation * 1e6:.2f}µs per observation"
+
+def test_metrics_endpoint_reports_chat_stages():
+    server, port = start_fake_groq()
+    original_client = groq_server.groq_client
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/chat", json={"message": "Who invented the telephone?", "user_id": "metrics"})
+                await client.post("/chat", json={"message": "Thanks, that helps", "user_id": "metrics"})
+                response = await client.get("/metrics")
+            await groq_server.groq_client.close()
+            return response
+
+        response = asyncio.run(scenario())
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        for stage in ("classify", "search_tool", "context_build"):
+            assert f'chat_stage_seconds_count{{stage="{stage}"}}' in text
+        assert 'groq_model_attempt_seconds_count{model="llama-3.1-8b-instant",outcome="success"}' in text
+        assert 'groq_completion_tokens_total{model="llama-3.1-8b-instant"}' in text
+        assert 'search_tool_lookups_total{result="hit"}' in text
+        assert "memory_sessions " in text
+    finally:
+        groq_server.groq_client = original_client
+        server.should_exit = True
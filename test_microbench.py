@@ -0,0 +1,17 @@
+from benchmarks import microbench
+
+def test_suite_runs_and_flags_regressions():
+    results = microbench.run([10], only=["ShortTermMemory", "search_tool"], repeats=2, report=lambda result: None)
+    keys = set(results["results"])
+    assert keys == {
+        "search_tool[n=10]",
+        "ShortTermMemory.add_message[n=10]",
+        "ShortTermMemory.get_recent_context[n=10]",
+    }
+    assert all(result["ns_per_op"] > 0 for result in results["results"].values())
+
+    # A baseline twice as fast as this run is a regression; one twice as slow is not
+    faster = {"results": {key: {"best_ns_per_op": r["best_ns_per_op"] / 2} for key, r in results["results"].items()}}
+    slower = {"results": {key: {"best_ns_per_op": r["best_ns_per_op"] * 2} for key, r in results["results"].items()}}
+    assert set(microbench.compare(results, faster, threshold=0.25)) == keys
+    assert microbench.compare(results, slower, threshold=0.25) == []
@@ -0,0 +1,44 @@
+import os
+
+from app.router import HashingLinearModel, IntentRouter, read_labelled
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "app", "router_examples.jsonl")
+
+def test_rules_need_more_than_a_weak_keyword():
+    router = IntentRouter()
+    decisions = router.classify_batch([
+        "What is the capital of France?",
+        "What year did the Berlin Wall fall?",
+        "What a year it has been",
+        "I yearn for the weekend",
+        "What is your favorite color?",
+        "Tell me a joke",
+    ])
+    assert [decision.factual for decision in decisions] == [True, True, False, False, False, False]
+    assert decisions[0].confidence > decisions[1].confidence > 0.5 > decisions[2].confidence
+    assert all(decision.source == "rules" for decision in decisions)
+
+def test_linear_model_trained_from_labelled_file(tmp_path):
+    texts, labels = zip(*read_labelled(EXAMPLES))
+    model = HashingLinearModel.train(texts, labels)
+    path = str(tmp_path / "router.npz")
+    model.save(path)
+    router = IntentRouter(model=HashingLinearModel.load(path))
+
+    decisions = router.classify_batch(list(texts))
+    assert sum(decision.factual == label for decision, label in zip(decisions, labels)) >= 0.95 * len(labels)
+    unseen = router.classify_batch(["Who invented the radio?", "Can you tell me something funny?"])
+    assert [decision.factual for decision in unseen] == [True, False]
+    assert router.classify("Who invented the radio?") == unseen[0]
+    assert unseen[0].source == "model" and 0.0 <= unseen[1].confidence <= 1.0
+
+def test_superlative_questions_go_to_search():
+    router = IntentRouter()
+    decisions = router.classify_batch([
+        "Which ocean is the largest?",
+        "What's the tallest mountain?",
+        "Which is the longest river in Africa?",
+        "This is the largest mess I have ever made",
+        "That was the longest day ever",
+    ])
+    assert [decision.factual for decision in decisions] == [True, True, True, False, False]
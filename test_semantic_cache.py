@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+
+import groq_server
+import test_concurrency
+from app.cache import AnswerCache
+from app.semantic_cache import SemanticCache
+from test_concurrency import start_fake_groq
+
+FRANCE = "The capital of France is Paris."
+
+def test_paraphrases_hit_within_their_scope_only():
+    cache = SemanticCache(capacity=3)
+    cache.put("What is the capital of France?", True, FRANCE, "Paris.")
+    assert cache.get("What's France's capital?", True, FRANCE) == "Paris."
+    assert cache.get("capital of France?", True, FRANCE) == "Paris."
+    # Same wording, different search result: never reused
+    assert cache.get("What is the capital of France?", True, "The capital of Spain is Madrid.") is None
+    assert cache.get("What is the population of France?", True, FRANCE) is None
+
+    cache.put("How are you today?", False, None, "Great, thanks!", user_id="alice")
+    assert cache.get("how are you today", False, None, user_id="alice") == "Great, thanks!"
+    assert cache.get("how are you today", False, None, user_id="bob") is None
+
+    # A paraphrase refreshes its entry rather than taking another slot
+    cache.put("Tell me the capital of France", True, FRANCE, "It is Paris.")
+    assert len(cache) == 2
+    cache.put("Who painted the Mona Lisa?", True, "Leonardo da Vinci painted the Mona Lisa.", "Leonardo.")
+    cache.put("How tall is Mount Everest?", True, "Mount Everest is 8,848 meters tall.", "8,848 m.")
+    # Full: the least recently used entry (the conversational one) made room
+    assert len(cache) == 3 and cache.stats()["evictions"] == 1
+    assert cache.get("how are you today", False, None, user_id="alice") is None
+    assert cache.get("What's France's capital?", True, FRANCE) == "It is Paris."
+    cache.clear()
+    assert len(cache) == 0
+
+def test_paraphrased_question_skips_groq():
+    server, port = start_fake_groq()
+    original = groq_server.groq_client, groq_server.answer_cache, groq_server.semantic_cache
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(api_key="test-key", base_url=f"http://127.0.0.1:{port}")
+        groq_server.answer_cache = AnswerCache()
+        groq_server.semantic_cache = SemanticCache()
+        calls_before = test_concurrency.fake_calls()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.post("/chat", json={"message": "What is the capital of France?", "user_id": "alice"})
+                second = await client.post("/chat", json={"message": "Tell me the capital of France", "user_id": "bob"})
+                other = await client.post("/chat", json={"message": "What is the capital of Spain?", "user_id": "bob"})
+            await groq_server.groq_client.close()
+            return first.json(), second.json(), other.json()
+
+        first, second, other = asyncio.run(scenario())
+        assert first["response"] == second["response"] == "fake answer"
+        assert first["prompt_tokens"] > 0 and second["prompt_tokens"] == 0
+        assert other["prompt_tokens"] > 0
+        assert test_concurrency.fake_calls() - calls_before == 2
+        assert groq_server.semantic_cache.stats()["hits"] == 1
+    finally:
+        groq_server.groq_client, groq_server.answer_cache, groq_server.semantic_cache = original
+        server.should_exit = True
+
+def test_questions_asking_something_else_miss():
+    microsoft = "Microsoft was founded by Bill Gates and Paul Allen in 1975."
+    china = "China has a population of about 1.4 billion people."
+    cache = SemanticCache()
+    cache.put("When was Microsoft founded?", True, microsoft, "In 1975.")
+    cache.put("What is the population of China?", True, china, "About 1.4 billion.")
+    # Nearly the same words, but a different interrogative or a year the cached question did not have
+    assert cache.get("Who founded Microsoft?", True, microsoft) is None
+    assert cache.get("What was the population of China in 1950?", True, china) is None
+    assert cache.get("What's the population of China?", True, china) == "About 1.4 billion."
+    assert SemanticCache.question_kind("Who was president in 1990 and 1991?") == "who 1990 1991"
@@ -0,0 +1,149 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+from app.memory import call_store
+from app.session_db import SQLiteSessionStore
+
+def take_turn(db_path, user_id, turn, results):
+    """One worker process: read the conversation so far, then add a turn"""
+    store = SQLiteSessionStore(db_path, max_messages=20, ttl_minutes=None)
+    results.put((turn, [m["content"] for m in store.get_context(user_id, 20)]))
+    store.add_message(user_id, "user", f"question {turn}")
+    store.add_message(user_id, "assistant", f"answer {turn}")
+    store.close()
+
+def chat_concurrently(db_path, worker, turns):
+    store = SQLiteSessionStore(db_path, max_messages=50, ttl_minutes=None, flush_batch=4)
+    for turn in range(turns):
+        store.add_message(f"user-{worker}", "user", f"message {turn}")
+        store.add_message("shared", "user", f"worker {worker} message {turn}")
+    store.close()
+
+def run_workers(target, args_list):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=target, args=args) for args in args_list]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+def test_context_survives_across_worker_processes(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    results = multiprocessing.get_context("fork").Queue()
+    # Each turn runs in a fresh process, as when requests land on different uvicorn workers
+    for turn in range(4):
+        run_workers(take_turn, [(db_path, "alice", turn, results)])
+        seen_turn, context = results.get(timeout=10)
+        assert seen_turn == turn
+        assert context == [text for t in range(turn) for text in (f"question {t}", f"answer {t}")]
+
+def test_concurrent_workers_lose_no_writes(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(db_path).close()
+    run_workers(chat_concurrently, [(db_path, worker, 10) for worker in range(4)])
+
+    store = SQLiteSessionStore(db_path, max_messages=50, ttl_minutes=None)
+    for worker in range(4):
+        assert [m["content"] for m in store.get_context(f"user-{worker}", 50)] == [f"message {t}" for t in range(10)]
+    assert len(store.get_context("shared", 50)) == 40
+    assert store.stats()["sessions"] == 5
+    store.close()
+
+def test_read_cache_sees_writes_from_another_process(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    ours = SQLiteSessionStore(db_path, ttl_minutes=None)
+    theirs = SQLiteSessionStore(db_path, ttl_minutes=None)
+    try:
+        ours.add_message("bob", "user", "hello")
+        assert [m["content"] for m in ours.get_context("bob")] == ["hello"]
+        assert [m["content"] for m in ours.get_context("bob")] == ["hello"]
+        assert ours.stats()["cache_hits"] == 1
+
+        ours.flush()
+        theirs.add_message("bob", "assistant", "hi there")
+        theirs.flush()
+        assert [m["content"] for m in ours.get_context("bob")] == ["hello", "hi there"]
+    finally:
+        ours.close()
+        theirs.close()
+
+def test_sweep_expires_old_messages(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_minutes=0.001)
+    try:
+        store.add_message("carol", "user", "old news")
+        time.sleep(0.1)
+        assert store.get_context("carol") == []
+        store.sweep()
+        assert store.stats()["messages"] == 0
+        assert store.stats()["expired"] == 1
+    finally:
+        store.close()
+
+def test_locked_database_keeps_queued_turns_and_reads_going(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(db_path, ttl_minutes=None, flush_interval=3600, lock_timeout=0.3)
+    other = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        store.add_message("dave", "user", "still here?")
+        # Another process holds the write lock for longer than the store will wait
+        other.execute("BEGIN IMMEDIATE")
+        errors = []
+
+        def flush():
+            try:
+                store.flush()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        flusher = threading.Thread(target=flush)
+        flusher.start()
+        time.sleep(0.05)
+        started = time.perf_counter()
+        assert [m["content"] for m in store.get_context("dave")] == ["still here?"]
+        store.add_message("dave", "assistant", "yes")
+        # Reads and queueing do not wait behind the blocked flush
+        assert time.perf_counter() - started < 0.1
+        flusher.join()
+        assert errors
+        assert store.stats()["pending_writes"] == 2
+
+        other.execute("ROLLBACK")
+        store.flush()
+        assert store.stats()["pending_writes"] == 0
+        fresh = SQLiteSessionStore(db_path, ttl_minutes=None)
+        assert [m["content"] for m in fresh.get_context("dave")] == ["still here?", "yes"]
+        fresh.close()
+    finally:
+        other.close()
+        store.close()
+
+def test_store_calls_from_the_event_loop_run_off_it(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(db_path, ttl_minutes=None, flush_interval=3600, lock_timeout=2)
+    other = sqlite3.connect(db_path, isolation_level=None)
+    store.add_message("erin", "user", "forget me")
+    store.flush()
+
+    async def scenario():
+        # /clear and compaction wait for SQLite's write lock, which another process holds
+        other.execute("BEGIN IMMEDIATE")
+        clearing = asyncio.create_task(call_store(store, "clear", "erin"))
+        started = time.perf_counter()
+        await asyncio.sleep(0.05)
+        stalled = time.perf_counter() - started - 0.05
+        waiting = not clearing.done()
+        other.execute("ROLLBACK")
+        await clearing
+        return stalled, waiting
+
+    try:
+        stalled, waiting = asyncio.run(scenario())
+        assert waiting and stalled < 0.05
+        assert store.get_context("erin") == []
+    finally:
+        other.close()
+        store.close()
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+
+from app.sqlite_search import SQLiteSearchTool, bulk_import, main, read_fact_rows
+from app.tools import SearchTool
+
+def test_bulk_import_and_ranked_lookup(tmp_path):
+    db_path = str(tmp_path / "knowledge.db")
+    facts = SearchTool().knowledge_base
+    jsonl_path = tmp_path / "facts.jsonl"
+    with open(jsonl_path, "w", encoding="utf-8") as handle:
+        for key, answer in list(facts.items())[:6]:
+            handle.write(json.dumps({"key": key, "answer": answer}) + "\n")
+        handle.write("\n")
+    csv_path = tmp_path / "facts.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as handle:
+        handle.write("key,answer\n")
+        for key, answer in list(facts.items())[6:]:
+            handle.write(f'"{key.upper()}","{answer}"\n')
+
+    assert bulk_import(db_path, read_fact_rows(str(jsonl_path)), batch_size=4) == 6
+    assert bulk_import(db_path, read_fact_rows(str(csv_path))) == len(facts) - 6
+
+    tool = SQLiteSearchTool(db_path)
+    assert tool("What is the capital of France?") == "The capital of France is Paris."
+    # Prefix matching under the porter stemmer lines up "invented" with "inventor"
+    assert tool("Who invented the telephone?") == facts["inventor of telephone"]
+    assert tool("Who founded Microsoft?") == facts["founder of microsoft"]
+    hits = tool.search_topk("speed of light in vacuum", k=3)
+    scores = [score for _, _, score in hits]
+    assert hits[0][0] == "speed of light" and scores == sorted(scores, reverse=True)
+    # One shared word is not an answer
+    assert tool("What is the capital of Kenya?").startswith("I couldn't find")
+    assert tool.search_topk("the of and", k=3) == []
+
+    changes = []
+    tool.on_change(lambda: changes.append(True))
+    tool.add_fact("Capital of France", "Paris, since 987.")
+    assert tool("capital of france") == "Paris, since 987." and changes == [True]
+
+def test_common_terms_only_still_returns_the_best_match(tmp_path):
+    db_path = str(tmp_path / "knowledge.db")
+    # Every query term is common, so candidates come from an AND over all of them;
+    # the best match was inserted last and would fall outside an unordered LIMIT
+    rows = [(f"capital city of region {i}", f"Region {i} capital.") for i in range(40)]
+    rows += [(f"length of river {i}", f"River {i} is long.") for i in range(100)]
+    rows.append(("capital city", "Where a government sits."))
+    bulk_import(db_path, rows)
+    tool = SQLiteSearchTool(db_path, common_term_docs=5, candidates=10)
+    assert tool("capital city") == "Where a government sits."
+
+def test_facts_are_replaced_by_key(tmp_path, capsys):
+    db_path = str(tmp_path / "knowledge.db")
+    jsonl_path = tmp_path / "facts.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"key": "boiling point of water", "answer": "100 C at sea level."}) + "\n"
+        + json.dumps({"key": "Boiling point of water", "answer": "212 F at sea level."}) + "\n",
+        encoding="utf-8"
+    )
+    main(["--db", db_path, "import", str(jsonl_path)])
+    bulk_import(db_path, [("freezing point of water", "0 C."), ("boiling point of water", "373.15 K.")])
+    assert "Imported 2 facts" in capsys.readouterr().out
+
+    tool = SQLiteSearchTool(db_path)
+    assert tool("boiling point of water") == "373.15 K."
+    tool.add_fact("Freezing point of water", "32 F.")
+    assert tool("freezing point of water") == "32 F."
+
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute("SELECT key, answer FROM facts ORDER BY key").fetchall()
+    assert rows == [("boiling point of water", "373.15 K."), ("freezing point of water", "32 F.")]
+    mapped = connection.execute("SELECT count(*) FROM fact_keys").fetchone()[0]
+    connection.close()
+    assert mapped == 2
+
+def test_index_built_without_key_map_gets_one(tmp_path):
+    db_path = str(tmp_path / "knowledge.db")
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE VIRTUAL TABLE facts USING fts5(key, answer, tokenize='porter unicode61')")
+    connection.execute("INSERT INTO facts(key, answer) VALUES ('height of everest', '8,848 m.')")
+    connection.commit()
+    connection.close()
+
+    tool = SQLiteSearchTool(db_path)
+    tool.add_fact("height of everest", "8,849 m.")
+    assert tool("height of everest") == "8,849 m."
+    assert tool._connection().execute("SELECT count(*) FROM facts").fetchone()[0] == 1
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import httpx
+
+import groq_server
+from app.startup import LazyClient
+from test_concurrency import start_fake_groq
+
+def test_lazy_client_retries_after_a_failed_creation():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+        return "client"
+
+    lazy = LazyClient("test", factory, retry_seconds=0)
+    assert lazy.get() is None
+    assert "GROQ_API_KEY" in lazy.stats()["error"]
+    assert lazy.get() == "client"
+    assert lazy.get() == "client"
+    assert len(attempts) == 2
+    assert lazy.stats()["ready"] and lazy.stats()["error"] is None
+
+def test_ready_only_after_warm_up():
+    server, port = start_fake_groq()
+    original_client, original_init = groq_server.groq_client, groq_server.groq_client_init
+    original_startup, original_env = groq_server.startup, dict(os.environ)
+    try:
+        os.environ.update({"GROQ_API_KEY": "test-key", "GROQ_BASE_URL": f"http://127.0.0.1:{port}"})
+        groq_server.groq_client = None
+        groq_server.groq_client_init = LazyClient("groq", groq_server._create_default_groq_client)
+        groq_server.startup = groq_server.StartupState()
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                before = await client.get("/health/ready")
+                async with groq_server.lifespan(groq_server.app):
+                    live = await client.get("/health/live")
+                    assert await groq_server.startup.wait(timeout=10)
+                    after = await client.get("/health/ready")
+            return before, live, after
+
+        before, live, after = asyncio.run(scenario())
+        assert before.status_code == 503
+        assert live.status_code == 200
+        assert after.status_code == 200
+        phases = after.json()["startup"]["phases"]
+        assert set(phases) == {"groq_client", "search_index", "groq_connections"}
+        assert not any("error" in phase for phase in phases.values())
+    finally:
+        os.environ.clear()
+        os.environ.update(original_env)
+        groq_server.groq_client, groq_server.groq_client_init = original_client, original_init
+        groq_server.startup = original_startup
+        server.should_exit = True
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import httpx
+import uvicorn
+
+import app.main
+import groq_server
+from app.agent import AIQuestionAnswerAgent
+from app.llm import GroqBackend
+from app.memory import SessionStore
+from app.startup import LazyClient
+from app.streaming import format_sse
+from benchmarks.fake_llm import FakeLLMConfig, create_fake_llm_app, start_fake_llm
+
+# Long enough that the client hangs up well before the last token
+SLOW_ANSWER = " ".join(f"word{i}" for i in range(200))
+
+def test_format_sse_splits_on_sse_line_breaks_only():
+    assert format_sse("a b\u0085c") == "data: a b\u0085c\n\n"
+    assert format_sse("one\r\ntwo\rthree\nfour", event="token") == "event: token\ndata: one\ndata: two\ndata: three\ndata: four\n\n"
+    assert format_sse("") == "data: \n\n"
+    # Sent raw by json.dumps(ensure_ascii=False); one data line, so the JSON arrives whole
+    message = format_sse({"token": "line\u2028separator"})
+    assert message.count("data: ") == 1
+    assert json.loads(message[len("data: "):]) == {"token": "line\u2028separator"}
+
+async def hang_up_mid_stream(asgi_app, message: str, user_id: str, upstream):
+    """Serve asgi_app over real HTTP, read two token events of an answer, disconnect and wait for the upstream stream to close"""
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            async with client.stream("POST", "/chat/stream", json={"message": message, "user_id": user_id}) as response:
+                tokens = 0
+                async for line in response.aiter_lines():
+                    tokens += line.startswith('data: {"token"')
+                    if tokens == 2:
+                        break
+        for _ in range(200):
+            if upstream.state.streams["abandoned"]:
+                break
+            await asyncio.sleep(0.025)
+    finally:
+        server.should_exit = True
+        await serving
+
+def test_groq_server_stream_disconnect_closes_upstream_and_skips_memory():
+    upstream = create_fake_llm_app(FakeLLMConfig(latency_ms=0, answer=SLOW_ANSWER, chunk_delay_ms=20))
+    fake, port = start_fake_llm(upstream)
+    original = groq_server.groq_client, groq_server.memory, groq_server.compactor
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(api_key="test-key", base_url=f"http://127.0.0.1:{port}")
+        groq_server.memory = SessionStore(ttl_minutes=None)
+        groq_server.compactor = None
+
+        async def scenario():
+            await hang_up_mid_stream(groq_server.app, "Tell me a long story", "leaver", upstream)
+            await groq_server.groq_client.close()
+
+        asyncio.run(scenario())
+        assert upstream.state.streams == {"abandoned": 1}
+        # The question is remembered, the half-sent answer is not
+        assert [turn["role"] for turn in groq_server.memory.get_context("leaver", 10)] == ["user"]
+    finally:
+        groq_server.groq_client, groq_server.memory, groq_server.compactor = original
+        fake.should_exit = True
+
+def test_agent_stream_disconnect_closes_upstream_and_skips_memory():
+    upstream = create_fake_llm_app(FakeLLMConfig(latency_ms=0, answer=SLOW_ANSWER, chunk_delay_ms=20))
+    fake, port = start_fake_llm(upstream)
+    original_init = app.main.agent_init
+    try:
+        async def scenario():
+            async with httpx.AsyncClient() as client:
+                backend = GroqBackend("test-key", base_url=f"http://127.0.0.1:{port}", http_client=client)
+                agent = AIQuestionAnswerAgent(backend=backend)
+                app.main.agent_init = LazyClient("agent", lambda: agent)
+                await hang_up_mid_stream(app.main.app, "Tell me a long story", "leaver", upstream)
+            return agent
+
+        agent = asyncio.run(scenario())
+        assert upstream.state.streams == {"abandoned": 1}
+        assert [turn["role"] for turn in agent.memory.get_context("leaver", 10)] == ["user"]
+    finally:
+        app.main.agent_init = original_init
+        fake.should_exit = True
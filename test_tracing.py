@@ -0,0 +1,96 @@
+import asyncio
+import io
+import json
+
+import httpx
+
+import groq_server
+from app.logs import configure_logging, flush_logging
+from test_concurrency import start_fake_groq
+
+def run_with_fake_groq(scenario):
+    server, port = start_fake_groq()
+    original_client = groq_server.groq_client
+    try:
+        groq_server.groq_client = groq_server.create_groq_client(
+            api_key="test-key", base_url=f"http://127.0.0.1:{port}"
+        )
+
+        async def wrapped():
+            transport = httpx.ASGITransport(app=groq_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                result = await scenario(client)
+            await groq_server.groq_client.close()
+            return result
+
+        return asyncio.run(wrapped())
+    finally:
+        groq_server.groq_client = original_client
+        server.should_exit = True
+
+def test_sampled_request_logs_trace_with_spans():
+    output = io.StringIO()
+    configure_logging("INFO", stream=output)
+    original_rate = groq_server.tracer.sample_rate
+    groq_server.tracer.sample_rate = 1.0
+    try:
+        async def scenario(client):
+            return await client.post(
+                "/chat",
+                json={"message": "What is the capital of Spain?", "user_id": "tracing"},
+                headers={"X-Request-ID": "req-123"}
+            )
+
+        response = run_with_fake_groq(scenario)
+        flush_logging()
+    finally:
+        groq_server.tracer.sample_rate = original_rate
+        configure_logging("INFO")
+
+    assert response.headers["x-request-id"] == "req-123"
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    traces = [record for record in records if record["event"] == "trace"]
+    assert len(traces) == 1 and traces[0]["request_id"] == "req-123"
+    span_names = [span["name"] for span in traces[0]["spans"]]
+    for name in ("memory_write", "classify", "search", "llm_attempt"):
+        assert name in span_names
+    assert any(record["event"] == "chat_answered" and record["request_id"] == "req-123" for record in records)
+    # Responses and tool results stay out of the logs
+    assert "Madrid" not in output.getvalue()
+
+def test_admin_profile_covers_next_requests(monkeypatch):
+    monkeypatch.setattr(groq_server, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+
+    async def scenario(client):
+        profile = asyncio.create_task(client.post("/admin/profile", params={"requests": 3, "timeout": 10}, headers=headers))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*[
+            client.post("/chat", json={"message": f"Tell me a story {i}", "user_id": f"profile-{i}"})
+            for i in range(3)
+        ])
+        return await profile
+
+    response = run_with_fake_groq(scenario)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["requests"] == 3
+    assert "chat_endpoint" in report["profile"]
+    assert not groq_server.profiler.active
+
+def test_admin_profile_needs_a_token_and_a_known_sort(monkeypatch):
+    async def scenario(client):
+        disabled = await client.post("/admin/profile", params={"timeout": 0.01})
+        monkeypatch.setattr(groq_server, "ADMIN_TOKEN", "secret")
+        wrong = await client.post("/admin/profile", params={"timeout": 0.01}, headers={"X-Admin-Token": "guess"})
+        missing = await client.post("/admin/profile", params={"timeout": 0.01})
+        bad_sort = await client.post("/admin/profile", params={"sort": "bogus"}, headers={"X-Admin-Token": "secret"})
+        return disabled, wrong, missing, bad_sort
+
+    monkeypatch.setattr(groq_server, "ADMIN_TOKEN", None)
+    disabled, wrong, missing, bad_sort = run_with_fake_groq(scenario)
+    assert disabled.status_code == 404
+    assert wrong.status_code == missing.status_code == 403
+    # Rejected before arming, rather than a KeyError from pstats after the capture
+    assert bad_sort.status_code == 400 and "tottime" in bad_sort.json()["detail"]
+    assert not groq_server.profiler.active